@@ -0,0 +1,30 @@
+""" Batched fits of Plot.fit against one np.polyfit call per dataset.
+
+Usage: python benchmarks/bench_fitting.py [n_datasets] [size] [degree]
+"""
+import sys
+import time
+import numpy as np
+
+from lplot.main import Plot
+
+
+def main(n_datasets=10000, size=1000, degree=3):
+  x = np.linspace(-1, 1, size)
+  data = np.column_stack([x, np.random.default_rng(0).normal(size=(size, n_datasets))])
+  plot = Plot()
+  plot.add_data(data, None)
+  print("{} datasets of {} points, degree {}".format(n_datasets, size, degree))
+  start = time.perf_counter()
+  fits = plot.fit("poly", degree=degree)
+  batched = time.perf_counter() - start
+  print("  batched fit:   {:8.3f} s".format(batched))
+  start = time.perf_counter()
+  reference = [np.polyfit(x, data[:, i + 1], degree) for i in range(n_datasets)]
+  looped = time.perf_counter() - start
+  print("  polyfit loop:  {:8.3f} s  speedup {:6.1f}".format(looped, looped / batched))
+  assert np.allclose(fits.table(), reference)
+
+
+if __name__ == "__main__":
+  main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,40 @@
+""" Blocked evaluation of element-wise transforms against whole-array evaluation:
+run time and peak memory allocated by the evaluation.
+
+Usage: python benchmarks/bench_fusion.py [size]
+"""
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+import lplot.safe_eval
+from lplot.safe_eval import safe_eval
+
+
+expressions = [
+    "x * 2 + 1 - x * x * 3",
+    "exp(-1 * x ** 2 / 2) * sin(x) * 100",
+    ]
+
+
+def main(size=20000000):
+  x = np.linspace(-3, 3, size)
+  print("array size: {} ({:.0f} MB)".format(size, x.nbytes / 1e6))
+  for expression in expressions:
+    for name, min_size in [("whole arrays", None), ("blocked", lplot.safe_eval.fusion_min_size)]:
+      lplot.safe_eval.fusion_min_size = min_size
+      timings = []
+      for i in range(3):
+        start = time.perf_counter()
+        safe_eval(expression, locals={"x": x})
+        timings.append(time.perf_counter() - start)
+      tracemalloc.start()
+      safe_eval(expression, locals={"x": x})
+      peak = tracemalloc.get_traced_memory()[1]
+      tracemalloc.stop()
+      print("  {:<40s} {:<14s} {:8.3f} s  peak {:8.1f} MB".format(expression, name, min(timings), peak / 1e6))
+
+
+if __name__ == "__main__":
+  main(*[int(arg) for arg in sys.argv[1:]])
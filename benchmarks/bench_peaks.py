@@ -0,0 +1,50 @@
+""" Vectorized peak finding over a block of spectra against a loop over the spectra.
+
+Usage: python benchmarks/bench_peaks.py [n_spectra] [size]
+"""
+import sys
+import time
+import numpy as np
+
+from lplot.peaks import find_peaks
+
+
+def _loop_peaks(y, prominence):
+  """ Local maxima and prominences found walking each spectrum.
+  """
+  found = 0
+  for row in y:
+    for i in range(1, len(row) - 1):
+      if row[i - 1] < row[i] > row[i + 1]:
+        j = i
+        while j >= 0 and row[j] <= row[i]:
+          j -= 1
+        left = row[j + 1:i + 1].min()
+        j = i
+        while j < len(row) and row[j] <= row[i]:
+          j += 1
+        right = row[i:j].min()
+        found += row[i] - max(left, right) >= prominence
+  return found
+
+
+def main(n_spectra=10000, size=1000):
+  x = np.linspace(0, 1, size)
+  rng = np.random.default_rng(0)
+  centers = rng.random((n_spectra, 5, 1))
+  y = np.exp(-(x - centers) ** 2 / 1e-3).sum(axis=1) + 0.01 * rng.normal(size=(n_spectra, size))
+  print("{} spectra of {} points".format(n_spectra, size))
+  start = time.perf_counter()
+  peaks = find_peaks(y, prominence=0.2)
+  vectorized = time.perf_counter() - start
+  print("  vectorized: {:8.3f} s  {} peaks".format(vectorized, len(peaks)))
+  subset = max(1, n_spectra // 100)
+  start = time.perf_counter()
+  found = _loop_peaks(y[:subset], 0.2)
+  looped = (time.perf_counter() - start) * n_spectra / subset
+  assert found == np.count_nonzero(peaks["row"] < subset)
+  print("  loop:       {:8.3f} s  (extrapolated from {} spectra)  speedup {:6.1f}".format(looped, subset, looped / vectorized))
+
+
+if __name__ == "__main__":
+  main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,41 @@
+""" Per-evaluation overhead of transforms: the former tree-walking interpreter
+against the compiled closures of ``lplot.safe_eval``.
+
+Usage: python benchmarks/bench_safe_eval.py
+"""
+import os
+import sys
+import timeit
+import numpy as np
+
+from lplot.safe_eval import safe_exec, compile_transform
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tests", "safe_eval"))
+from reference_eval import reference_exec
+
+
+transforms = [
+    "y = y * 2",
+    "y = sin(x) * exp(-1 * x ** 2 / 2) * 100",
+    "x = x[1:-1]; y = y[1:-1] * energy('eV', 'THz') * hbar('eV*sec')",
+    ]
+
+
+def main(number=2000):
+  for size in [10, 100000]:
+    x = np.linspace(0, 1, size)
+    print("array size: {}".format(size))
+    for transform in transforms:
+      compiled = compile_transform(transform)
+      timings = {
+          "interpreter": lambda: reference_exec(transform, locals={"x": x, "y": x}),
+          "safe_exec": lambda: safe_exec(transform, locals={"x": x, "y": x}),
+          "compiled": lambda: compiled({"x": x, "y": x}),
+          }
+      n = number if size < 1000 else number // 20
+      results = {name: min(timeit.repeat(func, number=n, repeat=3)) / n * 1e6 for name, func in timings.items()}
+      print("  {:<70s} ".format(transform) + "  ".join("{}: {:8.2f} us".format(k, v) for k, v in results.items()))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,34 @@
+""" Scaling of per-file transforms over the number of threads of Plot.add_datasets.
+
+Usage: python benchmarks/bench_threads.py [n_datasets] [size] [max_threads]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+from lplot.main import Plot
+from lplot.safe_eval import compile_transform
+
+
+def main(n_datasets=16, size=2000000, max_threads=os.cpu_count() or 1):
+  transform = compile_transform("y = exp(-1 * y ** 2 / 2) * sin(y) * 100 + cos(y) * y")
+  x = np.linspace(-3, 3, size)
+  specs = [(np.column_stack([x, x * i]), None, transform) for i in range(n_datasets)]
+  print("{} datasets of {} points".format(n_datasets, size))
+  reference = None
+  jobs = 1
+  while jobs <= max_threads:
+    timings = []
+    for i in range(3):
+      plot = Plot()
+      start = time.perf_counter()
+      plot.add_datasets(specs, executor=jobs)
+      timings.append(time.perf_counter() - start)
+    reference = reference or min(timings)
+    print("  {:3d} threads: {:8.3f} s  speedup {:5.2f}".format(jobs, min(timings), reference / min(timings)))
+    jobs *= 2
+
+
+if __name__ == "__main__":
+  main(*[int(arg) for arg in sys.argv[1:]])
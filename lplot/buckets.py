@@ -0,0 +1,109 @@
+import numpy as np
+
+
+__all__ = ["bucket_statistics", "bucket_starts", "aggregate"]
+
+
+bucket_statistics = ("mean", "min", "max", "sum", "count", "first", "last")
+
+
+def bucket_starts(x: np.ndarray, width: float=None, samples: int=None, origin: float=0.) -> tuple:
+  """
+  Cut sorted x into consecutive buckets.
+
+  Parameters
+  ----------
+  x: np.ndarray
+      Sorted x.
+  width: float, default to None
+      Width of the buckets in the unit of x, bucket ``i`` spans
+      ``[origin + i * width, origin + (i + 1) * width)``, empty buckets are skipped.
+  samples: int, default to None
+      Number of samples of the buckets, used if ``width`` is None.
+  origin: float, default to 0.
+      Start of a bucket, so that buckets of different datasets line up.
+
+  Returns
+  -------
+  (starts, bucket_x): tuple
+      The index of the first sample of each bucket, and the start of each bucket,
+      its lower edge for buckets of a given width, else its first x.
+  """
+  n = len(x)
+  if width is not None:
+    if not width > 0:
+      raise ValueError("Bucket width is expected to be positive.")
+    ids = np.floor((x - origin) / width)
+    starts = np.flatnonzero(np.concatenate([[n > 0], ids[1:] != ids[:-1]]))
+    return starts, origin + ids[starts] * width
+  if samples is None or int(samples) != samples or samples < 1:
+    raise ValueError("Either a bucket width or a positive number of samples is expected.")
+  starts = np.arange(0, n, int(samples))
+  return starts, x[starts]
+
+
+def aggregate(
+    x: np.ndarray,
+    y: np.ndarray,
+    statistics: tuple=("mean", ),
+    width: float=None,
+    samples: int=None,
+    origin: float=0.,
+    ) -> tuple:
+  """
+  Reduce a dataset to statistics of buckets of its samples.
+
+  Each statistic is a single ``reduceat`` over the sorted samples, whatever the
+  number of buckets, and all the columns of ``y`` are reduced at once.
+
+  Parameters
+  ----------
+  x: np.ndarray
+      x of the dataset, sorted first if it is not.
+  y: np.ndarray
+      y of the dataset, 1 dimentional or one column per curve.
+  statistics: tuple, default to ("mean", )
+      Statistics computed in each bucket, among ``bucket_statistics``.
+  width: float, default to None
+      Width of the buckets in the unit of x, see ``bucket_starts``.
+  samples: int, default to None
+      Number of samples of the buckets, used if ``width`` is None.
+  origin: float, default to 0.
+      Start of a bucket, see ``bucket_starts``.
+
+  Returns
+  -------
+  (bucket_x, values): tuple
+      The start of the buckets, and a dict of the values of each statistic.
+  """
+  unknown = set(statistics) - set(bucket_statistics)
+  if unknown:
+    raise ValueError("Unknown statistics {}, available statistics are {}.".format(
+        ", ".join(sorted(unknown)), ", ".join(bucket_statistics)))
+  x = np.asarray(x)
+  y = np.asarray(y)
+  if np.any(x[1:] < x[:-1]):
+    order = np.argsort(x, kind="stable")
+    x, y = x[order], y[order]
+  starts, bucket_x = bucket_starts(x, width=width, samples=samples, origin=origin)
+  counts = np.diff(np.append(starts, len(x)))
+  counts_shape = counts.reshape((-1, ) + (1, ) * (y.ndim - 1))
+  values = {}
+  if len(starts) == 0:
+    return bucket_x, {stat: y[:0] for stat in statistics}
+  for stat in statistics:
+    if stat in ("sum", "mean") and "sum" not in values:
+      values["sum"] = np.add.reduceat(y, starts, axis=0)
+    if stat == "mean":
+      values["mean"] = values["sum"] / counts_shape
+    elif stat == "min":
+      values["min"] = np.minimum.reduceat(y, starts, axis=0)
+    elif stat == "max":
+      values["max"] = np.maximum.reduceat(y, starts, axis=0)
+    elif stat == "count":
+      values["count"] = np.broadcast_to(counts_shape, (len(starts), ) + y.shape[1:]).copy()
+    elif stat == "first":
+      values["first"] = y[starts]
+    elif stat == "last":
+      values["last"] = y[starts + counts - 1]
+  return bucket_x, {stat: values[stat] for stat in statistics}
@@ -0,0 +1,152 @@
+import time
+import contextlib
+import contextvars
+from numbers import Number
+import numpy as np
+
+
+__all__ = ["ResourceLimitError", "Budget", "use_budget", "active_budget", "check_deadline", "bind_budget", "result_size"]
+
+
+class ResourceLimitError(RuntimeError):
+  """ The evaluation of a transform exceeded its budget.
+  """
+
+
+class Budget:
+  """
+  Limits of the resources used to evaluate transforms, e.g. in a service evaluating transforms of its users.
+
+  The limits are checked before each operation, so that a single request can
+  neither allocate an enormous array nor run for an unbounded time.
+  A limit of None is not checked.
+
+  Parameters
+  ----------
+  max_elements: int, default to None
+      Largest number of elements of a value computed, estimated from the shapes
+      of the operands before it is allocated.
+  max_exponent: float, default to None
+      Largest absolute value of the exponent of a power.
+  max_factorial: int, default to None
+      Largest argument of ``factorial`` and ``binomial``.
+  timeout: float, default to None
+      Wall clock time, in seconds, of an evaluation, checked between operations.
+  """
+
+
+  def __init__(
+      self,
+      max_elements: int=None,
+      max_exponent: float=None,
+      max_factorial: int=None,
+      timeout: float=None,
+      ):
+    self.max_elements = max_elements
+    self.max_exponent = max_exponent
+    self.max_factorial = max_factorial
+    self.timeout = timeout
+
+
+  def __repr__(self):
+    return "Budget(max_elements={}, max_exponent={}, max_factorial={}, timeout={})".format(
+        self.max_elements, self.max_exponent, self.max_factorial, self.timeout)
+
+
+  def check_elements(self, size: int):
+    """ Check the number of elements of a value about to be computed.
+    """
+    if (self.max_elements is not None) and (size is not None) and (size > self.max_elements):
+      raise ResourceLimitError("Result of {} elements exceeds the budget of {} elements.".format(size, self.max_elements))
+
+
+  def check_exponent(self, exponent: any):
+    """ Check the exponent of a power about to be computed.
+    """
+    if self.max_exponent is None or not isinstance(exponent, (Number, np.generic, np.ndarray)):
+      return
+    if np.size(exponent) > 0 and np.nanmax(np.abs(exponent)) > self.max_exponent:
+      raise ResourceLimitError("Exponent exceeds the budget of {}.".format(self.max_exponent))
+
+
+  def check_factorial(self, n: any):
+    """ Check the argument of a factorial about to be computed.
+    """
+    if self.max_factorial is None or not isinstance(n, (Number, np.generic, np.ndarray)):
+      return
+    if np.size(n) > 0 and np.max(n) > self.max_factorial:
+      raise ResourceLimitError("Factorial argument exceeds the budget of {}.".format(self.max_factorial))
+
+
+# The budget of the current evaluation and its deadline.
+_active = contextvars.ContextVar("lplot_budget", default=None)
+
+
+# The budget of the current evaluation and its deadline, None if there is no budget.
+# Bound directly, as it is called before every operation.
+active_budget = _active.get
+
+
+def check_deadline(active: tuple):
+  """ Raise if the deadline of the active budget has passed.
+  """
+  if (active[1] is not None) and (time.monotonic() > active[1]):
+    raise ResourceLimitError("Evaluation exceeds the budget of {} seconds.".format(active[0].timeout))
+
+
+@contextlib.contextmanager
+def use_budget(budget: Budget):
+  """
+  Evaluate the transforms of the context within a budget.
+
+  The clock of the timeout starts when entering the context. Entering the context
+  of the budget already active, or of None, keeps the active budget as it is.
+  """
+  active = _active.get()
+  if (budget is None) or ((active is not None) and (active[0] is budget)):
+    yield
+    return
+  deadline = None if budget.timeout is None else time.monotonic() + budget.timeout
+  token = _active.set((budget, deadline))
+  try:
+    yield
+  finally:
+    _active.reset(token)
+
+
+def bind_budget(func: callable) -> callable:
+  """ Wrap a function to run within the budget active now, e.g. in the threads of an executor.
+  """
+  active = _active.get()
+  if active is None:
+    return func
+  def _bound(*args, **kwargs):
+    token = _active.set(active)
+    try:
+      return func(*args, **kwargs)
+    finally:
+      _active.reset(token)
+  return _bound
+
+
+def result_size(*operands) -> int:
+  """
+  Number of elements of the result of an element-wise operation, estimated from its operands.
+
+  Sequences repeated by an integer count their repetitions. Returns None if it
+  cannot be estimated, e.g. if the operands do not broadcast.
+  """
+  if len(operands) == 2:
+    for sequence, count in (operands, operands[::-1]):
+      if isinstance(sequence, (list, tuple, str, bytes)) and isinstance(count, (int, np.integer)):
+        return len(sequence) * max(int(count), 0)
+  shapes = []
+  for operand in operands:
+    if isinstance(operand, np.ndarray):
+      shapes.append(operand.shape)
+    elif not isinstance(operand, (Number, np.generic)):
+      return None
+  try:
+    return int(np.prod(np.broadcast_shapes(*shapes), dtype=float))
+  except ValueError:
+    return None
@@ -0,0 +1,192 @@
+from typing import Iterable
+import numpy as np
+
+
+__all__ = ["GrowableArray", "RingBuffer", "array_from_iterable"]
+
+
+class GrowableArray:
+  """
+  A 2 dimentional array growing along its first axis
+
+  Rows are appended into a preallocated buffer which is resized geometrically
+  when full, so appending is amortized O(1) and the buffer is at most
+  ``growth`` times larger than the data it holds.
+
+  Parameters
+  ----------
+  ncols: int
+      Number of columns of the array.
+  dtype: np.dtype, default to float
+      Data type of the array.
+  capacity: int, default to 1024
+      Initial number of rows allocated.
+  growth: float, default to 1.5
+      Factor applied to the capacity each time the buffer is full.
+  """
+
+
+  def __init__(self, ncols: int, dtype: np.dtype=float, capacity: int=1024, growth: float=1.5):
+    if growth <= 1:
+      raise ValueError("Growth factor is expected to be larger than 1.")
+    self._data = np.empty((max(int(capacity), 1), ncols), dtype=dtype)
+    self._size = 0
+    self._growth = growth
+
+
+  def __len__(self):
+    return self._size
+
+
+  @property
+  def ncols(self) -> int:
+    return self._data.shape[1]
+
+
+  @property
+  def capacity(self) -> int:
+    return self._data.shape[0]
+
+
+  def _reserve(self, size: int):
+    """ Make sure the buffer can hold ``size`` rows.
+    """
+    if size <= self.capacity:
+      return
+    capacity = self.capacity
+    while capacity < size:
+      capacity = int(capacity * self._growth) + 1
+    # A new buffer, the arrays returned by ``finalize`` may still be views of the current one.
+    data = np.empty((capacity, self._data.shape[1]), dtype=self._data.dtype)
+    data[:self._size] = self._data[:self._size]
+    self._data = data
+
+
+  def append(self, row: Iterable):
+    """ Append a single row.
+    """
+    self._reserve(self._size + 1)
+    self._data[self._size] = row
+    self._size += 1
+
+
+  def extend(self, rows: np.ndarray):
+    """ Append a block of rows.
+    """
+    rows = np.asarray(rows)
+    self._reserve(self._size + len(rows))
+    self._data[self._size:self._size + len(rows)] = rows
+    self._size += len(rows)
+
+
+  def finalize(self) -> np.ndarray:
+    """ The data the buffer holds, without copy.
+
+    The returned array is a view of the rows appended so far, which the rows
+    appended afterwards leave unchanged.
+    """
+    return self._data[:self._size]
+
+
+class RingBuffer:
+  """
+  A fixed size buffer keeping the latest values appended to it
+
+  The values are stored twice, at ``i`` and ``i + capacity``, in a buffer of
+  twice the capacity, so the content is always available as a contiguous view
+  in chronological order without copying.
+
+  Parameters
+  ----------
+  capacity: int
+      Maximum number of values kept.
+  dtype: np.dtype, default to float
+      Data type of the buffer.
+  """
+
+
+  def __init__(self, capacity: int, dtype: np.dtype=float):
+    if capacity < 1:
+      raise ValueError("Capacity is expected to be a positive integer.")
+    self._capacity = int(capacity)
+    self._data = np.empty(2 * self._capacity, dtype=dtype)
+    self._start = 0
+    self._size = 0
+
+
+  def __len__(self):
+    return self._size
+
+
+  @property
+  def capacity(self) -> int:
+    return self._capacity
+
+
+  @property
+  def values(self) -> np.ndarray:
+    """ View of the content of the buffer, from the oldest to the latest value.
+    """
+    return self._data[self._start:self._start + self._size]
+
+
+  def append(self, value):
+    """ Append a single value, dropping the oldest one if the buffer is full.
+    """
+    end = (self._start + self._size) % self._capacity
+    self._data[end] = value
+    self._data[end + self._capacity] = value
+    if self._size < self._capacity:
+      self._size += 1
+    else:
+      self._start = (self._start + 1) % self._capacity
+
+
+  def extend(self, values: np.ndarray):
+    """ Append a sequence of values, dropping the oldest ones if the buffer is full.
+    """
+    values = np.asarray(values).ravel()[-self._capacity:]
+    n = len(values)
+    end = (self._start + self._size) % self._capacity
+    head = min(n, self._capacity - end)
+    for offset in (0, self._capacity):
+      self._data[offset + end:offset + end + head] = values[:head]
+      self._data[offset:offset + n - head] = values[head:]
+    self._size = min(self._size + n, self._capacity)
+    self._start = (end + n - self._size) % self._capacity
+
+
+def array_from_iterable(iterable: Iterable, dtype: np.dtype=float) -> np.ndarray:
+  """
+  Build a 2 dimentional array from an iterable of rows or of blocks of rows.
+
+  Each item can be a scalar (a row of a single column), a 1 dimentional row
+  or a 2 dimentional block of rows. All rows should have the same number of columns.
+
+  Parameters
+  ----------
+  iterable: Iterable
+      Rows or blocks of rows, e.g. a generator.
+  dtype: np.dtype, default to float
+      Data type of the array.
+
+  Returns
+  -------
+  data: np.ndarray
+  """
+  buffer = None
+  for item in iterable:
+    item = np.asarray(item, dtype=dtype)
+    if item.size == 0:
+      continue
+    if item.ndim > 2:
+      raise ValueError("Items are expected to be rows or 2 dimentional blocks of rows.")
+    block = item.reshape(-1, item.size if item.ndim < 2 else item.shape[1])
+    if buffer is None:
+      buffer = GrowableArray(ncols=block.shape[1], dtype=dtype)
+    elif block.shape[1] != buffer.ncols:
+      raise ValueError("Rows are expected to have the same number of columns.")
+    buffer.extend(block)
+  if buffer is None:
+    raise ValueError("Input iterable is empty.")
+  return buffer.finalize()
@@ -0,0 +1,140 @@
+import re
+import ast
+import numpy as np
+
+from lplot.safe_eval import safe_eval, valid_functions
+
+
+__all__ = ["DerivedDatasets"]
+
+
+_dataset_name = re.compile(r"^d(\d+)$")
+
+
+class DerivedDatasets:
+  """
+  Named datasets defined by expressions of other datasets, evaluated lazily.
+
+  The expressions refer to the y of the datasets of the plot as ``d0``, ``d1``...
+  and to other derived datasets by their name, which makes a dependency graph.
+  Evaluated datasets are memoized with the versions of the datasets they depend
+  on, so shared intermediates and unchanged outputs are never recomputed.
+  A derived dataset takes the x of the first dataset its expression refers to.
+  """
+
+
+  def __init__(self):
+    self._expressions = {}
+    self._memo = {}
+
+
+  def __len__(self):
+    return len(self._expressions)
+
+
+  @property
+  def names(self) -> list:
+    """ Names of the derived datasets, in the order they were defined.
+    """
+    return list(self._expressions)
+
+
+  def _dependencies(self, name: str) -> list:
+    """ Datasets and derived datasets an expression refers to, in the order they appear.
+    """
+    dependencies = []
+    for node in ast.walk(ast.parse(self._expressions[name], mode="eval")):
+      if isinstance(node, ast.Name) and node.id not in dependencies \
+          and (_dataset_name.match(node.id) or node.id in self._expressions):
+        dependencies.append(node.id)
+    return dependencies
+
+
+  def define(self, name: str, expression: str):
+    """
+    Define, or redefine, a derived dataset.
+
+    Parameters
+    ----------
+    name: str
+        Name of the derived dataset.
+    expression: str
+        Expression of ``d<i>``, the y of the i-th dataset, and of other derived datasets.
+
+    Raises
+    ------
+    ValueError
+        If the name is not valid or the definition makes a cycle.
+    """
+    if not name.isidentifier() or _dataset_name.match(name) or name in valid_functions:
+      raise ValueError("'{}' is not a valid name for a derived dataset.".format(name))
+    ast.parse(expression, mode="eval")
+    previous = self._expressions.get(name)
+    self._expressions[name] = expression
+    try:
+      self._check_cycles(name, [])
+    except ValueError:
+      if previous is None:
+        del self._expressions[name]
+      else:
+        self._expressions[name] = previous
+      raise
+
+
+  def _check_cycles(self, name: str, path: list):
+    if name in path:
+      raise ValueError("Derived datasets depend on themselves: {}.".format(" -> ".join(path + [name])))
+    for dependency in self._dependencies(name):
+      if dependency in self._expressions:
+        self._check_cycles(dependency, path + [name])
+
+
+  def evaluate(self, name: str, dataset: callable) -> tuple:
+    """
+    Evaluate a derived dataset.
+
+    Parameters
+    ----------
+    name: str
+        Name of the derived dataset.
+    dataset: callable
+        Function of the index of a dataset returning its x, y and version,
+        a value changing whenever the dataset changes.
+
+    Returns
+    -------
+    (x, y): tuple
+    """
+    return self._evaluate(name, dataset)[0]
+
+
+  def _evaluate(self, name: str, dataset: callable) -> tuple:
+    """ Evaluate a derived dataset, along with the key identifying its inputs.
+    """
+    if name not in self._expressions:
+      raise KeyError("Derived dataset '{}' is not defined.".format(name))
+    x = None
+    variables = {}
+    keys = []
+    for dependency in self._dependencies(name):
+      match = _dataset_name.match(dependency)
+      if match:
+        dependency_x, dependency_y, version = dataset(int(match.group(1)))
+        key = (dependency, version)
+      else:
+        (dependency_x, dependency_y), key = self._evaluate(dependency, dataset)
+      if x is None:
+        x = dependency_x
+      variables[dependency] = dependency_y
+      keys.append(key)
+    key = (self._expressions[name], tuple(keys))
+    memo = self._memo.get(name)
+    if memo is not None and memo[0] == key:
+      return memo[1], key
+    y = safe_eval(self._expressions[name], locals=variables)
+    if x is None:
+      x = np.arange(len(y))
+    if np.ndim(y) < 1 or len(y) != len(x):
+      raise ValueError("Derived dataset '{}' does not have the length of its x.".format(name))
+    self._memo[name] = (key, (x, y))
+    return self._memo[name][1], key
@@ -0,0 +1,154 @@
+import numpy as np
+
+from lplot.grids import group_by_x
+
+
+__all__ = ["FitResult", "fit_kinds", "lstsq_fit", "fit_datasets"]
+
+
+fit_kinds = ("poly", "linear", "exp")
+
+
+def _degree(kind: str, degree: int) -> int:
+  """ Degree of the polynomial fitted for a kind of fit.
+  """
+  if kind not in fit_kinds:
+    raise ValueError("Unknown fit '{}', available fits are {}.".format(kind, ", ".join(fit_kinds)))
+  if kind != "poly":
+    return 1
+  if int(degree) != degree or degree < 0:
+    raise ValueError("Degree of the polynomial is expected to be a non-negative integer.")
+  return int(degree)
+
+
+def lstsq_fit(x: np.ndarray, Y: np.ndarray, kind: str="poly", degree: int=1) -> tuple:
+  """
+  Fit all the columns of ``Y``, sampled at the same ``x``, in a single least squares solve.
+
+  The least squares solution is the product of the pseudo-inverse of the Vandermonde
+  matrix with ``Y``. The columns of the Vandermonde matrix are scaled to unit norm
+  before solving, as ``np.polyfit`` does, to keep high degree fits well conditioned.
+
+  Parameters
+  ----------
+  x: np.ndarray
+      Shared x of the columns, 1 dimentional.
+  Y: np.ndarray
+      Values to fit, one column per curve.
+  kind: str, default to "poly"
+      "poly" for a polynomial of degree ``degree``, "linear" for a straight line, and
+      "exp" for ``A * exp(B * x)``, fitted as a straight line through ``log(y)``.
+  degree: int, default to 1
+      Degree of the polynomial, only used by "poly" fits.
+
+  Returns
+  -------
+  (coefficients, fitted): tuple
+      The coefficients, one row per column of ``Y``, highest power first as ``np.polyfit``,
+      ``(B, A)`` for exponential fits, and the fitted values, with the shape of ``Y``.
+  """
+  degree = _degree(kind, degree)
+  x = np.asarray(x, dtype=float)
+  Y = np.asarray(Y, dtype=float)
+  if kind == "exp":
+    if np.any(Y <= 0):
+      raise ValueError("Exponential fits need positive values.")
+    Y = np.log(Y)
+  vander = np.vander(x, degree + 1)
+  scale = np.sqrt((vander * vander).sum(axis=0))
+  scale[scale == 0] = 1.
+  vander /= scale
+  # The pseudo-inverse of the small Vandermonde matrix turns the solve for all the columns into a product.
+  solution = np.linalg.pinv(vander) @ Y
+  fitted = vander @ solution
+  coefficients = (solution / scale[:, None]).T
+  if kind == "exp":
+    fitted = np.exp(fitted)
+    coefficients[:, 1] = np.exp(coefficients[:, 1])
+  return coefficients, fitted
+
+
+class FitResult:
+  """
+  Fits of a list of datasets.
+
+  Parameters
+  ----------
+  kind: str
+      Kind of fit, see ``lstsq_fit``.
+  degree: int
+      Degree of the fitted polynomial.
+  x: list
+      x of the datasets.
+  coefficients: list
+      Coefficients of the fit of each dataset, an array of shape ``(ncoef, )``,
+      or ``(ncolumns, ncoef)`` for datasets of several columns.
+  curves: list
+      Fitted values of each dataset, with the shape of its y.
+  labels: list, default to None
+      Labels of the datasets.
+  """
+
+
+  def __init__(self, kind: str, degree: int, x: list, coefficients: list, curves: list, labels: list=None):
+    self.kind = kind
+    self.degree = degree
+    self.x = x
+    self.coefficients = coefficients
+    self.curves = curves
+    self.labels = labels
+
+
+  def __len__(self):
+    return len(self.coefficients)
+
+
+  def table(self) -> np.ndarray:
+    """ Coefficients of all the fitted columns, one row per column.
+    """
+    return np.vstack([np.atleast_2d(coefficients) for coefficients in self.coefficients])
+
+
+  def save(self, filename: str):
+    """ Save the coefficients as a text table, one row per fitted column, labelled in the header.
+    """
+    header = ["{} fit of degree {}, highest power first".format(self.kind, self.degree)]
+    if self.labels is not None:
+      for label, coefficients in zip(self.labels, self.coefficients):
+        header.extend([str(label)] * len(np.atleast_2d(coefficients)))
+    np.savetxt(filename, self.table(), header="\n".join(header))
+
+
+def fit_datasets(X: list, Y: list, kind: str="poly", degree: int=1, labels: list=None) -> FitResult:
+  """
+  Fit a list of datasets, with a single least squares solve per distinct x.
+
+  Parameters
+  ----------
+  X: list
+      x of the datasets.
+  Y: list
+      y of the datasets, 1 dimentional or one column per curve.
+  kind: str, default to "poly"
+      Kind of fit, see ``lstsq_fit``.
+  degree: int, default to 1
+      Degree of the polynomial, only used by "poly" fits.
+  labels: list, default to None
+      Labels of the datasets.
+
+  Returns
+  -------
+  fits: FitResult
+  """
+  degree = _degree(kind, degree)
+  coefficients = [None] * len(Y)
+  curves = [None] * len(Y)
+  for group in group_by_x(X):
+    columns = [np.asarray(Y[i], dtype=float).reshape(len(X[i]), -1) for i in group]
+    group_coefficients, fitted = lstsq_fit(X[group[0]], np.hstack(columns), kind, degree)
+    bounds = np.cumsum([0] + [column.shape[1] for column in columns])
+    for i, start, stop in zip(group, bounds[:-1], bounds[1:]):
+      shape = np.shape(Y[i])
+      coefficients[i] = group_coefficients[start] if len(shape) == 1 else group_coefficients[start:stop]
+      curves[i] = fitted[:, start:stop].reshape(shape)
+  return FitResult(kind, degree, list(X), coefficients, curves, labels)
@@ -0,0 +1,269 @@
+from typing import Union
+import numpy as np
+
+
+__all__ = [
+    "group_by_x", "union_grid", "intersection_grid", "parse_grid", "interpolation_weights", "resample",
+    "join_kinds", "join",
+    ]
+
+
+join_kinds = ("inner", "outer", "asof")
+
+
+def group_by_x(X: list) -> list:
+  """
+  Group datasets by their x.
+
+  Datasets sharing the same x array, as the columns of a data file, are grouped
+  by identity, the others by the content of their x.
+
+  Returns
+  -------
+  groups: list
+      Lists of the indices of the datasets of each group.
+  """
+  groups = {}
+  keys = {}
+  for i, x in enumerate(X):
+    key = keys.get(id(x))
+    if key is None:
+      x = np.ascontiguousarray(x)
+      key = keys[id(X[i])] = (x.shape, x.dtype.str, x.tobytes())
+    groups.setdefault(key, []).append(i)
+  return list(groups.values())
+
+
+def union_grid(X: list) -> np.ndarray:
+  """ Sorted union of the x of the datasets.
+  """
+  return np.unique(np.concatenate([np.ravel(X[group[0]]) for group in group_by_x(X)]))
+
+
+def intersection_grid(X: list) -> np.ndarray:
+  """ Points of the union of the x of the datasets within the range covered by all of them.
+  """
+  grid = union_grid(X)
+  lower = max(np.min(x) for x in X)
+  upper = min(np.max(x) for x in X)
+  return grid[(grid >= lower) & (grid <= upper)]
+
+
+def parse_grid(spec: Union[str, np.ndarray], X: list) -> np.ndarray:
+  """
+  Build a grid from its specification.
+
+  Parameters
+  ----------
+  spec: Union[str, np.ndarray]
+      "union" or "intersection" of the x of the datasets, "<start>:<stop>:<num>"
+      for ``num`` evenly spaced points, or the grid itself.
+  X: list
+      x of the datasets.
+  """
+  if not isinstance(spec, str):
+    grid = np.asarray(spec, dtype=float)
+  elif spec == "union":
+    grid = union_grid(X)
+  elif spec == "intersection":
+    grid = intersection_grid(X)
+  else:
+    try:
+      start, stop, num = spec.split(":")
+      grid = np.linspace(float(start), float(stop), int(num))
+    except ValueError:
+      raise ValueError("Grid is expected to be 'union', 'intersection' or '<start>:<stop>:<num>', got '{}'.".format(spec))
+  if grid.ndim != 1:
+    raise ValueError("Grid is expected to be 1 dimentional.")
+  return grid
+
+
+def interpolation_weights(x: np.ndarray, grid: np.ndarray) -> tuple:
+  """
+  Weights of the linear interpolation from sorted points ``x`` onto ``grid``, from a single ``searchsorted``.
+
+  The interpolated values are ``(1 - weight) * y[index] + weight * y[index + 1]``.
+
+  Returns
+  -------
+  (index, weight, outside): tuple
+      The index of the point of ``x`` left of each point of the grid, the weight of the
+      point right of it, and whether the point of the grid is outside the range of ``x``.
+  """
+  n = len(x)
+  outside = (grid < x[0]) | (grid > x[-1])
+  index = np.clip(np.searchsorted(x, grid, side="right") - 1, 0, max(n - 2, 0))
+  if n < 2:
+    return index, np.zeros(len(grid)), outside
+  left = x[index]
+  step = x[index + 1] - left
+  with np.errstate(divide="ignore", invalid="ignore"):
+    weight = np.where(step > 0, (grid - left) / step, 0.)
+  return index, weight, outside
+
+
+def _sources(X: list, Y: list) -> list:
+  """ Tables of x and columns of y, sorted by x, of the groups of datasets sharing the same x.
+  """
+  sources = []
+  for group in group_by_x(X):
+    x = np.asarray(X[group[0]], dtype=float)
+    columns = np.hstack([np.asarray(Y[i], dtype=float).reshape(len(x), -1) for i in group])
+    if np.any(x[1:] < x[:-1]):
+      order = np.argsort(x, kind="stable")
+      x, columns = x[order], columns[order]
+    sources.append((group, x, columns))
+  return sources
+
+
+def resample(X: list, Y: list, grid: np.ndarray) -> list:
+  """
+  Interpolate datasets linearly onto a grid, NaN outside of their range.
+
+  The interpolation weights are computed once per distinct x, and applied to
+  all the columns of the datasets sharing it at once.
+
+  Parameters
+  ----------
+  X: list
+      x of the datasets.
+  Y: list
+      y of the datasets, 1 dimentional or one column per curve.
+  grid: np.ndarray
+      The common grid.
+
+  Returns
+  -------
+  Y: list
+      The resampled y of the datasets.
+  """
+  grid = np.asarray(grid, dtype=float)
+  resampled = [None] * len(Y)
+  for group, x, columns in _sources(X, Y):
+    index, weight, outside = interpolation_weights(x, grid)
+    values = columns[index] * (1 - weight)[:, None]
+    if len(x) > 1:
+      values += columns[index + 1] * weight[:, None]
+    values[outside] = np.nan
+    start = 0
+    for i in group:
+      shape = np.shape(Y[i])
+      stop = start + (shape[1] if len(shape) > 1 else 1)
+      resampled[i] = values[:, start:stop].reshape((len(grid), ) + shape[1:])
+      start = stop
+  return resampled
+
+
+def _merge_rows(keys: list) -> tuple:
+  """
+  Merge sorted keys into their sorted distinct values.
+
+  The keys are concatenated and sorted with a stable sort, which merges the sorted
+  runs in linear time, and the distinct values are numbered with a cumulative sum.
+
+  Returns
+  -------
+  (merged, rows): tuple
+      The distinct keys, and for each input the row of its keys in them.
+  """
+  concatenated = np.concatenate(keys)
+  order = np.argsort(concatenated, kind="stable")
+  ordered = concatenated[order]
+  distinct = np.ones(len(ordered), dtype=bool)
+  distinct[1:] = ordered[1:] != ordered[:-1]
+  rows = np.empty(len(ordered), dtype=np.intp)
+  rows[order] = np.cumsum(distinct) - 1
+  bounds = np.cumsum([0] + [len(key) for key in keys])
+  return ordered[distinct], [rows[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def _asof_rows(left: np.ndarray, right: np.ndarray, tolerance: float) -> tuple:
+  """
+  Rows of the sorted keys ``right`` nearest to each of the sorted keys ``left``.
+
+  Both keys are merged with a stable sort, and the number of keys of ``right`` before
+  each key of ``left``, a cumulative sum, gives its neighbours in ``right``.
+
+  Returns
+  -------
+  (rows, found): tuple
+      The nearest rows, and whether they are within the tolerance.
+  """
+  concatenated = np.concatenate([right, left])
+  order = np.argsort(concatenated, kind="stable")
+  from_right = order < len(right)
+  before = np.empty(len(concatenated), dtype=np.intp)
+  before[order] = np.cumsum(from_right)
+  before = before[len(right):]
+  previous = np.clip(before - 1, 0, len(right) - 1)
+  following = np.clip(before, 0, len(right) - 1)
+  use_following = np.abs(right[following] - left) < np.abs(left - right[previous])
+  rows = np.where(use_following, following, previous)
+  found = np.ones(len(left), dtype=bool)
+  if tolerance is not None:
+    found = np.abs(right[rows] - left) <= tolerance
+  return rows, found
+
+
+def join(X: list, Y: list, how: str="outer", tolerance: float=None) -> tuple:
+  """
+  Join datasets on their x into a single table.
+
+  Datasets sharing the same x, as the columns of a file, are joined together.
+  Duplicated x of a dataset keep their last value.
+
+  Parameters
+  ----------
+  X: list
+      x of the datasets.
+  Y: list
+      y of the datasets, 1 dimentional or one column per curve.
+  how: str, default to "outer"
+      "inner" keeps the x found in all the datasets, "outer" the x found in any
+      of them, missing values being NaN, and "asof" keeps the x of the first dataset
+      and takes the values of the other ones at their nearest x.
+  tolerance: float, default to None
+      Largest distance to the nearest x in "asof" joins, beyond which values are NaN.
+
+  Returns
+  -------
+  (x, y, columns): tuple
+      The joined x, the table of the columns of all the datasets, and the
+      indices in the table of the columns of each dataset.
+  """
+  if how not in join_kinds:
+    raise ValueError("Unknown join '{}', available joins are {}.".format(how, ", ".join(join_kinds)))
+  sources = _sources(X, Y)
+  if how == "asof":
+    x = sources[0][1]
+    rows = [np.arange(len(x))]
+    found = [np.ones(len(x), dtype=bool)]
+    for group, source_x, columns in sources[1:]:
+      source_rows, source_found = _asof_rows(x, source_x, tolerance)
+      rows.append(source_rows)
+      found.append(source_found)
+  else:
+    x, rows = _merge_rows([source_x for group, source_x, columns in sources])
+  ncolumns = [columns.shape[1] for group, source_x, columns in sources]
+  y = np.full((len(x), sum(ncolumns)), np.nan)
+  present = np.zeros((len(x), len(sources)), dtype=bool)
+  start = 0
+  for i, (group, source_x, columns) in enumerate(sources):
+    if how == "asof":
+      y[found[i], start:start + ncolumns[i]] = columns[rows[i][found[i]]]
+    else:
+      y[rows[i], start:start + ncolumns[i]] = columns
+      present[rows[i], i] = True
+    start += ncolumns[i]
+  if how == "inner":
+    keep = present.all(axis=1)
+    x, y = x[keep], y[keep]
+  # Columns of each dataset in the table.
+  columns = [None] * len(Y)
+  start = 0
+  for group, source_x, source_columns in sources:
+    for i in group:
+      stop = start + (np.shape(Y[i])[1] if np.ndim(Y[i]) > 1 else 1)
+      columns[i] = list(range(start, stop))
+      start = stop
+  return x, y, columns
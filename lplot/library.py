@@ -0,0 +1,214 @@
+import re
+import ast
+import copy
+from typing import Union
+
+from lplot.safe_eval import CompiledTransform, compile_transform
+
+
+__all__ = ["TransformLibrary"]
+
+
+# References ``@name`` are renamed to valid identifiers before parsing.
+_reference_prefix = "__library__"
+_reference = re.compile(r"@\s*([A-Za-z_]\w*)")
+
+
+class _Substituter(ast.NodeTransformer):
+  """ Replace the parameters of a macro by the expressions of its arguments.
+  """
+
+  def __init__(self, arguments: dict):
+    self._arguments = arguments
+
+  def visit_Name(self, node):
+    if node.id not in self._arguments:
+      return node
+    if not isinstance(node.ctx, ast.Load):
+      raise ValueError("Parameter '{}' of a library transform cannot be assigned to.".format(node.id))
+    return ast.copy_location(copy.deepcopy(self._arguments[node.id]), node)
+
+
+class TransformLibrary:
+  """
+  Named transforms and macros, referred to as ``@name`` in other transforms.
+
+  Definitions are parsed and validated once when the library is loaded, and the
+  references are expanded into the statements they name on the syntax tree, so
+  that the expanded transform is optimized and compiled as a whole. Transforms
+  are compiled once per library and source, a library can thus be shared by many plots.
+
+  Parameters
+  ----------
+  definitions: dict, default to None
+      Transforms by name, e.g. ``{"normalize": "y = y / max(y)"}``. Macros take
+      parameters, replaced by the expressions of their arguments, as in
+      ``{"scale(factor, offset=0)": "y = y * factor + offset"}`` used as ``@scale(2)``.
+      Definitions can refer to each other.
+  """
+
+
+  def __init__(self, definitions: dict=None):
+    self._definitions = {}
+    self._compiled = {}
+    for key, source in (definitions or {}).items():
+      self.define(key, source)
+    # Expand and validate every definition once, which reports the errors at load,
+    # and compile the transforms needing no arguments. Macros are validated with
+    # placeholder arguments.
+    for name, (parameters, defaults, tree) in self._definitions.items():
+      if len(defaults) == len(parameters):
+        self.compile(name)
+      else:
+        CompiledTransform(self.expand("@{}({})".format(name, ", ".join(["0"] * (len(parameters) - len(defaults))))))
+
+
+  def __contains__(self, name: str) -> bool:
+    return name in self._definitions
+
+
+  def __len__(self):
+    return len(self._definitions)
+
+
+  @property
+  def names(self) -> list:
+    return list(self._definitions)
+
+
+  def define(self, key: str, source: str):
+    """
+    Add a transform or a macro to the library.
+
+    Parameters
+    ----------
+    key: str
+        Name of the transform, or signature of the macro, e.g. ``scale(factor, offset=0)``.
+    source: str
+        Statements of the transform.
+    """
+    try:
+      signature = ast.parse("def {}: pass".format(key if "(" in key else key + "()")).body[0]
+    except SyntaxError:
+      raise ValueError("'{}' is not a valid name for a library transform.".format(key)) from None
+    arguments = signature.args
+    if arguments.vararg or arguments.kwarg or arguments.kwonlyargs or getattr(arguments, "posonlyargs", None):
+      raise ValueError("Library transform '{}' only takes plain parameters.".format(key))
+    parameters = [arg.arg for arg in arguments.args]
+    defaults = dict(zip(parameters[len(parameters) - len(arguments.defaults):], arguments.defaults))
+    tree = self._parse(source)
+    for node in ast.walk(tree):
+      if isinstance(node, ast.Name) and node.id in parameters and not isinstance(node.ctx, ast.Load):
+        raise ValueError("Parameter '{}' of library transform '{}' cannot be assigned to.".format(node.id, signature.name))
+    self._definitions[signature.name] = (parameters, defaults, tree)
+    self._compiled.clear()
+
+
+  def _parse(self, source: str) -> ast.Module:
+    return ast.parse(_reference.sub(_reference_prefix + r"\1", source), mode="exec")
+
+
+  def _bind(self, name: str, call: ast.Call) -> dict:
+    """ Expressions of the parameters of a macro for the arguments of a reference.
+    """
+    parameters, defaults, tree = self._definitions[name]
+    if len(call.args) > len(parameters):
+      raise TypeError("Library transform '{}' takes {} arguments.".format(name, len(parameters)))
+    arguments = dict(zip(parameters, call.args))
+    for keyword in call.keywords:
+      if keyword.arg not in parameters or keyword.arg in arguments:
+        raise TypeError("Unexpected argument '{}' of library transform '{}'.".format(keyword.arg, name))
+      arguments[keyword.arg] = keyword.value
+    for parameter in parameters:
+      if parameter not in arguments:
+        if parameter not in defaults:
+          raise TypeError("Missing argument '{}' of library transform '{}'.".format(parameter, name))
+        arguments[parameter] = defaults[parameter]
+    return arguments
+
+
+  def _referenced(self, statement: ast.stmt) -> tuple:
+    """ Name and call of the reference a statement consists of, None if it is not a reference.
+    """
+    if not isinstance(statement, ast.Expr):
+      return None
+    call = statement.value if isinstance(statement.value, ast.Call) else None
+    node = call.func if call is not None else statement.value
+    if isinstance(node, ast.Name) and node.id.startswith(_reference_prefix):
+      return node.id[len(_reference_prefix):], call or ast.Call(func=node, args=[], keywords=[])
+    return None
+
+
+  def _expand_definition(self, name: str, stack: list, arguments: dict) -> list:
+    if name in stack:
+      raise ValueError("Library transforms refer to themselves: {}.".format(" -> ".join(stack + [name])))
+    return self._expand(self._definitions[name][2].body, stack + [name], arguments)
+
+
+  def _expand(self, body: list, stack: list, arguments: dict=None) -> list:
+    """ Replace the references by the statements they name, recursively.
+
+    The parameters of a macro are substituted in its own statements, including the
+    arguments of its references, before these are expanded, so that the statements
+    of the transforms it refers to keep their own names.
+    """
+    substituter = _Substituter(arguments) if arguments else None
+    statements = []
+    for statement in body:
+      # Definitions are shared by all their expansions, which get copies.
+      statement = copy.deepcopy(statement)
+      if substituter is not None:
+        statement = substituter.visit(statement)
+      reference = self._referenced(statement)
+      if reference is None:
+        for node in ast.walk(statement):
+          if isinstance(node, ast.Name) and node.id.startswith(_reference_prefix):
+            raise ValueError("Library transform '{}' can only be used as a statement.".format(node.id[len(_reference_prefix):]))
+        statements.append(statement)
+        continue
+      name, call = reference
+      if name not in self._definitions:
+        raise NameError("Library transform '{}' is not defined.".format(name))
+      statements.extend(self._expand_definition(name, stack, self._bind(name, call)))
+    return statements
+
+
+  def expand(self, source: str) -> ast.Module:
+    """ Parse a transform and expand its references to the library.
+    """
+    body = self._expand(self._parse(source).body, [])
+    return ast.fix_missing_locations(ast.Module(body=body, type_ignores=[]))
+
+
+  def compile(self, source: Union[str, CompiledTransform]) -> CompiledTransform:
+    """
+    Compile a transform referring to the library, once per source.
+
+    Parameters
+    ----------
+    source: Union[str, CompiledTransform]
+        The transform, e.g. ``"@normalize; y = y + 1"``, or the name of a
+        transform of the library. Returned as is if already compiled.
+
+    Returns
+    -------
+    transform: CompiledTransform
+    """
+    if source is None or isinstance(source, CompiledTransform):
+      return source
+    if source in self._definitions:
+      source = "@" + source
+    if source not in self._compiled:
+      if _reference.search(source) is None:
+        self._compiled[source] = compile_transform(source)
+      else:
+        self._compiled[source] = CompiledTransform(self.expand(source))
+    return self._compiled[source]
+
+
+  def __getitem__(self, name: str) -> CompiledTransform:
+    """ The compiled transform of a name, with the default arguments of a macro.
+    """
+    if name not in self._definitions:
+      raise KeyError("Library transform '{}' is not defined.".format(name))
+    return self.compile("@" + name)
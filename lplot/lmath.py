@@ -1,10 +1,80 @@
 import math
+import numpy as np
 
 
-gcd = math.gcd
+gcd = np.gcd
 
 
-def factorial(x: int) -> int:
-  """ Compute factorial of input x -> x!.
+# Largest integers whose factorial fits in an int64, and in a float64.
+_max_int_factorial = 20
+_max_float_factorial = 170
+_int_factorials = np.array([math.factorial(n) for n in range(_max_int_factorial + 1)], dtype=np.int64)
+_float_factorials = np.array([float(math.factorial(n)) for n in range(_max_float_factorial + 1)])
+# Logarithms of the factorials below which the Stirling series is not accurate to double precision.
+_log_factorials = np.concatenate([[0.], np.cumsum(np.log(np.arange(1., 256.)))])
+# Pascal's triangle up to the largest row whose binomial coefficients all fit in an int64.
+_max_int_binomial = 66
+_binomials = np.array([[math.comb(n, k) for k in range(_max_int_binomial + 1)]
+    for n in range(_max_int_binomial + 1)], dtype=np.int64)
+
+
+def _integers(x, name: str) -> np.ndarray:
+  """ Array of non-negative integers from an array of integral values.
+  """
+  x = np.asarray(x)
+  if x.dtype.kind not in "iub":
+    if x.dtype.kind != "f" or np.any(x != np.round(x)):
+      raise ValueError("{} is only defined for integers.".format(name))
+  if np.any(x < 0):
+    raise ValueError("{} is not defined for negative values.".format(name))
+  return x.astype(np.int64)
+
+
+def factorial(x):
+  """
+  Compute factorial of input x -> x!.
+
+  Scalars are computed exactly. Arrays are looked up in precomputed tables, as
+  int64 if all the factorials fit in it, else as float64, infinite above 170!.
+  """
+  if np.ndim(x) == 0:
+    return math.factorial(int(_integers(x, "Factorial")))
+  x = _integers(x, "Factorial")
+  if x.size == 0 or x.max() <= _max_int_factorial:
+    return _int_factorials[x]
+  return np.where(x <= _max_float_factorial, _float_factorials[np.minimum(x, _max_float_factorial)], np.inf)
+
+
+def log_factorial(x):
+  """
+  Compute the natural logarithm of the factorial of x, log(x!), without overflow.
+
+  Small values are looked up in a precomputed table, larger ones are evaluated
+  with the Stirling series of the gamma function.
+  """
+  x = _integers(x, "Factorial")
+  small = x < len(_log_factorials)
+  n = np.maximum(x, len(_log_factorials)).astype(float)
+  inverse = 1. / n
+  stirling = n * np.log(n) - n + 0.5 * np.log(2 * np.pi * n) \
+      + inverse * (1. / 12 - inverse ** 2 * (1. / 360 - inverse ** 2 / 1260))
+  result = np.where(small, _log_factorials[np.where(small, x, 0)], stirling)
+  return result[()] if result.ndim == 0 else result
+
+
+def binomial(n, k):
+  """
+  Compute the binomial coefficient of n and k, the number of ways to choose k items among n.
+
+  Scalars are computed exactly. Arrays, broadcast together, are looked up in Pascal's triangle
+  if all the coefficients fit in an int64, else computed as float64 from the log-factorials.
+  The coefficient is 0 if k is larger than n.
   """
-  return x * factorial(x - 1) if x != 1 else 1
+  if np.ndim(n) == 0 and np.ndim(k) == 0:
+    return math.comb(int(_integers(n, "Binomial coefficient")), int(_integers(k, "Binomial coefficient")))
+  n, k = np.broadcast_arrays(_integers(n, "Binomial coefficient"), _integers(k, "Binomial coefficient"))
+  valid = k <= n
+  if n.size == 0 or n.max() <= _max_int_binomial:
+    return np.where(valid, _binomials[n, np.minimum(k, n)], 0)
+  k = np.where(valid, np.minimum(k, n - k), 0)
+  return np.where(valid, np.round(np.exp(log_factorial(n) - log_factorial(k) - log_factorial(n - k))), 0.)
@@ -0,0 +1,222 @@
+import os
+import re
+import fnmatch
+import threading
+from typing import Callable
+import numpy as np
+
+from lplot.unit_conversion import energy
+
+
+__all__ = ["load_data", "clear_load_cache", "register_format", "guess_format", "formats"]
+
+
+_load_cache = {}
+_load_cache_lock = threading.Lock()
+
+formats = {}
+_format_patterns = []
+
+
+def register_format(name: str, reader: Callable=None, patterns: list=()):
+  """
+  Register a reader for a data file format.
+
+  A reader takes the path to a file and loader options as keyword arguments,
+  and returns a 2 dimentional array whose first column is x and the rest are y.
+  Can be used as a decorator when ``reader`` is omitted.
+
+  Parameters
+  ----------
+  name: str
+      Name of the format.
+  reader: Callable, default to None
+      The reader function.
+  patterns: list, default to ()
+      Glob patterns on the file name used to guess the format. The readers
+      registered here have none, they change the data, so they are only used
+      when selected.
+  """
+  def _register(reader):
+    formats[name] = reader
+    for pattern in patterns:
+      _format_patterns.append((pattern, name))
+    return reader
+  if reader is None:
+    return _register
+  return _register(reader)
+
+
+def guess_format(filename: str) -> str:
+  """ Guess the format of a data file from its name, default to "text".
+  """
+  basename = os.path.basename(filename)
+  for pattern, name in _format_patterns:
+    if fnmatch.fnmatch(basename, pattern):
+      return name
+  return "text"
+
+
+@register_format("text")
+def read_text(filename: str, **options) -> np.ndarray:
+  """ Read a plain text table with ``np.loadtxt``.
+  """
+  return np.loadtxt(filename, **options)
+
+
+@register_format("bands")
+def read_bands(filename: str, column: int=1, unit: str="eV") -> np.ndarray:
+  """
+  Read a band structure written as consecutive blocks of (k, E) rows, one block per band,
+  as from Quantum ESPRESSO ``bands.x`` or Wannier90.
+
+  Blocks are found where k drops back to the start of the path, and reshaped
+  at once into a table of k and one column per band.
+
+  Parameters
+  ----------
+  filename: str
+      Path to the data file.
+  column: int, default to 1
+      Column of the energies.
+  unit: str, default to "eV"
+      Unit of the returned energies, the file is in eV.
+  """
+  data = np.loadtxt(filename, ndmin=2)
+  k = data[:, 0]
+  starts = np.flatnonzero(k[1:] < k[:-1]) + 1
+  nk = starts[0] if len(starts) else len(k)
+  if (len(k) % nk != 0) or not np.array_equal(starts, np.arange(nk, len(k), nk)):
+    raise ValueError("Bands in '{}' do not have the same number of k points.".format(filename))
+  bands = data[:, column].reshape(-1, nk).T * energy("eV", unit)
+  return np.column_stack([k[:nk], bands])
+
+
+_efermi_regex = re.compile(r"EFermi\s*=\s*([-+0-9.eEdD]+)")
+
+
+@register_format("dos")
+def read_dos(filename: str, shift_fermi: bool=True, unit: str="eV") -> np.ndarray:
+  """
+  Read a density of states from Quantum ESPRESSO ``dos.x``.
+
+  Parameters
+  ----------
+  filename: str
+      Path to the data file.
+  shift_fermi: bool, default to True
+      Shift the energies to put the Fermi level found in the header at 0.
+  unit: str, default to "eV"
+      Unit of the returned energies, the file is in eV.
+  """
+  with open(filename, "r") as f:
+    header = f.readline()
+  data = np.loadtxt(filename, ndmin=2)
+  match = _efermi_regex.search(header)
+  if shift_fermi and match:
+    data[:, 0] -= float(match.group(1).replace("d", "e").replace("D", "e"))
+  data[:, 0] *= energy("eV", unit)
+  return data
+
+
+@register_format("doscar")
+def read_doscar(filename: str, site: int=0, shift_fermi: bool=True, unit: str="eV") -> np.ndarray:
+  """
+  Read a density of states from VASP ``DOSCAR``.
+
+  Parameters
+  ----------
+  filename: str
+      Path to the data file.
+  site: int, default to 0
+      Block of the file to read, 0 is the total DOS, i > 0 is the projected DOS of the i-th ion.
+  shift_fermi: bool, default to True
+      Shift the energies to put the Fermi level at 0.
+  unit: str, default to "eV"
+      Unit of the returned energies, the file is in eV.
+  """
+  with open(filename, "r") as f:
+    for i in range(6):
+      header = f.readline()
+  emax, emin, nedos, efermi = header.split()[:4]
+  nedos = int(nedos)
+  # Every block is a header line followed by NEDOS rows, jump straight to the requested one.
+  data = np.loadtxt(filename, skiprows=6 + site * (nedos + 1), max_rows=nedos, ndmin=2)
+  if shift_fermi:
+    data[:, 0] -= float(efermi)
+  data[:, 0] *= energy("eV", unit)
+  return data
+
+
+def _hashable(value):
+  """ Lists and arrays of loader options as tuples, e.g. ``usecols=[0, 1]``.
+  """
+  if isinstance(value, (list, tuple, np.ndarray)):
+    return tuple(_hashable(item) for item in value)
+  return value
+
+
+def _cache_key(filename: str, fmt: str, options: dict) -> tuple:
+  """ Build the cache key of a file load from its resolved path and the loader options.
+
+  The modification time and size of the file are part of the key, so a file
+  rewritten during the process is parsed again instead of served stale.
+  Returns None if the options cannot be part of a key, the load is then not cached.
+  """
+  path = os.path.realpath(filename)
+  stat = os.stat(path)
+  key = (path, stat.st_mtime_ns, stat.st_size, fmt,
+      tuple(sorted((name, _hashable(value)) for name, value in options.items())))
+  try:
+    hash(key)
+  except TypeError:
+    return None
+  return key
+
+
+def load_data(filename: str, fmt: str=None, cache: bool=True, **options) -> np.ndarray:
+  """
+  Load a data file into a numpy array with the reader of its format.
+
+  Each file is parsed only once per process for a given set of loader options,
+  subsequent loads return the same cached array. The cached array is marked
+  read-only, callers that need to modify the data have to take a copy.
+
+  Parameters
+  ----------
+  filename: str
+      Path to the data file.
+  fmt: str, default to None
+      Name of the registered format, if None, it is guessed from the file name.
+  cache: bool, default to True
+      Whether to look up and store the parsed array in the load cache.
+  options:
+      Keyword arguments passed to the reader.
+
+  Returns
+  -------
+  data: np.ndarray
+  """
+  if fmt is None:
+    fmt = guess_format(filename)
+  if fmt not in formats:
+    raise ValueError("Unknown data format '{fmt}'.".format(fmt=fmt))
+  reader = formats[fmt]
+  key = _cache_key(filename, fmt, options) if cache else None
+  if key is None:
+    return reader(filename, **options)
+  with _load_cache_lock:
+    data = _load_cache.get(key)
+  if data is None:
+    data = reader(filename, **options)
+    data.flags.writeable = False
+    with _load_cache_lock:
+      data = _load_cache.setdefault(key, data)
+  return data
+
+
+def clear_load_cache():
+  """ Drop all the arrays held in the load cache.
+  """
+  with _load_cache_lock:
+    _load_cache.clear()
@@ -1,12 +1,24 @@
 import glob
 import argparse
-from typing import Union
+import itertools
+from typing import Union, Iterable
+from concurrent.futures import Executor, ThreadPoolExecutor
 from abc import ABC, abstractmethod, abstractproperty
 import yaml
 import numpy as np
 import matplotlib.pyplot as plt
 
-from lplot.safe_eval import safe_exec
+from lplot.safe_eval import CompiledTransform, compile_transform, safe_eval
+from lplot.loaders import load_data, formats
+from lplot.buffers import RingBuffer, array_from_iterable
+from lplot.fitting import FitResult, fit_datasets, fit_kinds
+from lplot.peaks import find_peaks
+from lplot.rolling import samples_along
+from lplot.grids import group_by_x, parse_grid, resample, join, join_kinds
+from lplot.buckets import aggregate, bucket_statistics
+from lplot.derived import DerivedDatasets
+from lplot.budget import bind_budget
+from lplot.library import TransformLibrary
 from lplot.utils import StoreConfigAction
 from lplot.wheels import Wheel, mpl_colorwheel, wheel_of_markers, wheel_of_linestyles, wheel_of_none
 
@@ -41,6 +53,21 @@ class Backend(ABC):
     return NotImplemented
 
 
+  def update_artist(self, artists, x, y):
+    """ Replace the data drawn by existing artists.
+
+    Backends which cannot update their artists in place keep this default,
+    the whole plot is then drawn again on a new backend of the same type.
+    """
+    return NotImplemented
+
+
+  def redraw(self):
+    """ Redraw the plot after its artists have been updated.
+    """
+    return NotImplemented
+
+
 class MPLBackend(Backend):
   """ Matplotlib plotting backend.
 
@@ -68,6 +95,7 @@ class MPLBackend(Backend):
       "histogram": "hist", 
       "pie": "pie",
       "bar": "bar",
+      "band": "fill_between",
       }
 
 
@@ -144,11 +172,204 @@ class MPLBackend(Backend):
     self._plot_engine.savefig(*args, **kwargs)
 
 
+  def update_artist(self, artists, x, y):
+    """ Replace the data drawn by existing lines.
+
+    Parameters
+    ----------
+    artists: list
+        Lines returned by the plotting function.
+    x: np.ndarray
+        New x values.
+    y: np.ndarray
+        New y values.
+    """
+    for artist in artists:
+      artist.set_data(x, y)
+
+
+  def redraw(self):
+    """ Rescale the axes to the data and request a redraw of the canvas.
+    """
+    ax = self._plot_handle
+    ax.relim()
+    ax.autoscale_view()
+    ax.figure.canvas.draw_idle()
+    ax.figure.canvas.flush_events()
+
+
 backends = {
     "matplotlib": MPLBackend,
     }
 
 
+def _writeable(array: np.ndarray, copies: dict=None) -> np.ndarray:
+  """
+  Return the array itself if it is writeable, otherwise a writeable copy of it.
+
+  Parameters
+  ----------
+  array: np.ndarray
+      Input array.
+  copies: dict, default to None
+      Copies already made, keyed by the id of their source array, so that
+      an array shared between several datasets is copied only once.
+  """
+  if not isinstance(array, np.ndarray) or array.flags.writeable:
+    return array
+  if copies is None:
+    return array.copy()
+  if id(array) not in copies:
+    copies[id(array)] = array.copy()
+  return copies[id(array)]
+
+
+def _row_mask(row_filter: str, data: np.ndarray) -> np.ndarray:
+  """ Evaluate a row filter on a 2 dimentional table into a boolean mask of its rows.
+  """
+  mask = np.asarray(safe_eval(row_filter, {"x": data[:, 0], "y": data[:, 1:]}))
+  if mask.dtype != bool:
+    raise TypeError("Row filter '{}' is expected to give boolean values.".format(row_filter))
+  if mask.ndim == 2:
+    mask = mask.all(axis=1)
+  return np.broadcast_to(mask, data.shape[:1])
+
+
+def _stack_datasets(arrays: list) -> tuple:
+  """
+  Stack datasets along a new first axis.
+
+  Datasets of different lengths, but of the same shape otherwise, are padded into
+  a masked array, built with a single scatter of the concatenated datasets.
+
+  Returns
+  -------
+  (stacked, lengths): tuple
+      The stacked datasets, and the lengths of the datasets if they were padded, else None.
+
+  Raises
+  ------
+  ValueError
+      If the datasets cannot be stacked.
+  """
+  shapes = set(np.shape(array) for array in arrays)
+  if len(shapes) == 1:
+    return np.stack(arrays), None
+  if len(set(shape[1:] for shape in shapes)) != 1 or any(len(shape) == 0 for shape in shapes):
+    raise ValueError("Datasets of different shapes cannot be stacked.")
+  lengths = np.array([len(array) for array in arrays])
+  rows, columns = _ragged_indices(lengths)
+  flat = np.concatenate(arrays)
+  data = np.zeros((len(arrays), lengths.max()) + flat.shape[1:], dtype=flat.dtype)
+  data[rows, columns] = flat
+  mask = np.arange(lengths.max()) >= lengths[:, None]
+  mask = np.broadcast_to(mask.reshape(mask.shape + (1, ) * (data.ndim - 2)), data.shape).copy()
+  return np.ma.MaskedArray(data, mask=mask), lengths
+
+
+def _unstack_datasets(stacked: np.ndarray, lengths: np.ndarray, n_datasets: int) -> list:
+  """
+  Split stacked datasets back into a list of datasets, as views of the stacked array when not padded.
+
+  Raises
+  ------
+  ValueError
+      If the array does not hold ``n_datasets`` datasets, or padded datasets changed length.
+  """
+  if isinstance(stacked, list):
+    return stacked
+  if (np.ndim(stacked) < 1) or (len(stacked) != n_datasets):
+    raise ValueError("Transform changed the number of datasets.")
+  if lengths is None:
+    return list(np.ma.getdata(stacked))
+  if (stacked.ndim < 2) or (stacked.shape[1] != lengths.max()):
+    raise ValueError("Transform changed the length of padded datasets.")
+  rows, columns = _ragged_indices(lengths)
+  return np.split(np.ma.getdata(stacked)[rows, columns], np.cumsum(lengths)[:-1])
+
+
+def _ragged_indices(lengths: np.ndarray) -> tuple:
+  """ Row and column of every element of datasets of given lengths, stacked and padded.
+  """
+  rows = np.repeat(np.arange(len(lengths)), lengths)
+  columns = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+  return rows, columns
+
+
+class DataStream:
+  """
+  Live dataset of a plot
+
+  Points are kept in fixed size ring buffers, so appending costs O(1) and the
+  memory used does not grow with the number of points pushed. Created by ``Plot.stream``.
+
+  Parameters
+  ----------
+  plot: Plot
+      The plot the dataset belongs to.
+  index: int
+      Index of the dataset in the plot.
+  capacity: int
+      Maximum number of points kept.
+  """
+
+
+  def __init__(self, plot, index: int, capacity: int):
+    self._plot = plot
+    self._index = index
+    self._x = RingBuffer(capacity)
+    self._y = RingBuffer(capacity)
+
+
+  @property
+  def x(self) -> np.ndarray:
+    return self._x.values
+
+
+  @property
+  def y(self) -> np.ndarray:
+    return self._y.values
+
+
+  def _sync(self):
+    """ Point the dataset of the plot to the current content of the buffers.
+    """
+    self._plot._X[self._index] = self._x.values
+    self._plot._Y[self._index] = self._y.values
+    self._plot._touch([self._index])
+
+
+  def append(self, x: float, y: float):
+    """ Append a single point.
+    """
+    self._x.append(x)
+    self._y.append(y)
+    self._sync()
+
+
+  def extend(self, xs: np.ndarray, ys: np.ndarray):
+    """ Append a sequence of points.
+    """
+    if np.shape(xs) != np.shape(ys):
+      raise ValueError("Length of X and Y does not match.")
+    self._x.extend(xs)
+    self._y.extend(ys)
+    self._sync()
+
+
+  def refresh(self):
+    """ Update the drawn dataset in place and redraw the figure, if it has been plotted.
+    """
+    artists = self._plot._artists
+    if self._index < len(artists):
+      backend = self._plot._backend
+      if backend.update_artist(artists[self._index], self.x, self.y) is NotImplemented:
+        # Drawn again from scratch, so that the artists of the previous frames do not pile up.
+        self._plot.make_plot(mode=self._plot._mode, backend=type(backend)(display=backend.display), show=False)
+      else:
+        backend.redraw()
+
+
 class Plot:
   """
   Plot object
@@ -157,6 +378,9 @@ class Plot:
   ----------
   title: str
       Title of the plot.
+  library: TransformLibrary, default to None
+      Named transforms the transforms of the plot can refer to as ``@name``,
+      it can be shared by many plots.
   """
 
 
@@ -171,46 +395,170 @@ class Plot:
   def __init__(
       self,
       title: str=None,
+      library: TransformLibrary=None,
       ):
     self._title = title
+    self._library = library
     self._X = []
     self._Y = []
     self._datalabel = []
     self._figure_properties = {}
+    self._backend = None
+    self._mode = None
+    self._artists = []
+    self._fits = None
+    self._peaks = None
+    self._bands = {}
+    self._derived = DerivedDatasets()
+    # Versions of the datasets, changed whenever they are modified, which invalidate the derived datasets.
+    self._counter = itertools.count(1)
+    self._generation = 0
+    self._versions = {}
+
+
+  def _compile(self, transform: Union[str, CompiledTransform]) -> CompiledTransform:
+    """ Compile a transform, expanding its references to the library of the plot.
+    """
+    if self._library is not None:
+      return self._library.compile(transform)
+    return compile_transform(transform)
+
+
+  def _touch(self, datasets: list=None):
+    """ Mark datasets as modified, all of them if None, which drops their bands.
+    """
+    if datasets is None:
+      self._generation = next(self._counter)
+      self._versions.clear()
+      self._bands.clear()
+    else:
+      for i in datasets:
+        self._versions[i] = next(self._counter)
+        self._bands.pop(i, None)
+
+
+  def _dataset(self, index: int) -> tuple:
+    """ x, y and version of a dataset, as needed by the derived datasets.
+    """
+    if not 0 <= index < self.n_datasets:
+      raise ValueError("Dataset {} does not exist, there are {} datasets.".format(index, self.n_datasets))
+    return self._X[index], self._Y[index], (self._generation, self._versions.get(index))
 
 
   def add_data(
       self,
-      data: Union[str, np.ndarray],
+      data: Union[str, np.ndarray, Iterable],
       data_range: Union[str, slice, list],
-      transform: str=None,
+      transform: Union[str, CompiledTransform]=None,
       file_mode: bool=False,
+      fmt: str=None,
+      row_filter: str=None,
       ):
     """
     Add new dateset,
 
     Parameters
     ----------
-    data: Union[str, np.ndarray]
-        Dataset of path to the dataset file.
+    data: Union[str, np.ndarray, Iterable]
+        Dataset of path to the dataset file. An iterable, e.g. a generator,
+        of rows or of blocks of rows is accumulated into an array as it is consumed.
     data_range: Union[str, slice, list]
         Columns of the data to use.
-    transform: str, default to None
+    transform: Union[str, CompiledTransform], default to None
         Transformation to operate on the dataset.
     file_mode: bool, default toFalse
         Whether the whole file is treated as a single dataset.
+    fmt: str, default to None
+        Format of the data file, see ``lplot.loaders.formats``.
+        If None, it is guessed from the file name.
+    row_filter: str, default to None
+        Expression of ``x`` and ``y``, all the columns but the first, evaluated right after
+        loading. Only the rows where it is true are kept, e.g. ``"(x > 0) and (x < 10)"``.
+        If it gives one value per column, a row is kept where all of them are true.
+    """
+    self._append_data(*self._prepare_data(data, data_range, transform, fmt, row_filter), file_mode=file_mode)
+
+
+  def add_datasets(
+      self,
+      specs: Iterable,
+      file_mode: bool=False,
+      fmt: str=None,
+      executor: Union[Executor, int]=None,
+      row_filter: str=None,
+      ):
+    """
+    Add many datasets, loading and transforming them concurrently.
+
+    The datasets are independent, so they are loaded and transformed in the
+    executor, numpy releasing the GIL in its loops, within the budget active
+    in the caller if any. They are added in the order of ``specs`` whatever
+    the order they complete in.
+
+    Parameters
+    ----------
+    specs: Iterable
+        Tuples of the ``data``, ``data_range`` and ``transform`` arguments of ``add_data``.
+    file_mode: bool, default toFalse
+        Whether each file is treated as a single dataset.
+    fmt: str, default to None
+        Format of the data files.
+    executor: Union[Executor, int], default to None
+        Executor running the tasks, or the number of threads of a pool created
+        for the call. If None, datasets are processed one after the other.
+    row_filter: str, default to None
+        Expression selecting the rows of each dataset, see ``add_data``.
+    """
+    @bind_budget
+    def _prepare(spec):
+      return self._prepare_data(*spec, fmt=fmt, row_filter=row_filter)
+    if executor is None or executor == 1:
+      results = map(_prepare, specs)
+    elif isinstance(executor, int):
+      with ThreadPoolExecutor(max_workers=executor) as pool:
+        results = list(pool.map(_prepare, specs))
+    else:
+      results = executor.map(_prepare, specs)
+    for result in results:
+      self._append_data(*result, file_mode=file_mode)
+
+
+  def _prepare_data(
+      self,
+      data: Union[str, np.ndarray, Iterable],
+      data_range: Union[str, slice, list],
+      transform: Union[str, CompiledTransform]=None,
+      fmt: str=None,
+      row_filter: str=None,
+      ) -> tuple:
+    """
+    Load, select the columns of and transform a dataset, without adding it.
+
+    Returns
+    -------
+    (x, y, filename): tuple
+        The dataset, and the file it comes from, None if it was not read from a file.
     """
     if isinstance(data, str):
       filename = data
-      data = np.loadtxt(data)
+      data = load_data(data, fmt=fmt)
     else:
-      filename = "Dataset({n})".format(n=len(self._X))
+      filename = None
     if not isinstance(data, np.ndarray):
-      raise TypeError("Input data is expected to be a str to a datafile or a numpy array.")
+      if not isinstance(data, Iterable):
+        raise TypeError("Input data is expected to be a str to a datafile, a numpy array or an iterable of rows.")
+      data = array_from_iterable(data)
+      if data.shape[1] == 1:
+        data = data[:, 0]
     if len(data.shape) == 1:
       data = np.array([np.arange(len(data)), data]).T
     if len(data.shape) != 2:
       raise ValueError("Input data is expected to be either 1 or 2 dimentional.")
+    if row_filter is not None:
+      # Boolean indexing copies the kept rows, leaving the cached array untouched.
+      # The samples of the columns of a file are its rows.
+      with samples_along(0):
+        data = data[_row_mask(row_filter, data)]
     x = data[:, 0]
     y = data[:, 1:]
     if data_range is not None:
@@ -234,10 +582,39 @@ class Plot:
         raise TypeError("Input data_range is expected to be a str, list or slice.")
       y = y[:, data_range]
     if transform is not None:
-      data = {"x": x, "y": y}
-      safe_exec(transform, locals=data)
+      # Loaded files are shared read-only through the load cache.
+      data = {"x": _writeable(x), "y": _writeable(y)}
+      # The samples of the columns of a file are its rows.
+      with samples_along(0):
+        self._compile(transform)(data)
       x = data["x"]
       y = data["y"]
+    return x, y, filename
+
+
+  def _append_data(
+      self,
+      x: np.ndarray,
+      y: np.ndarray,
+      filename: str=None,
+      file_mode: bool=False,
+      ):
+    """
+    Add a prepared dataset.
+
+    Parameters
+    ----------
+    x: np.ndarray
+        x of the dataset.
+    y: np.ndarray
+        y of the dataset, one column per dataset unless in file mode.
+    filename: str, default to None
+        The file the dataset comes from, used in its label.
+    file_mode: bool, default toFalse
+        Whether the whole file is treated as a single dataset.
+    """
+    if filename is None:
+      filename = "Dataset({n})".format(n=len(self._X))
     if file_mode:
       # Treat the entire file as a single dataset.
       self._X.append(x)
@@ -251,22 +628,345 @@ class Plot:
         self._datalabel.append("{} {}".format(filename, i))
 
 
+  def stream(
+      self,
+      dataset: Union[int, str],
+      capacity: int=1000,
+      ) -> DataStream:
+    """
+    Get a live handle on a dataset to push points into it.
+
+    Parameters
+    ----------
+    dataset: Union[int, str]
+        Index of an existing 1 dimentional dataset, whose latest points seed the
+        stream, or the label of a new dataset.
+    capacity: int, default to 1000
+        Maximum number of points kept in the dataset.
+
+    Returns
+    -------
+    stream: DataStream
+    """
+    if isinstance(dataset, str):
+      self._X.append(np.empty(0))
+      self._Y.append(np.empty(0))
+      self._datalabel.append(dataset)
+      stream = DataStream(self, self.n_datasets - 1, capacity)
+    else:
+      if np.ndim(self._Y[dataset]) != 1:
+        raise ValueError("Only 1 dimentional datasets can be streamed.")
+      stream = DataStream(self, dataset, capacity)
+      stream.extend(self._X[dataset][-capacity:], self._Y[dataset][-capacity:])
+    return stream
+
+
   def set_transform(
       self,
-      transform: str,
+      transform: Union[str, CompiledTransform],
+      batch: bool=False,
       ):
     """
     Perform tranformation operation on the dataset.
 
+    ``x`` and ``y`` are lists of the datasets. When batched, they are the datasets
+    stacked along a first axis instead, so that ``y = y*2`` applies to all datasets
+    at once while ``y[0]`` is still the first dataset. Datasets of different lengths
+    are padded into masked arrays.
+
     Parameters
     ----------
-    transform: str, default to None
+    transform: Union[str, CompiledTransform], default to None
         Transformation to operate on the dataset.
+    batch: bool, default to False
+        Whether to run the transform on stacked datasets. Batched transforms
+        cannot change the number of datasets.
     """
-    data = {"x": self._X, "y": self._Y}
-    safe_exec(transform, locals=data)
+    transform = self._compile(transform)
+    if batch and self.n_datasets > 0:
+      x, x_lengths = _stack_datasets(self._X)
+      y, y_lengths = _stack_datasets(self._Y)
+      data = transform({"x": x, "y": y})
+      self._X = _unstack_datasets(data["x"], x_lengths, self.n_datasets)
+      self._Y = _unstack_datasets(data["y"], y_lengths, self.n_datasets)
+      self._touch()
+      return
+    copies = {}
+    data = {
+        "x": [_writeable(x, copies) for x in self._X],
+        "y": [_writeable(y, copies) for y in self._Y],
+        }
+    transform(data)
     self._X = data["x"]
     self._Y = data["y"]
+    self._touch()
+
+
+  def resample(
+      self,
+      grid: Union[str, np.ndarray]="union",
+      datasets: list=None,
+      ) -> np.ndarray:
+    """
+    Interpolate datasets linearly onto a common x grid, so transforms can combine them.
+
+    Values outside of the range of a dataset are NaN. The interpolation weights are
+    computed once for the datasets sharing the same x, as the columns of a file.
+
+    Parameters
+    ----------
+    grid: Union[str, np.ndarray], default to "union"
+        "union" or "intersection" of the x of the resampled datasets,
+        "<start>:<stop>:<num>" for evenly spaced points, or the grid itself.
+    datasets: list, default to None
+        Indices of the datasets to resample, all of them if None.
+
+    Returns
+    -------
+    grid: np.ndarray
+        The grid, shared as x by the resampled datasets.
+    """
+    if datasets is None:
+      datasets = range(self.n_datasets)
+    datasets = list(datasets)
+    X = [self._X[i] for i in datasets]
+    grid = parse_grid(grid, X)
+    Y = resample(X, [self._Y[i] for i in datasets], grid)
+    for i, y in zip(datasets, Y):
+      self._X[i] = grid
+      self._Y[i] = y
+    self._touch(datasets)
+    return grid
+
+
+  def aggregate(
+      self,
+      stat: str="mean",
+      width: float=None,
+      samples: int=None,
+      band: bool=False,
+      origin: float=0.,
+      datasets: list=None,
+      ):
+    """
+    Reduce datasets to a statistic of buckets of their samples, e.g. per minute averages of a long series.
+
+    Buckets are either a fixed width in x, or a fixed number of samples. The
+    datasets sharing the same x, as the columns of a file, are reduced together.
+
+    Parameters
+    ----------
+    stat: str, default to "mean"
+        Statistic of the buckets, one of "mean", "min", "max", "sum", "count", "first" and "last".
+    width: float, default to None
+        Width of the buckets in the unit of x, the x of a bucket is its lower edge.
+    samples: int, default to None
+        Number of samples of the buckets, used if ``width`` is None, the x of a bucket is its first x.
+    band: bool, default to False
+        Whether ``make_plot`` draws the spread between the minimum and maximum of the buckets as a band,
+        until the datasets are modified again.
+    origin: float, default to 0.
+        Start of a bucket of a given width, so that buckets of different datasets line up.
+    datasets: list, default to None
+        Indices of the datasets to aggregate, all of them if None.
+    """
+    if datasets is None:
+      datasets = range(self.n_datasets)
+    datasets = list(datasets)
+    statistics = (stat, "min", "max") if band else (stat, )
+    bands = {}
+    X = [self._X[i] for i in datasets]
+    for group in group_by_x(X):
+      indices = [datasets[i] for i in group]
+      x = self._X[indices[0]]
+      columns = [np.asarray(self._Y[i]).reshape(len(x), -1) for i in indices]
+      bucket_x, values = aggregate(x, np.hstack(columns), statistics, width=width, samples=samples, origin=origin)
+      start = 0
+      for i, column in zip(indices, columns):
+        shape = (len(bucket_x), ) + np.shape(self._Y[i])[1:]
+        stop = start + column.shape[1]
+        self._X[i] = bucket_x
+        self._Y[i] = values[stat][:, start:stop].reshape(shape)
+        if band:
+          bands[i] = (values["min"][:, start:stop].reshape(shape), values["max"][:, start:stop].reshape(shape))
+        start = stop
+    self._touch(datasets)
+    self._bands.update(bands)
+
+
+  def join(
+      self,
+      how: str="outer",
+      datasets: list=None,
+      tolerance: float=None,
+      file_mode: bool=False,
+      ) -> tuple:
+    """
+    Join datasets on their x, replacing them by a combined dataset at the position of the first one.
+
+    The x of the datasets are merged as sorted sequences, in linear time.
+    Datasets sharing the same x, as the columns of a file, are joined together.
+
+    Parameters
+    ----------
+    how: str, default to "outer"
+        "inner" keeps the x found in all the datasets, "outer" the x found in any
+        of them, missing values being NaN, and "asof" keeps the x of the first dataset
+        and takes the values of the other ones at their nearest x.
+    datasets: list, default to None
+        Indices of the datasets to join, all of them if None.
+    tolerance: float, default to None
+        Largest distance to the nearest x in "asof" joins, beyond which values are NaN.
+    file_mode: bool, default to False
+        Whether the combined dataset is a single dataset of all the columns,
+        else each column is a dataset of the joined x.
+
+    Returns
+    -------
+    (x, y): tuple
+        The joined x and the table of the columns of the datasets, in their order.
+    """
+    if datasets is None:
+      datasets = range(self.n_datasets)
+    datasets = sorted(datasets)
+    if not datasets:
+      raise ValueError("No dataset to join.")
+    x, y, columns = join([self._X[i] for i in datasets], [self._Y[i] for i in datasets], how=how, tolerance=tolerance)
+    order = np.concatenate([columns[i] for i in range(len(datasets))]).astype(np.intp)
+    y = y[:, order]
+    labels = [self._datalabel[i] for i in datasets]
+    if file_mode:
+      X, Y, labels = [x], [y], ["Joined({})".format(", ".join(labels))]
+    else:
+      labels = [label for i, label in enumerate(labels) for column in columns[i]]
+      X, Y = [x] * y.shape[1], list(y.T)
+    first = datasets[0]
+    for i in reversed(datasets):
+      del self._X[i], self._Y[i], self._datalabel[i]
+    self._X[first:first] = X
+    self._Y[first:first] = Y
+    self._datalabel[first:first] = labels
+    self._touch()
+    return x, y
+
+
+  def derive(self, name: str, expression: str):
+    """
+    Define a named dataset derived from other datasets, drawn by ``make_plot`` after them.
+
+    Derived datasets are evaluated lazily, when plotted, and memoized until a dataset
+    they depend on changes, so that they are not recomputed for every output.
+
+    Parameters
+    ----------
+    name: str
+        Name of the derived dataset, also its label.
+    expression: str
+        Expression of ``d0``, ``d1``..., the y of the datasets, and of the other derived
+        datasets by their names, e.g. ``d1 - d0``. Its x is the x of the first dataset it refers to.
+    """
+    self._derived.define(name, expression)
+
+
+  def derived(self, name: str) -> tuple:
+    """
+    Evaluate a derived dataset.
+
+    Returns
+    -------
+    (x, y): tuple
+    """
+    return self._derived.evaluate(name, self._dataset)
+
+
+  def fit(
+      self,
+      kind: str="poly",
+      degree: int=1,
+      ) -> FitResult:
+    """
+    Fit all the datasets, the fitted curves are drawn over the datasets by ``make_plot``.
+
+    Datasets sharing the same x, as the columns of a data file, are fitted together
+    in a single least squares solve. Fit after the transforms, the fits are not
+    updated when the datasets change.
+
+    Parameters
+    ----------
+    kind: str, default to "poly"
+        "poly" for a polynomial of degree ``degree``, "linear" for a straight line,
+        and "exp" for ``A * exp(B * x)``, fitted as a straight line through ``log(y)``.
+    degree: int, default to 1
+        Degree of the polynomial, only used by "poly" fits.
+
+    Returns
+    -------
+    fits: FitResult
+        The coefficients and fitted curves of the datasets, see ``lplot.fitting.FitResult``.
+    """
+    self._fits = fit_datasets(self._X, self._Y, kind=kind, degree=degree, labels=self._datalabel)
+    return self._fits
+
+
+  def find_peaks(
+      self,
+      prominence: float=None,
+      width: float=None,
+      height: float=None,
+      rel_height: float=0.5,
+      mark: bool=True,
+      ) -> np.ndarray:
+    """
+    Find the peaks of all the datasets at once, see ``lplot.peaks.find_peaks``.
+
+    Parameters
+    ----------
+    prominence: float, default to None
+        Minimal prominence of the peaks.
+    width: float, default to None
+        Minimal width of the peaks, in the unit of x.
+    height: float, default to None
+        Minimal height of the peaks.
+    rel_height: float, default to 0.5
+        Fraction of the prominence below the top of a peak where its width is measured.
+    mark: bool, default to True
+        Whether ``make_plot`` marks the peaks on the figure.
+
+    Returns
+    -------
+    peaks: np.ndarray
+        A structured array with the dataset, x, y, prominence and width of the peaks,
+        and the x of the left and right ends of their widths.
+    """
+    if any(np.ndim(y) != 1 for y in self._Y):
+      raise ValueError("Peaks can only be found in 1 dimentional datasets.")
+    y, lengths = _stack_datasets(self._Y)
+    x, lengths = _stack_datasets(self._X)
+    # Padding of datasets of different lengths ends the search of the bases of the peaks.
+    y = np.ma.filled(np.ma.asarray(y, dtype=float), np.nan)
+    x = np.ma.filled(np.ma.asarray(x, dtype=float), np.nan)
+    peaks = find_peaks(y, height=height, prominence=prominence, rel_height=rel_height)
+    rows = peaks["row"]
+    def _x(position):
+      lower = np.floor(position).astype(np.intp)
+      upper = np.minimum(lower + 1, x.shape[1] - 1)
+      return x[rows, lower] + (position - lower) * (x[rows, upper] - x[rows, lower])
+    table = np.zeros(len(peaks), dtype=[
+        ("dataset", np.intp), ("x", float), ("y", float), ("prominence", float),
+        ("width", float), ("left", float), ("right", float),
+        ])
+    table["dataset"] = rows
+    table["x"] = x[rows, peaks["index"]]
+    table["y"] = peaks["height"]
+    table["prominence"] = peaks["prominence"]
+    table["left"] = _x(peaks["left"])
+    table["right"] = _x(peaks["right"])
+    table["width"] = np.abs(table["right"] - table["left"])
+    if width is not None:
+      table = table[table["width"] >= width]
+    if mark:
+      self._peaks = table
+    return table
 
 
   def set_figure_property(
@@ -365,7 +1065,7 @@ class Plot:
     if backend in backends:
       backend = backends[backend](display=show)
     elif callable(backend):
-      backend = backend(display=display)
+      backend = backend(display=show)
     if len(self._Y) != self.n_datasets:
       raise ValueError("Length of X and Y does not match.")
     #
@@ -398,15 +1098,51 @@ class Plot:
       legend = wheel_of_none
       has_legend = False
     #
+    if (self._fits is not None) and (len(self._fits) != self.n_datasets):
+      raise ValueError("Number of datasets changed since they were fitted.")
+    if (self._peaks is not None) and np.any(self._peaks["dataset"] >= self.n_datasets):
+      raise ValueError("Number of datasets changed since their peaks were found.")
+    for i, (lower, upper) in self._bands.items():
+      if (i >= self.n_datasets) or (np.shape(lower) != np.shape(self._Y[i])):
+        raise ValueError("Datasets changed since their bands were computed.")
+    self._backend = backend
+    self._mode = mode
+    self._artists = []
     for i in range(self.n_datasets):
-      getattr(backend, mode)(
+      dataset_color = next(color)
+      artists = getattr(backend, mode)(
           self._X[i], self._Y[i],
           linestyle=next(linestyle),
           marker=next(marker),
-          color=next(color),
+          color=dataset_color,
           markerfacecolor=next(markercolor),
           label=next(legend),
           )
+      self._artists.append(artists)
+      if i in self._bands:
+        lower, upper = self._bands[i]
+        for column in range(np.shape(lower)[1] if np.ndim(lower) > 1 else 1):
+          backend.band(self._X[i], np.reshape(lower, (len(lower), -1))[:, column],
+              np.reshape(upper, (len(upper), -1))[:, column], color=dataset_color, alpha=0.3, linewidth=0)
+      if self._fits is not None:
+        getattr(backend, mode)(self._fits.x[i], self._fits.curves[i], linestyle="--", color=dataset_color)
+      if self._peaks is not None:
+        start, stop = np.searchsorted(self._peaks["dataset"], [i, i + 1])
+        if stop > start:
+          peaks = self._peaks[start:stop]
+          getattr(backend, mode)(peaks["x"], peaks["y"], linestyle="none", marker="v", color=dataset_color)
+    # Derived datasets follow, with the next styles if there are any left.
+    for name in self._derived.names:
+      x, y = self.derived(name)
+      artists = getattr(backend, mode)(
+          x, y,
+          linestyle=next(linestyle, "-"),
+          marker=next(marker, None),
+          color=next(color, None),
+          markerfacecolor=next(markercolor, None),
+          label=name if has_legend else None,
+          )
+      self._artists.append(artists)
 
     properties = self._figure_properties.copy()
     for key in self._item_specific_keys:
@@ -429,8 +1165,30 @@ def main():
   parser.add_argument("--save-config", nargs="?", const="config.yml", help="Save the input as a configuration file.")
   #
   parser.add_argument("--file-mode", "--fs", "--fm", action="store_true", help="Treat each file as a dataset. Default is treating each column as a dataset.")
+  parser.add_argument("--format", "-f", choices=list(formats), help="Format of the data files. Guessed from the file names by default.")
   parser.add_argument("--title", "-T", help="Title of the plot.")
-  parser.add_argument("--transform", "-t", help="Transform input dateset.")
+  parser.add_argument("--jobs", "-j", type=int, default=1, help="Number of threads loading and transforming the data files.")
+  parser.add_argument("--transform", "-t", help="Transform input dateset. @<name> refers to a transform of the library of the config file.")
+  parser.add_argument("--batch", action="store_true", help="Run --transform on the datasets stacked into arrays instead of lists of datasets.")
+  parser.add_argument("--filter", help="Keep only the rows of the data files where this expression of x and y is true.")
+  parser.add_argument("--aggregate", choices=bucket_statistics, help="Reduce the datasets to a statistic of buckets " \
+      "of --bucket-width in x or of --bucket-samples samples.")
+  parser.add_argument("--bucket-width", type=float, help="Width of the buckets of --aggregate, in the unit of x.")
+  parser.add_argument("--bucket-samples", type=int, help="Number of samples of the buckets of --aggregate.")
+  parser.add_argument("--band", action="store_true", help="Draw the spread between the minimum and maximum of the buckets of --aggregate.")
+  parser.add_argument("--join", choices=join_kinds, help="Join the datasets on their x into a combined dataset.")
+  parser.add_argument("--join-tolerance", type=float, help="Largest distance to the nearest x in asof joins.")
+  parser.add_argument("--resample", help="Interpolate the datasets onto a common x grid before the transform: " \
+      "union, intersection or <start>:<stop>:<num>.")
+  parser.add_argument("--derive", action="append", help="Draw a dataset derived from the others, with the format " \
+      "<name>:<expression>, the datasets being d0, d1... Can be repeated, derived datasets can refer to each other.")
+  parser.add_argument("--fit", help="Fit the datasets and draw the fits, with the format <kind>[:<degree>], " \
+      "kind being one of {}.".format(", ".join(fit_kinds)))
+  parser.add_argument("--fit-output", help="Save the fitted coefficients to file.")
+  parser.add_argument("--peaks", type=float, nargs="?", const=0., help="Mark the peaks of the datasets, " \
+      "with an optional minimal prominence.")
+  parser.add_argument("--peak-width", type=float, help="Minimal width of the peaks, in the unit of x.")
+  parser.add_argument("--peaks-output", help="Save the table of the peaks to file.")
   #
   group = parser.add_mutually_exclusive_group()#title='plot mode')
   group.add_argument("--mode", default="plot", choices=["plot"], help="Plot modes.")
@@ -480,8 +1238,12 @@ def main():
     tmp_config = {k: v for k, v in args.__dict__.items() if ((k not in ["config", "save_config"]) and (v is not None))}
     yaml.safe_dump(tmp_config, open(args.save_config, "w"))
 
-  plot = Plot(title=args.title)
+  library = None
+  if isinstance(args.config, dict) and args.config.get("library"):
+    library = TransformLibrary(args.config["library"])
+  plot = Plot(title=args.title, library=library)
 
+  specs = []
   for file_range_transform in args.data:
     file_range_transform = file_range_transform.split(":")
     file = file_range_transform.pop(0)
@@ -490,16 +1252,36 @@ def main():
     if file_range_transform:
       data_range = file_range_transform.pop(0).strip() or None
     if file_range_transform:
-      transform = file_range_transform.pop(0).strip()
+      transform = plot._compile(file_range_transform.pop(0).strip())
     for f in glob.glob(file):
-      plot.add_data(
-          data=f,
-          data_range=data_range,
-          transform=transform,
-          file_mode=args.file_mode,
-          )
+      specs.append((f, data_range, transform))
+  plot.add_datasets(
+      specs,
+      file_mode=args.file_mode,
+      fmt=args.format,
+      executor=args.jobs,
+      row_filter=args.filter,
+      )
+  if args.aggregate:
+    plot.aggregate(args.aggregate, width=args.bucket_width, samples=args.bucket_samples, band=args.band)
+  if args.join:
+    plot.join(args.join, tolerance=args.join_tolerance, file_mode=args.file_mode)
+  if args.resample:
+    plot.resample(args.resample)
   if args.transform:
-    plot.set_transform(args.transform)
+    plot.set_transform(args.transform, batch=args.batch)
+  for definition in args.derive or []:
+    name, _, expression = definition.partition(":")
+    plot.derive(name.strip(), expression.strip())
+  if args.fit:
+    kind, _, degree = args.fit.partition(":")
+    fits = plot.fit(kind=kind.strip(), degree=int(degree or 1))
+    if args.fit_output:
+      fits.save(args.fit_output)
+  if args.peaks is not None:
+    peaks = plot.find_peaks(prominence=args.peaks, width=args.peak_width)
+    if args.peaks_output:
+      np.savetxt(args.peaks_output, peaks, fmt=["%d"] + ["%.8g"] * 6, header=" ".join(peaks.dtype.names))
   #
   figure_properties = {key:getattr(args, key) for key in plot._valid_keys if getattr(args, key, None) is not None}
   plot.set_figure_properties(figure_properties)
@@ -0,0 +1,198 @@
+import numpy as np
+
+
+__all__ = ["peak_dtype", "find_peaks"]
+
+
+peak_dtype = np.dtype([
+    ("row", np.intp),
+    ("index", np.intp),
+    ("height", float),
+    ("prominence", float),
+    ("width", float),
+    ("left", float),
+    ("right", float),
+    ])
+
+
+# Number of values of a block of rows processed at once, bounding the memory of the sparse tables.
+chunk_size = 1 << 22
+
+
+def _local_maxima(y: np.ndarray) -> tuple:
+  """
+  Local maxima of each row, as the rows and indices of the peaks.
+
+  A peak is higher than the values on both sides of it. Flat peaks are found by
+  comparing a value to the next different one, and are put at the middle of the plateau.
+  """
+  m, n = y.shape
+  change = np.ones((m, n + 1), dtype=bool)
+  change[:, 1:n] = y[:, 1:] != y[:, :-1]
+  # Index of the next value different from the current one, n past the end.
+  nxt = np.where(change, np.arange(n + 1), n)[:, ::-1]
+  nxt = np.minimum.accumulate(nxt, axis=1)[:, ::-1][:, 1:]
+  rising = np.zeros((m, n), dtype=bool)
+  rising[:, 1:] = y[:, 1:] > y[:, :-1]
+  rows, starts = np.nonzero(rising)
+  ends = nxt[rows, starts]
+  inside = ends < n
+  rows, starts, ends = rows[inside], starts[inside], ends[inside]
+  falling = y[rows, ends] < y[rows, starts]
+  rows, starts, ends = rows[falling], starts[falling], ends[falling]
+  return rows, (starts + ends - 1) // 2
+
+
+def _sparse_table(y: np.ndarray, ufunc: np.ufunc) -> np.ndarray:
+  """
+  Reduction of the windows of length ``2**k`` ending at each value, for all ``k``.
+
+  ``table[k, row, i]`` reduces ``y[row, i - 2**k + 1:i + 1]``, windows starting before
+  the row are clipped to it.
+  """
+  m, n = y.shape
+  levels = max(n - 1, 0).bit_length() + 1
+  table = np.empty((levels, m, n), dtype=y.dtype)
+  table[0] = y
+  for k in range(1, levels):
+    half = 1 << (k - 1)
+    table[k, :, :half] = table[k - 1, :, :half]
+    ufunc(table[k - 1, :, half:], table[k - 1, :, :-half], out=table[k, :, half:])
+  return table
+
+
+def _extend_left(table: np.ndarray, rows: np.ndarray, end: np.ndarray, keep: callable) -> np.ndarray:
+  """
+  Start of the longest run of values ending before ``end`` whose windows all satisfy ``keep``.
+
+  The run is extended by binary lifting, trying windows of decreasing powers of 2.
+  """
+  start = end.copy()
+  for k in range(len(table) - 1, -1, -1):
+    span = 1 << k
+    valid = start - span >= 0
+    values = table[k, rows, np.maximum(start - 1, 0)]
+    start = np.where(valid & keep(values), start - span, start)
+  return start
+
+
+def _extend_right(table: np.ndarray, rows: np.ndarray, start: np.ndarray, keep: callable) -> np.ndarray:
+  """
+  End, exclusive, of the longest run of values from ``start`` whose windows all satisfy ``keep``.
+  """
+  n = table.shape[-1]
+  end = start.copy()
+  for k in range(len(table) - 1, -1, -1):
+    span = 1 << k
+    valid = end + span <= n
+    values = table[k, rows, np.minimum(end + span - 1, n - 1)]
+    end = np.where(valid & keep(values), end + span, end)
+  return end
+
+
+def _range_reduce(table: np.ndarray, ufunc: np.ufunc, rows: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+  """ Reduction of ``y[row, lo:hi + 1]`` from two overlapping windows of the sparse table.
+  """
+  k = np.log2(hi - lo + 1).astype(np.intp)
+  return ufunc(table[k, rows, hi], table[k, rows, lo + (1 << k) - 1])
+
+
+def _find_peaks_block(y: np.ndarray, height: float, prominence: float, width: float, rel_height: float) -> np.ndarray:
+  """ Peaks of a block of rows, see ``find_peaks``.
+  """
+  rows, index = _local_maxima(y)
+  peaks = np.zeros(len(rows), dtype=peak_dtype)
+  peaks["row"] = rows
+  peaks["index"] = index
+  peaks["height"] = y[rows, index]
+  if height is not None:
+    peaks = peaks[peaks["height"] >= height]
+  if prominence is not None:
+    # The prominence is at most the height above the minimum of the row, which discards most noise cheaply.
+    peaks = peaks[peaks["height"] - np.nanmin(y, axis=1)[peaks["row"]] >= prominence]
+  if len(peaks) == 0:
+    return peaks
+  rows, index, h = peaks["row"], peaks["index"], peaks["height"]
+  maxima = _sparse_table(y, np.maximum)
+  minima = _sparse_table(y, np.minimum)
+  # The bases of a peak are the lowest values between it and the nearest higher values on each side.
+  lower = lambda values: values <= h
+  left = _extend_left(maxima, rows, index, lower)
+  right = _extend_right(maxima, rows, index + 1, lower)
+  base = np.maximum(
+      _range_reduce(minima, np.minimum, rows, left, index),
+      _range_reduce(minima, np.minimum, rows, index, right - 1),
+      )
+  peaks["prominence"] = h - base
+  if prominence is not None:
+    keep = peaks["prominence"] >= prominence
+    peaks, rows, index, h, base = peaks[keep], rows[keep], index[keep], h[keep], base[keep]
+  # Widths are measured where the peak crosses its height minus a fraction of its prominence.
+  level = h - rel_height * peaks["prominence"]
+  above = lambda values: values > level
+  i = _extend_left(minima, rows, index, above) - 1
+  j = _extend_right(minima, rows, index + 1, above)
+  i = np.maximum(i, 0)
+  j = np.minimum(j, y.shape[1] - 1)
+  with np.errstate(divide="ignore", invalid="ignore"):
+    peaks["left"] = np.where(y[rows, i] < level,
+        i + (level - y[rows, i]) / (y[rows, np.minimum(i + 1, y.shape[1] - 1)] - y[rows, i]), i)
+    peaks["right"] = np.where(y[rows, j] < level,
+        j - (level - y[rows, j]) / (y[rows, np.maximum(j - 1, 0)] - y[rows, j]), j)
+  peaks["width"] = peaks["right"] - peaks["left"]
+  if width is not None:
+    peaks = peaks[peaks["width"] >= width]
+  return peaks
+
+
+def find_peaks(
+    y: np.ndarray,
+    height: float=None,
+    prominence: float=None,
+    width: float=None,
+    rel_height: float=0.5,
+    ) -> np.ndarray:
+  """
+  Find the peaks of every row of a block of spectra.
+
+  Peaks are the local maxima, found with neighbour comparisons over the whole
+  block. Their prominence, the height above the highest of their bases, and their
+  width are computed exactly, as ``scipy.signal.find_peaks`` does, with sparse
+  tables of the window maxima and minima of the rows searched by binary lifting,
+  rather than by walking the rows value by value. Rows are processed in chunks
+  to bound the memory used by the tables.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Spectra, one per row, or a single 1 dimentional spectrum.
+      NaN values, e.g. padding rows of different lengths, end the search of the bases.
+  height: float, default to None
+      Minimal height of the peaks.
+  prominence: float, default to None
+      Minimal prominence of the peaks.
+  width: float, default to None
+      Minimal width of the peaks, in number of samples.
+  rel_height: float, default to 0.5
+      Fraction of the prominence below the top of a peak where its width is measured,
+      0.5 gives the full width at half maximum.
+
+  Returns
+  -------
+  peaks: np.ndarray
+      A structured array of ``peak_dtype``, sorted by row and index, with the row,
+      index, height, prominence and width of the peaks, and the interpolated positions,
+      in fractional index, of the left and right ends of their widths.
+  """
+  y = np.asarray(y, dtype=float)
+  if y.ndim not in (1, 2):
+    raise ValueError("Input spectra are expected to be 1 or 2 dimentional.")
+  y2d = y.reshape(-1, y.shape[-1]) if y.ndim == 2 else y[None, :]
+  n = max(y2d.shape[1], 1)
+  rows_per_chunk = max(1, chunk_size // (n * (n.bit_length() + 1)))
+  blocks = []
+  for start in range(0, len(y2d), rows_per_chunk):
+    peaks = _find_peaks_block(y2d[start:start + rows_per_chunk], height, prominence, width, rel_height)
+    peaks["row"] += start
+    blocks.append(peaks)
+  return np.concatenate(blocks) if blocks else np.zeros(0, dtype=peak_dtype)
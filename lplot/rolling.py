@@ -0,0 +1,351 @@
+import functools
+import contextlib
+import contextvars
+import numpy as np
+
+
+__all__ = ["moving_mean", "moving_std", "moving_min", "moving_max", "ema", "cumsum", "cumtrapz", "gradient"]
+
+
+# Axis of the samples when none is given, the last one of stacked datasets.
+_sample_axis = contextvars.ContextVar("lplot_sample_axis", default=-1)
+
+
+def sample_axis(axis: int=None) -> int:
+  """ The axis given, or the default axis of the samples if None.
+  """
+  return _sample_axis.get() if axis is None else axis
+
+
+@contextlib.contextmanager
+def samples_along(axis: int):
+  """
+  Run the operators of the context along ``axis`` when they are given no axis,
+  e.g. 0 for the columns of a data file, whose samples are its rows.
+  """
+  token = _sample_axis.set(axis)
+  try:
+    yield
+  finally:
+    _sample_axis.reset(token)
+
+
+def _along_axis(func: callable) -> callable:
+  """
+  Run a window operator on the axis of the samples of its input.
+
+  The decorated function gets ``y`` as a float or integer array with the
+  operated axis moved last, and returns an array of the same shape. Masked
+  arrays, as stacked datasets of different lengths, are unwrapped and their
+  mask is put back on the result. Their masked values are at the end of each
+  dataset, so they never enter the trailing windows of the valid ones.
+  """
+  @functools.wraps(func)
+  def _wrapper(y, *args, axis: int=None, **kwargs):
+    axis = sample_axis(axis)
+    mask = np.ma.getmask(y)
+    data = np.asarray(np.ma.getdata(y))
+    if data.ndim == 0:
+      raise ValueError("Input of '{}' is expected to be an array.".format(func.__name__))
+    if data.dtype.kind not in "biuf":
+      data = data.astype(float)
+    result = np.moveaxis(func(np.moveaxis(data, axis, -1), *args, **kwargs), -1, axis)
+    if mask is not np.ma.nomask:
+      return np.ma.MaskedArray(result, mask=mask)
+    return result
+  return _wrapper
+
+
+def _window(window: int, n: int) -> int:
+  """ Check a window size, windows longer than the data are the whole data.
+  """
+  if int(window) != window or window < 1:
+    raise ValueError("Window size is expected to be a positive integer.")
+  return min(int(window), max(n, 1))
+
+
+def _trailing_sums(y: np.ndarray, window: int) -> tuple:
+  """ Sums of trailing windows along the last axis and the number of values in them.
+
+  Windows at the start hold the values available so far. The sums are differences
+  of a single cumulative sum, so the cost does not depend on the window size.
+  """
+  n = y.shape[-1]
+  window = _window(window, n)
+  c = np.zeros(y.shape[:-1] + (n + 1, ), dtype=np.result_type(y, float))
+  np.cumsum(y, axis=-1, out=c[..., 1:])
+  sums = c[..., 1:].copy()
+  sums[..., window:] -= c[..., 1:n + 1 - window]
+  counts = np.minimum(np.arange(1, n + 1), window)
+  return sums, counts
+
+
+def _centered(y: np.ndarray) -> tuple:
+  """ Shift the values by their mean so running sums stay small, preserving precision.
+  """
+  shift = y.mean(axis=-1, keepdims=True) if y.shape[-1] else 0.
+  return y - shift, shift
+
+
+@_along_axis
+def moving_mean(y: np.ndarray, window: int) -> np.ndarray:
+  """
+  Mean of trailing windows, in O(n) whatever the window size.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Input data, a dataset or stacked datasets.
+  window: int
+      Number of values in a window. The first ``window - 1`` values are averaged
+      over the values available so far.
+  axis: int, default to None
+      Axis along which the window moves,
+      the axis of the samples if None, see ``samples_along``.
+  """
+  centered, shift = _centered(y)
+  sums, counts = _trailing_sums(centered, window)
+  return sums / counts + shift
+
+
+@_along_axis
+def moving_std(y: np.ndarray, window: int) -> np.ndarray:
+  """
+  Standard deviation of trailing windows, in O(n) whatever the window size.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Input data, a dataset or stacked datasets.
+  window: int
+      Number of values in a window, see ``moving_mean``.
+  axis: int, default to None
+      Axis along which the window moves,
+      the axis of the samples if None, see ``samples_along``.
+  """
+  centered, shift = _centered(y)
+  sums, counts = _trailing_sums(centered, window)
+  squares, counts = _trailing_sums(centered * centered, window)
+  variance = squares / counts - (sums / counts) ** 2
+  return np.sqrt(np.maximum(variance, 0.))
+
+
+def _moving_extremum(y: np.ndarray, window: int, accumulate: np.ufunc) -> np.ndarray:
+  """
+  Extremum of trailing windows with the van Herk/Gil-Werman algorithm.
+
+  The data, padded in front with ``window - 1`` neutral values, is cut into blocks
+  of ``window`` values. Every window spans the end of a block and the start of the
+  next one, so its extremum is that of a suffix and a prefix accumulation, which
+  makes 3 comparisons per value whatever the window size.
+  """
+  n = y.shape[-1]
+  window = _window(window, n)
+  if window == 1:
+    return y.copy()
+  if y.dtype.kind == "f":
+    neutral = np.inf if accumulate is np.minimum else -np.inf
+  elif y.dtype.kind == "b":
+    neutral = accumulate is np.minimum
+  else:
+    info = np.iinfo(y.dtype)
+    neutral = info.max if accumulate is np.minimum else info.min
+  nblocks = -(-(n + window - 1) // window)
+  padded = np.full(y.shape[:-1] + (nblocks * window, ), neutral, dtype=y.dtype)
+  padded[..., window - 1:window - 1 + n] = y
+  blocks = padded.reshape(y.shape[:-1] + (nblocks, window))
+  prefix = accumulate.accumulate(blocks, axis=-1).reshape(padded.shape)
+  suffix = accumulate.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+  return accumulate(suffix[..., :n], prefix[..., window - 1:window - 1 + n])
+
+
+@_along_axis
+def moving_min(y: np.ndarray, window: int) -> np.ndarray:
+  """
+  Minimum of trailing windows, in O(n) whatever the window size.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Input data, a dataset or stacked datasets.
+  window: int
+      Number of values in a window, see ``moving_mean``.
+  axis: int, default to None
+      Axis along which the window moves,
+      the axis of the samples if None, see ``samples_along``.
+  """
+  return _moving_extremum(y, window, np.minimum)
+
+
+@_along_axis
+def moving_max(y: np.ndarray, window: int) -> np.ndarray:
+  """
+  Maximum of trailing windows, in O(n) whatever the window size.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Input data, a dataset or stacked datasets.
+  window: int
+      Number of values in a window, see ``moving_mean``.
+  axis: int, default to None
+      Axis along which the window moves,
+      the axis of the samples if None, see ``samples_along``.
+  """
+  return _moving_extremum(y, window, np.maximum)
+
+
+@_along_axis
+def ema(y: np.ndarray, alpha: float=None, span: float=None) -> np.ndarray:
+  """
+  Exponential moving average, ``s[i] = alpha * y[i] + (1 - alpha) * s[i - 1]`` with ``s[0] = y[0]``.
+
+  The recursion is solved in closed form on blocks of values, as a cumulative
+  sum of the values scaled by ``(1 - alpha) ** -k``, so only one Python step is
+  taken per block. The blocks are as long as the scaling stays far from overflowing.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Input data, a dataset or stacked datasets.
+  alpha: float, default to None
+      Smoothing factor in (0, 1].
+  span: float, default to None
+      Span of the average, ``alpha = 2 / (span + 1)``, used if ``alpha`` is None.
+  axis: int, default to None
+      Axis along which the average moves,
+      the axis of the samples if None, see ``samples_along``.
+  """
+  if alpha is None:
+    if span is None or span < 1:
+      raise ValueError("Either alpha or a span of at least 1 is expected.")
+    alpha = 2. / (span + 1.)
+  if not 0 < alpha <= 1:
+    raise ValueError("Smoothing factor alpha is expected to be in (0, 1].")
+  y = y.astype(np.result_type(y, float), copy=False)
+  n = y.shape[-1]
+  if alpha == 1 or n == 0:
+    return y.copy()
+  decay = 1. - alpha
+  block = int(min(n, max(1, np.log(1e-100) / np.log(decay))))
+  powers = decay ** np.arange(block + 1)
+  scales = decay ** -np.arange(block)
+  result = np.empty_like(y)
+  previous = y[..., 0]
+  for start in range(0, n, block):
+    values = y[..., start:start + block]
+    m = values.shape[-1]
+    acc = np.cumsum(values * scales[:m], axis=-1)
+    acc *= alpha * powers[:m]
+    acc += powers[1:m + 1] * previous[..., None]
+    result[..., start:start + m] = acc
+    previous = acc[..., -1]
+  return result
+
+
+@_along_axis
+def cumsum(y: np.ndarray) -> np.ndarray:
+  """
+  Cumulative sum.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Input data, a dataset or stacked datasets.
+  axis: int, default to None
+      Axis along which the sum runs,
+      the axis of the samples if None, see ``samples_along``.
+  """
+  return np.cumsum(y, axis=-1)
+
+
+def _coordinates(x: np.ndarray, axis: int) -> np.ndarray:
+  """ Coordinates given along the operated axis, with that axis moved last as in ``_along_axis``.
+  """
+  if x is None:
+    return None
+  x = np.asarray(np.ma.getdata(x), dtype=float)
+  return np.moveaxis(x, axis, -1) if x.ndim > 1 else x
+
+
+def _spacing(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+  """ Coordinates of the values of ``y`` along its last axis, broadcast to its shape.
+  """
+  if x is None:
+    x = np.arange(y.shape[-1], dtype=float)
+  return np.broadcast_to(x, y.shape)
+
+
+def cumtrapz(y: np.ndarray, x: np.ndarray=None, axis: int=None) -> np.ndarray:
+  """
+  Cumulative integral with the trapezoidal rule, starting from 0.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Input data, a dataset or stacked datasets.
+  x: np.ndarray, default to None
+      Coordinates of the values, with the shape of ``y`` or that of the integrated axis.
+      If None, the values are spaced by 1.
+  axis: int, default to None
+      Axis along which the integral runs,
+      the axis of the samples if None, see ``samples_along``.
+  """
+  axis = sample_axis(axis)
+  return _cumtrapz(y, _coordinates(x, axis), axis=axis)
+
+
+@_along_axis
+def _cumtrapz(y: np.ndarray, x: np.ndarray) -> np.ndarray:
+  x = _spacing(x, y)
+  result = np.zeros(y.shape, dtype=np.result_type(y, float))
+  np.cumsum((y[..., 1:] + y[..., :-1]) * np.diff(x, axis=-1) / 2, axis=-1, out=result[..., 1:])
+  return result
+
+
+def gradient(y: np.ndarray, x: np.ndarray=None, axis: int=None) -> np.ndarray:
+  """
+  Derivative with second order central differences, first order ones at the edges, as ``np.gradient``.
+
+  The ends of the datasets of stacked masked arrays are treated as edges.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Input data, a dataset or stacked datasets.
+  x: np.ndarray, default to None
+      Coordinates of the values, with the shape of ``y`` or that of the derived axis.
+      If None, the values are spaced by 1.
+  axis: int, default to None
+      Axis along which to derive,
+      the axis of the samples if None, see ``samples_along``.
+  """
+  axis = sample_axis(axis)
+  mask = np.ma.getmask(y)
+  if mask is not np.ma.nomask:
+    mask = np.moveaxis(mask, axis, -1)
+  return _gradient(y, _coordinates(x, axis), mask, axis=axis)
+
+
+@_along_axis
+def _gradient(y: np.ndarray, x: np.ndarray, mask: np.ndarray) -> np.ndarray:
+  if y.shape[-1] < 2:
+    raise ValueError("At least 2 values are needed to compute a gradient.")
+  x = _spacing(x, y)
+  y = y.astype(np.result_type(y, float), copy=False)
+  dx = np.diff(x, axis=-1)
+  dy = np.diff(y, axis=-1)
+  result = np.empty(y.shape, dtype=np.result_type(y, dx))
+  hs = dx[..., :-1]
+  hd = dx[..., 1:]
+  # The padding of stacked datasets is not a valid grid, it gets overwritten or stays masked.
+  with np.errstate(**({} if mask is np.ma.nomask else {"divide": "ignore", "invalid": "ignore"})):
+    result[..., 0] = dy[..., 0] / dx[..., 0]
+    result[..., -1] = dy[..., -1] / dx[..., -1]
+    result[..., 1:-1] = (hs * hs * y[..., 2:] + (hd * hd - hs * hs) * y[..., 1:-1] - hd * hd * y[..., :-2]) \
+        / (hs * hd * (hd + hs))
+  if mask is not np.ma.nomask:
+    # Last values of the datasets, followed by padding.
+    edges = ~mask[..., 1:-1] & mask[..., 2:]
+    result[..., 1:-1][edges] = dy[..., :-1][edges] / dx[..., :-1][edges]
+  return result
@@ -1,4 +1,8 @@
 import ast
+import copy
+import operator
+import inspect
+import functools
 import numpy as np
 from numbers import Number
 from typing import Union
@@ -6,6 +10,42 @@ from typing import Union
 import lplot.lmath as lmath
 import lplot.unit_conversion as unit_conversion
 import lplot.physical_constant as constant
+import lplot.rolling as rolling
+import lplot.spectral as spectral
+from lplot.budget import Budget, active_budget, check_deadline, result_size, use_budget
+
+
+valid_numpy_functions = frozenset([
+    "sum", "sin", "cos", "tan", "arcsin", "arccos", "arctan",
+    "log", "exp", "abs", "max", "min", "argmin", "argmax",
+    "dot", "pi", "sqrt", "where", "clip", "isfinite", "isnan",
+    "nansum", "nanmean", "nanstd", "nanmax", "nanmin",
+    ])
+valid_math_functions = frozenset([
+    "gcd", "factorial", "binomial", "log_factorial",
+    ])
+valid_unit_conversion_functions = frozenset([
+    "energy", "mass", "pressure", "length", "convert",
+    ])
+valid_constant_functions = frozenset([
+    "hbar", "kB", "AMU", "THz", "eV", "Angstrom",
+    ])
+valid_rolling_functions = frozenset([
+    "moving_mean", "moving_std", "moving_min", "moving_max",
+    "ema", "cumsum", "cumtrapz", "gradient",
+    ])
+valid_spectral_functions = frozenset([
+    "spectrum", "psd", "window", "windowed",
+    ])
+valid_functions = valid_numpy_functions | valid_math_functions \
+    | valid_unit_conversion_functions | valid_constant_functions \
+    | valid_rolling_functions | valid_spectral_functions
+
+_allowed_data_types = frozenset([bool, int, float, complex, #np.int, np.float, np.complex, # These are deprecated
+    np.bool_, np.int8, np.int16, np.int32, np.int64,
+    np.float16, np.float32, np.float64, np.float128,
+    np.complex64, np.complex128, np.complex256,
+    ])
 
 
 def _safety_check(locals: dict):
@@ -28,27 +68,632 @@ def _safety_check(locals: dict):
 def _safety_check_value(value: any) -> bool:
   """ Worker function for ``_safety_check`` method.
   """
-  allowed_data_type = [int, float, complex, #np.int, np.float, np.complex, # These are deprecated
-      np.int8, np.int16, np.int32, np.int64,
-      np.float16, np.float32, np.float64, np.float128,
-      np.complex64, np.complex128, np.complex256,
-      ]
   return ( \
-      (type(value) in allowed_data_type) \
+      (type(value) in _allowed_data_types) \
+      or \
+      ((type(value) == np.ndarray) and value.dtype.type in _allowed_data_types) \
       or \
-      ((type(value) == np.ndarray) and value.dtype.type in allowed_data_type) \
+      ((type(value) == np.ma.MaskedArray) and value.dtype.type in _allowed_data_types \
+        and type(value.data) == np.ndarray and type(value.mask) in (np.ndarray, np.bool_)) \
       or \
       ((type(value) == list) and all([_safety_check_value(val) for val in value])) \
       )
 
 
+_function_modules = (
+    (valid_numpy_functions, np),
+    (valid_math_functions, lmath),
+    (valid_unit_conversion_functions, unit_conversion),
+    (valid_constant_functions, constant),
+    (valid_rolling_functions, rolling),
+    (valid_spectral_functions, spectral),
+    )
+
+_named_constants = {
+    "pi": np.pi,
+    }
+
+_binary_operators = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    }
+
+_inplace_operators = {
+    ast.Add: operator.iadd,
+    ast.Sub: operator.isub,
+    ast.Mult: operator.imul,
+    ast.Div: operator.itruediv,
+    ast.FloorDiv: operator.ifloordiv,
+    ast.Mod: operator.imod,
+    ast.Pow: operator.ipow,
+    ast.BitAnd: operator.iand,
+    ast.BitOr: operator.ior,
+    ast.BitXor: operator.ixor,
+    }
+
+_unary_operators = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+    ast.Not: np.logical_not,
+    ast.Invert: operator.invert,
+    }
+
+_comparison_operators = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    }
+
+# ``and`` and ``or`` apply element-wise, as ``&`` and ``|`` on boolean arrays.
+_boolean_operators = {
+    ast.And: np.logical_and,
+    ast.Or: np.logical_or,
+    }
+
+_binary_ufuncs = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.remainder,
+    ast.Pow: np.power,
+    ast.BitAnd: np.bitwise_and,
+    ast.BitOr: np.bitwise_or,
+    ast.BitXor: np.bitwise_xor,
+    }
+
+_unary_ufuncs = {
+    ast.UAdd: np.positive,
+    ast.USub: np.negative,
+    ast.Not: np.logical_not,
+    ast.Invert: np.invert,
+    }
+
+_comparison_ufuncs = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+    }
+
+# Expressions over arrays of at least ``fusion_min_size`` elements are evaluated
+# block by block, ``fusion_block_size`` elements at a time. Set ``fusion_min_size``
+# to None to disable the blocked evaluation.
+fusion_block_size = 16384
+fusion_min_size = 262144
+
+
+# Functions whose first argument is bounded by the ``max_factorial`` of a budget.
+_factorial_functions = frozenset(["factorial", "binomial"])
+
+
+def _budgeted(op: callable, node_op: ast.AST=None) -> callable:
+  """
+  Wrap an element-wise operator to check the active budget before applying it.
+
+  The size of the result is estimated from the shapes of the operands, and the
+  exponent of a power, ``node_op`` being ``ast.Pow``, is bounded.
+  """
+  power = isinstance(node_op, ast.Pow)
+  def _op(*operands):
+    active = active_budget()
+    if active is not None:
+      check_deadline(active)
+      active[0].check_elements(result_size(*operands))
+      if power:
+        active[0].check_exponent(operands[1])
+    return op(*operands)
+  return _op
+
+
+def _dot_size(func: callable, args: tuple, kwargs: dict) -> int:
+  """ Number of elements of the result of ``dot``.
+  """
+  a, b = np.shape(args[0]), np.shape(args[1])
+  if not a or not b:
+    shape = a or b
+  else:
+    shape = a[:-1] + b[:-2] + b[-1:]
+  return int(np.prod(shape, dtype=float))
+
+
+def _window_size(func: callable, args: tuple, kwargs: dict) -> int:
+  """ Number of elements of the result of ``window``.
+  """
+  return int(inspect.signature(func).bind(*args, **kwargs).arguments["n"])
+
+
+def _psd_size(func: callable, args: tuple, kwargs: dict) -> int:
+  """ Number of elements of the segments of ``psd``, its largest temporary array.
+  """
+  arguments = inspect.signature(func).bind(*args, **kwargs)
+  arguments.apply_defaults()
+  arguments = arguments.arguments
+  shape = np.shape(arguments["y"])
+  n = shape[rolling.sample_axis(arguments["axis"])]
+  nperseg = max(min(int(arguments["nperseg"]), n), 1)
+  step = max(1, int(round(nperseg * (1 - arguments["overlap"]))))
+  n_segments = max((n - nperseg) // step + 1, 0)
+  return int(np.prod(shape, dtype=float)) // max(n, 1) * n_segments * spectral._fft_length(nperseg)
+
+
+# Estimates of the size of the results of the functions changing the shape of their arguments.
+_result_sizes = {
+    "dot": _dot_size,
+    "window": _window_size,
+    "psd": _psd_size,
+    }
+
+
+def _budgeted_call(name: str, func: callable) -> callable:
+  """
+  Wrap a supported function to check the active budget when calling it.
+
+  The results of ufuncs, and of the functions changing the shape of their
+  arguments, are checked before they are computed, the other results once
+  computed, so that they cannot grow any further.
+  """
+  elementwise = isinstance(func, np.ufunc) or name in ("where", "clip")
+  factorial = name in _factorial_functions
+  estimate = _result_sizes.get(name)
+  def _call(*args, **kwargs):
+    active = active_budget()
+    if active is None:
+      return func(*args, **kwargs)
+    budget = active[0]
+    check_deadline(active)
+    if factorial and args:
+      budget.check_factorial(args[0])
+    if elementwise:
+      budget.check_elements(result_size(*args))
+    elif estimate is not None:
+      try:
+        size = estimate(func, args, kwargs)
+      except (TypeError, ValueError, IndexError, KeyError, OverflowError):
+        # Invalid arguments, reported by the function itself.
+        size = None
+      budget.check_elements(size)
+    result = func(*args, **kwargs)
+    if isinstance(result, np.ndarray):
+      budget.check_elements(result.size)
+    return result
+  return _call
+
+
+def _resolve_function(name: str) -> callable:
+  """ Find the supported function of a given name.
+  """
+  for names, module in _function_modules:
+    if name in names:
+      return getattr(module, name)
+  raise NameError("Function '{name}' is not supported.".format(name=name))
+
+
+def _compile_expression(node: ast.AST) -> callable:
+  """
+  Compile a validated expression into a closure evaluating it on a dict of local variables.
+
+  The tree is walked once, functions and operators are resolved at compile time,
+  and each node becomes a closure calling the closures of its children.
+  """
+  if node is None:
+    return lambda locals: None
+  if isinstance(node, ast.Expression):
+    return _compile_expression(node.body)
+  if _count_elementwise(node) >= 2:
+    return _FusedExpression(node)
+  if isinstance(node, ast.Name):
+    return _compile_name(node.id)
+  if isinstance(node, ast.Constant):
+    value = node.value
+    return lambda locals: value
+  if isinstance(node, ast.Subscript):
+    value = _compile_expression(node.value)
+    index = _compile_slice(node.slice)
+    return lambda locals: value(locals)[index(locals)]
+  if isinstance(node, ast.Call):
+    return _compile_call(node)
+  if isinstance(node, ast.BinOp) and type(node.op) in _binary_operators:
+    op = _budgeted(_binary_operators[type(node.op)], node.op)
+    left = _compile_expression(node.left)
+    right = _compile_expression(node.right)
+    return lambda locals: op(left(locals), right(locals))
+  if isinstance(node, ast.UnaryOp) and type(node.op) in _unary_operators:
+    op = _unary_operators[type(node.op)]
+    operand = _compile_expression(node.operand)
+    return lambda locals: op(operand(locals))
+  if isinstance(node, ast.Compare):
+    return _compile_compare(node)
+  if isinstance(node, ast.BoolOp) and type(node.op) in _boolean_operators:
+    op = _budgeted(_boolean_operators[type(node.op)])
+    values = [_compile_expression(value) for value in node.values]
+    return lambda locals: functools.reduce(op, [value(locals) for value in values])
+  if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+    container = {ast.Tuple: tuple, ast.List: list, ast.Set: set}[type(node)]
+    elts = [_compile_expression(elt) for elt in node.elts]
+    return lambda locals: container([elt(locals) for elt in elts])
+  if isinstance(node, ast.Dict):
+    if None in node.keys:
+      raise ValueError(f'malformed node or string: {node!r}')
+    keys = [_compile_expression(key) for key in node.keys]
+    values = [_compile_expression(value) for value in node.values]
+    return lambda locals: {key(locals): value(locals) for key, value in zip(keys, values)}
+  raise ValueError(f'malformed node or string: {node!r}')
+
+
+def _compile_compare(node: ast.Compare) -> callable:
+  """ Compile a comparison, chained comparisons are combined element-wise.
+  """
+  if not all(type(op) in _comparison_operators for op in node.ops):
+    raise ValueError(f'malformed node or string: {node!r}')
+  ops = [_budgeted(_comparison_operators[type(op)]) for op in node.ops]
+  operands = [_compile_expression(operand) for operand in [node.left] + node.comparators]
+  if len(ops) == 1:
+    op, = ops
+    left, right = operands
+    return lambda locals: op(left(locals), right(locals))
+  def _compare(locals):
+    values = [operand(locals) for operand in operands]
+    return functools.reduce(np.logical_and, [op(a, b) for op, a, b in zip(ops, values[:-1], values[1:])])
+  return _compare
+
+
+def _compile_name(name: str) -> callable:
+  """ Compile the lookup of a local variable, falling back to the named constants.
+  """
+  if name in _named_constants:
+    default = _named_constants[name]
+    return lambda locals: locals.get(name, default)
+  def _name(locals):
+    try:
+      return locals[name]
+    except KeyError:
+      raise NameError("name \'{name}\' is not defined.".format(name=name)) from None
+  return _name
+
 
-def safe_eval(node_or_string: Union[str, ast.AST], locals: dict={}) -> Union[Number, str, np.ndarray]:
+def _compile_call(node: ast.Call) -> callable:
+  """ Compile a call to one of the supported functions.
+  """
+  if not isinstance(node.func, ast.Name):
+    raise NameError("Syntax '{}' not supported.".format(ast.dump(node.func)))
+  func = _budgeted_call(node.func.id, _resolve_function(node.func.id))
+  args = [_compile_expression(arg) for arg in node.args]
+  keywords = [(keyword.arg, _compile_expression(keyword.value)) for keyword in node.keywords]
+  if keywords:
+    return lambda locals: func(*[arg(locals) for arg in args], **{key: value(locals) for key, value in keywords})
+  if len(args) == 1:
+    arg, = args
+    return lambda locals: func(arg(locals))
+  if len(args) == 2:
+    arg1, arg2 = args
+    return lambda locals: func(arg1(locals), arg2(locals))
+  return lambda locals: func(*[arg(locals) for arg in args])
+
+
+def _elementwise_ufunc(node: ast.AST) -> np.ufunc:
+  """ Get the ufunc computing an element-wise node, None if the node is not element-wise.
+  """
+  if isinstance(node, ast.BinOp):
+    return _binary_ufuncs.get(type(node.op))
+  if isinstance(node, ast.UnaryOp):
+    return _unary_ufuncs.get(type(node.op))
+  if isinstance(node, ast.Compare) and len(node.ops) == 1:
+    return _comparison_ufuncs.get(type(node.ops[0]))
+  if isinstance(node, ast.BoolOp) and len(node.values) == 2:
+    return _boolean_operators.get(type(node.op))
+  if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords \
+      and node.func.id in valid_functions:
+    func = _resolve_function(node.func.id)
+    if isinstance(func, np.ufunc) and func.nin == len(node.args) and func.nout == 1:
+      return func
+  return None
+
+
+def _elementwise_operands(node: ast.AST) -> list:
+  """ Operands of an element-wise node.
+  """
+  if isinstance(node, ast.BinOp):
+    return [node.left, node.right]
+  if isinstance(node, ast.UnaryOp):
+    return [node.operand]
+  if isinstance(node, ast.Compare):
+    return [node.left] + node.comparators
+  if isinstance(node, ast.BoolOp):
+    return node.values
+  return node.args
+
+
+def _count_elementwise(node: ast.AST) -> int:
+  """ Number of element-wise operations in the element-wise tree rooted at ``node``.
+  """
+  if _elementwise_ufunc(node) is None:
+    return 0
+  return 1 + sum(_count_elementwise(operand) for operand in _elementwise_operands(node))
+
+
+class _FusedExpression:
+  """
+  A tree of element-wise operations evaluated block by block.
+
+  Every operand which is not element-wise (names, constants, reductions, subscripts...)
+  is a leaf evaluated once on the whole data. When all the array leaves have the
+  same shape and are large enough, the operations are then applied to blocks of
+  ``fusion_block_size`` elements, each operation writing into its own buffer
+  reused from block to block, and the root directly into the output. The temporary
+  arrays are thus of the size of a block instead of the size of the data.
+
+  Parameters
+  ----------
+  node: ast.AST
+      Root of the element-wise tree.
+  """
+
+
+  def __init__(self, node: ast.AST):
+    self._leaves = []
+    self._n_buffers = 0
+    self._kernel, self._evaluate = self._build(node)
+
+
+  def _build(self, node: ast.AST) -> tuple:
+    """
+    Build the closures evaluating the tree on the values of its leaves.
+
+    The blocked kernel applies ufuncs into reusable buffers, the other one applies
+    the Python operators on whole arrays, so arbitrary leaves keep the semantics
+    of ``safe_eval`` when the data is not suited for the blocked evaluation.
+    """
+    ufunc = _elementwise_ufunc(node)
+    if ufunc is None:
+      index = len(self._leaves)
+      self._leaves.append(_compile_expression(node))
+      return (lambda leaves, buffers, n, out=None: leaves[index]), (lambda leaves: leaves[index])
+    kernels, evaluates = zip(*[self._build(operand) for operand in _elementwise_operands(node)])
+    if isinstance(node, ast.BinOp):
+      op = _budgeted(_binary_operators[type(node.op)], node.op)
+    elif isinstance(node, ast.UnaryOp):
+      op = _unary_operators[type(node.op)]
+    elif isinstance(node, ast.Compare):
+      op = _budgeted(_comparison_operators[type(node.ops[0])])
+    else:
+      op = _budgeted(ufunc)
+    # Blocks keep the shape of the leaves, only the exponents of powers need to be checked.
+    power = isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow)
+    slot = self._n_buffers
+    self._n_buffers += 1
+    def _kernel(leaves, buffers, n, out=None):
+      if type(buffers[slot]) is tuple:
+        return buffers[slot][0]
+      args = [kernel(leaves, buffers, n) for kernel in kernels]
+      if out is None and all(np.ndim(arg) == 0 for arg in args):
+        # Subtrees without array leaves are evaluated once with the Python operators,
+        # as ufuncs would neither raise integers to negative powers nor promote to long integers.
+        buffers[slot] = (op(*args),)
+        return buffers[slot][0]
+      if power:
+        active = active_budget()
+        if active is not None:
+          active[0].check_exponent(args[1])
+      if out is None:
+        if buffers[slot] is None:
+          buffers[slot] = ufunc(*args)
+          return buffers[slot]
+        out = buffers[slot][:n]
+      return ufunc(*args, out=out)
+    def _evaluate(leaves):
+      return op(*[evaluate(leaves) for evaluate in evaluates])
+    return _kernel, _evaluate
+
+
+  def __call__(self, locals: dict):
+    leaves = [leaf(locals) for leaf in self._leaves]
+    shape = None
+    for leaf in leaves:
+      if isinstance(leaf, np.ndarray) and leaf.ndim > 0:
+        if shape is None:
+          shape = leaf.shape
+        if type(leaf) != np.ndarray or leaf.shape != shape or not leaf.flags.c_contiguous:
+          return self._evaluate(leaves)
+      elif not isinstance(leaf, (Number, np.number, np.ndarray)):
+        return self._evaluate(leaves)
+    if (shape is None) or (fusion_min_size is None) or (np.prod(shape) < fusion_min_size):
+      return self._evaluate(leaves)
+    size = int(np.prod(shape))
+    active = active_budget()
+    if active is not None:
+      active[0].check_elements(size)
+    flat = [leaf.reshape(-1) if isinstance(leaf, np.ndarray) and leaf.ndim > 0 else None for leaf in leaves]
+    buffers = [None] * self._n_buffers
+    out = None
+    for start in range(0, size, fusion_block_size):
+      if active is not None:
+        check_deadline(active)
+      stop = min(start + fusion_block_size, size)
+      blocks = [leaf if f is None else f[start:stop] for leaf, f in zip(leaves, flat)]
+      if out is None:
+        first = self._kernel(blocks, buffers, stop - start)
+        out = np.empty(size, dtype=first.dtype)
+        out[:stop] = first
+      else:
+        self._kernel(blocks, buffers, stop - start, out=out[start:stop])
+    return out.reshape(shape)
+
+
+def _compile_slice(node: ast.AST) -> callable:
+  """ Compile the index of a subscript.
+  """
+  if isinstance(node, ast.Slice):
+    lower = _compile_expression(node.lower)
+    upper = _compile_expression(node.upper)
+    step = _compile_expression(node.step)
+    return lambda locals: slice(lower(locals), upper(locals), step(locals))
+  if isinstance(node, ast.Tuple):
+    elts = [_compile_slice(elt) for elt in node.elts]
+    return lambda locals: tuple([elt(locals) for elt in elts])
+  if hasattr(ast, "Index") and isinstance(node, ast.Index):
+    return _compile_slice(node.value)
+  return _compile_expression(node)
+
+
+def _compile_target(node: ast.AST) -> callable:
+  """ Compile an assignment target into a closure storing a value into the local variables.
+  """
+  if isinstance(node, ast.Name):
+    name = node.id
+    def _assign_name(locals, value):
+      locals[name] = value
+    return _assign_name
+  if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+    name, attr = node.value.id, node.attr
+    return lambda locals, value: setattr(locals[name], attr, value)
+  if isinstance(node, ast.Subscript):
+    if not isinstance(node.value, ast.Name):
+      raise TypeError("Unsupported target expression for '{target!s}'.".format(target=node))
+    name = node.value.id
+    index = _compile_slice(node.slice)
+    return lambda locals, value: operator.setitem(locals[name], index(locals), value)
+  if isinstance(node, (ast.Tuple, ast.List)):
+    elts = [_compile_target(elt) for elt in node.elts]
+    def _assign_unpack(locals, value):
+      value = list(value)
+      if len(value) != len(elts):
+        raise ValueError("Mismatch between number of targets and number of values in the expression.")
+      for elt, v in zip(elts, value):
+        elt(locals, v)
+    return _assign_unpack
+  raise TypeError("Unsupported target type for '{target!s}'.".format(target=node))
+
+
+def _compile_statement(node: ast.stmt) -> callable:
+  """ Compile an assignment statement into a closure executing it on the local variables.
+  """
+  if isinstance(node, ast.Assign):
+    value = _compile_expression(node.value)
+    targets = [_compile_target(target) for target in node.targets]
+    if len(targets) == 1:
+      target, = targets
+      unpack = not isinstance(node.targets[0], (ast.Tuple, ast.List))
+      def _assign(locals):
+        v = value(locals)
+        if unpack and isinstance(v, (tuple, list)) and len(v) == 1:
+          v = v[0]
+        target(locals, v)
+      return _assign
+    def _assign_many(locals):
+      v = value(locals)
+      if not (isinstance(v, (tuple, list)) and len(v) == len(targets)):
+        raise ValueError("Mismatch between number of targets and number of values in the expression.")
+      for target, vi in zip(targets, v):
+        target(locals, vi)
+    return _assign_many
+  if isinstance(node, ast.AugAssign) and type(node.op) in _inplace_operators:
+    return _compile_augassign(node)
+  raise RuntimeError("Expression not supported.")
+
+
+def _can_update_inplace(target: any, value: any, node_op: ast.operator) -> bool:
+  """
+  Whether ``target op= value`` can be computed in the memory of ``target``.
+
+  The target has to be a writeable array keeping its shape, and the result has
+  to be castable to its data type under the ``same_kind`` rule, as numpy does
+  for its in-place operators.
+  """
+  if not isinstance(target, np.ndarray) or not target.flags.writeable:
+    return False
+  if not isinstance(value, (Number, np.number, np.ndarray)):
+    return False
+  try:
+    if isinstance(node_op, ast.Div):
+      dtype = np.result_type(target, value, 1.0)
+    else:
+      dtype = np.result_type(target, value)
+    shape = np.broadcast_shapes(target.shape, np.shape(value))
+  except (TypeError, ValueError):
+    return False
+  return shape == target.shape and np.can_cast(dtype, target.dtype, casting="same_kind")
+
+
+def _compile_augassign(node: ast.AugAssign) -> callable:
+  """
+  Compile an augmented assignment, computed in place on the target whenever possible.
+
+  A name is rebound to the result when it cannot be updated in place (scalars,
+  or a result of another data type), a subscript is written back into its container.
+  """
+  ufunc = _binary_ufuncs[type(node.op)]
+  op = _binary_operators[type(node.op)]
+  iop = _inplace_operators[type(node.op)]
+  node_op = node.op
+  value = _compile_expression(node.value)
+  check = _budgeted(lambda target, v: None, node_op)
+  def _update(target, v):
+    check(target, v)
+    if _can_update_inplace(target, v, node_op):
+      return ufunc(target, v, out=target)
+    if isinstance(target, np.ndarray):
+      return op(target, v)
+    return iop(target, v)
+  target = node.target
+  if isinstance(target, ast.Name):
+    name = target.id
+    lookup = _compile_name(name)
+    def _augassign_name(locals):
+      locals[name] = _update(lookup(locals), value(locals))
+    return _augassign_name
+  if isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name):
+    name = target.value.id
+    lookup = _compile_name(name)
+    index = _compile_slice(target.slice)
+    def _augassign_subscript(locals):
+      container = lookup(locals)
+      i = index(locals)
+      current = container[i]
+      v = value(locals)
+      if isinstance(container, np.ndarray) and isinstance(current, np.ndarray) \
+          and np.may_share_memory(current, container):
+        # Basic indexing gives a view, update the container through it.
+        if not _can_update_inplace(current, v, node_op):
+          raise TypeError("Cannot update '{name}' in place with the result of the operation.".format(name=name))
+        ufunc(current, v, out=current)
+        return
+      result = _update(current, v)
+      if isinstance(container, np.ndarray) and not np.can_cast(np.result_type(result), container.dtype, casting="same_kind"):
+        raise TypeError("Cannot update '{name}' in place with the result of the operation.".format(name=name))
+      container[i] = result
+    return _augassign_subscript
+  raise TypeError("Unsupported target type for '{target!s}'.".format(target=target))
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_expression_source(source: str) -> callable:
+  tree = ast.parse(source, mode='eval')
+  _validate_expression(tree)
+  return _compile_expression(tree)
+
+
+def safe_eval(node_or_string: Union[str, ast.AST], locals: dict={}, budget: Budget=None) -> Union[Number, str, np.ndarray]:
   """
   Safely evaluate expression with some supported functions and local variables.
 
   Adapted from Python's built in ast.literal_eval function, this function provides more
-  numerical flexibility while trying to be as safe as possible.
+  numerical flexibility while trying to be as safe as possible. The expression is
+  compiled into closures once, expression strings are memoized.
 
   Parameters
   ----------
@@ -56,180 +701,402 @@ def safe_eval(node_or_string: Union[str, ast.AST], locals: dict={}) -> Union[Num
       The expression to evaluate.
   locals : dict
       Only generic number types, numpy number types, and numpy.ndarray are supported as local variables.
+  budget : Budget, default to None
+      Limits of the resources of the evaluation, the budget of the enclosing ``use_budget`` if None.
+
+  Raises
+  ------
+  ResourceLimitError
+      If the evaluation exceeds its budget.
   """
   if node_or_string is None:
     return None
-  _safety_check(locals)
-  valid_numpy_functions = [
-      "sum", "sin", "cos", "tan", "arcsin", "arccos", "arctan",
-      "log", "exp", "abs", "max", "min", "argmin", "argmax",
-      "dot", "pi",
-      ]
-  valid_math_functions = [
-      "gcd", "factorial",
-      ]
-  valid_unit_conversion_functions = [
-      "energy", "mass", "pressure", "length",
-      ]
-  valid_constant_functions = [
-      "hbar", "kB", "AMU", "THz", "eV", "Angstrom",
-      ]
   if isinstance(node_or_string, str):
-    node_or_string = ast.parse(node_or_string, mode='eval')
-  def _raise_malformed_node(node):
-    raise ValueError(f'malformed node or string: {node!r}')
-  def _convert_num(node):
-    if isinstance(node, ast.Call):
-      return _convert_call(node)
-    if not isinstance(node, ast.Constant) or type(node.value) not in (int, float, complex):
-      _raise_malformed_node(node)
-    return node.value
-  def _convert_signed_num(node):
-    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
-      operand = _convert_num(node.operand)
-      if isinstance(node.op, ast.UAdd):
-        return + operand
-      else:
-        return - operand
-    return _convert_num(node)
-  def _convert_call(node):
-    if not hasattr(node.func, "id"):
-      raise NameError("Syntax '{module}.{name}' not supported.".format(module=node.func.value.id, name=node.func.attr))
-    args = []
-    if hasattr(node, "args"):
-      args = [_convert(arg) for arg in node.args]
-    keywords = {}
-    if hasattr(node, "keywordss"):
-      keywords = {keyword.arg:_convert(keyword.value) for keyword in node.keywords}
-    if node.func.id in valid_numpy_functions:
-      return getattr(np, node.func.id)(*args, **keywords)
-    if node.func.id in valid_math_functions:
-      return getattr(lmath, node.func.id)(*args, **keywords)
-    if node.func.id in valid_unit_conversion_functions:
-      return getattr(unit_conversion, node.func.id)(*args, **keywords)
-    if node.func.id in valid_constant_functions:
-      return getattr(constant, node.func.id)(*args, **keywords)
-  def _convert(node):
-    if isinstance(node_or_string, ast.Expression):
-      node = getattr(node, "body", node)
-    if isinstance(node, ast.Name):
-      if node.id in locals:
-        if isinstance(locals[node.id], (Number, np.number, np.ndarray, list)):
-          return locals[node.id]
-      else:
-        raise NameError("name \'{name}\' is not defined.".format(name=node.id))
-    elif isinstance(node, ast.Subscript):
-      slice = eval_slice(node.slice, locals=locals)
-      return _convert(node.value)[slice]
-    elif isinstance(node, ast.Call):
-      return _convert_call(node)
-    else:
-      if isinstance(node, ast.Constant):
-        return node.value
-      elif isinstance(node, ast.Tuple):
-        return tuple(map(_convert, node.elts))
-      elif isinstance(node, ast.List):
-        return list(map(_convert, node.elts))
-      elif isinstance(node, ast.Set):
-        return set(map(_convert, node.elts))
-      elif isinstance(node, ast.Dict):
-        if len(node.keys) != len(node.values):
-          _raise_malformed_node(node)
-        return dict(zip(map(_convert, node.keys),
-          map(_convert, node.values)))
-      elif isinstance(node, ast.BinOp):
-        left = _convert(node.left)
-        right = _convert(node.right)
-        if isinstance(node.op, (ast.Add, ast.Sub)):
-          if isinstance(node.op, ast.Add):
-            return left + right
-          else:
-            return left - right
-        elif isinstance(node.op, (ast.Mult)):
-          return left * right
-        elif isinstance(node.op, (ast.Div)):
-          return left / right
-        elif isinstance(node.op, (ast.FloorDiv)):
-          return left // right
-        elif isinstance(node.op, (ast.Mod)):
-          return left % right
-        elif isinstance(node.op, (ast.Pow)):
-          return left ** right
-      return _convert_signed_num(node)
-  return _convert(node_or_string)
+    evaluate = _compile_expression_source(node_or_string)
+  else:
+    _validate_expression(node_or_string)
+    evaluate = _compile_expression(node_or_string)
+  _safety_check(locals)
+  with use_budget(budget):
+    return evaluate(locals)
 
 
 def eval_slice(sl, locals: dict={}) -> slice:
   """ Evaluate the Slice AST object and reconstruct the slice object.
   """
-  if isinstance(sl, ast.Constant):
-    return safe_eval(sl, locals=locals)
-  elif isinstance(sl, ast.Slice):
-    return slice(
-        safe_eval(sl.lower, locals=locals),
-        safe_eval(sl.upper, locals=locals),
-        safe_eval(sl.step,  locals=locals),
-        )
-  elif isinstance(sl, ast.List):
-    return [safe_eval(elt, locals=locals) for elt in sl.elts]
-  elif isinstance(sl, ast.Tuple):
-    return tuple([eval_slice(elt, locals=locals) for elt in sl.elts])
-  else:
-    raise TypeError("Unsupported slice type for '{sl}'.".format(sl=sl))
+  _validate_expression(sl)
+  _safety_check(locals)
+  return _compile_slice(sl)(locals)
 
 
 def safe_assign(target: Union[str, ast.AST], value: any, locals: dict={}):
   """ Safely assign value to a local variable in locals dict.
   """
   if isinstance(target, str):
-    target = ast.parse(target, mode='exec')
+    target = ast.parse(target, mode='eval')
   if isinstance(target, ast.Expression):
     target = target.body
-  if isinstance(target, ast.Name):
-    locals[target.id] = value
-  elif isinstance(target, ast.Attribute):
-    setattr(locals[target.value.id], target.attr, value)
-  elif isinstance(target, ast.Subscript):
-    slice = eval_slice(target.slice, locals=locals)
-    if hasattr(target.value, "id"):
-      locals[target.value.id][slice] = value
-    else:
-      raise TypeError("Unsupported target expression for '{target!s}'.".format(target=target))
-  else:
-    raise TypeError("Unsupported target type for '{target!s}'.".format(target=target))
+  _compile_target(target)(locals, value)
 
 
-def safe_exec(node: Union[str, ast.AST], locals: dict={}):
-  """ Safely execute a Python statement with provided local variables.
+def safe_exec(node: Union[str, ast.AST], locals: dict={}, budget: Budget=None):
+  """ Safely execute a Python statement with provided local variables, within an optional ``Budget``.
   """
   if isinstance(node, str):
-    node = ast.parse(node, mode='exec')
-  if isinstance(node.body, list):
-    for n in node.body:
-      if isinstance(n, ast.Assign):
-        targets = n.targets
-        value = safe_eval(n.value, locals=locals)
-        if isinstance(value, (tuple, list)) and len(value) == len(targets):
-          for i in range(len(targets)):
-            safe_assign(targets[i], value[i], locals=locals)
-        elif len(targets) == 1:
-          safe_assign(targets[0], value, locals=locals)
-        else:
-          raise ValueError("Mismatch between number of targets and number of values in the expression.")
-      elif isinstance(n, ast.AugAssign):
-        target = safe_eval(n.target, locals=locals)
-        value = safe_eval(n.value, locals=locals)
-        if isinstance(n.op, ast.Add):
-          target += value
-        elif isinstance(n.op, ast.Sub):
-          target -= value
-        elif isinstance(n.op, (ast.Mult)):
-          target *= value
-        elif isinstance(n.op, (ast.Div)):
-          target /= value
-        elif isinstance(n.op, (ast.FloorDiv)):
-          target //= value
-        elif isinstance(n.op, (ast.Mod)):
-          target %= value
-      else:
-        raise RuntimeError("Expression not supported.")
+    compile_transform(node)(locals, budget=budget)
+  elif isinstance(node.body, list):
+    CompiledTransform(node)(locals, budget=budget)
+
+
+_valid_expression_nodes = (
+    ast.Expression, ast.Name, ast.Constant, ast.Subscript, ast.Slice,
+    ast.Tuple, ast.List, ast.Set, ast.Dict, ast.BinOp, ast.UnaryOp, ast.Call, ast.keyword,
+    ast.Compare, ast.BoolOp,
+    ast.Load, ast.Store, ast.UAdd, ast.USub, ast.Not, ast.Invert,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.BitAnd, ast.BitOr, ast.BitXor, ast.And, ast.Or,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+    ) + ((ast.Index, ) if hasattr(ast, "Index") else ())
+
+
+def _validate(node: ast.AST):
+  """
+  Check once that a parsed transform only uses the syntax and functions ``safe_exec`` supports.
+
+  Raises
+  ------
+  RuntimeError
+      If a statement is not an assignment.
+  NameError
+      If a function is not in the supported list.
+  ValueError
+      If the syntax is not supported.
+  """
+  for statement in node.body:
+    if not isinstance(statement, (ast.Assign, ast.AugAssign)):
+      raise RuntimeError("Expression not supported.")
+    targets = statement.targets if isinstance(statement, ast.Assign) else [statement.target]
+    for target in targets:
+      if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name):
+        continue
+      _validate_expression(target)
+    _validate_expression(statement.value)
+
+
+def _validate_expression(node: ast.AST):
+  """ Worker function for ``_validate`` method.
+  """
+  for child in ast.walk(node):
+    if not isinstance(child, _valid_expression_nodes):
+      raise ValueError(f'malformed node or string: {child!r}')
+    if isinstance(child, ast.keyword) and child.arg is None:
+      raise ValueError(f'malformed node or string: {child!r}')
+    if isinstance(child, ast.Call):
+      if not isinstance(child.func, ast.Name):
+        raise NameError("Syntax '{}' not supported.".format(ast.dump(child.func)))
+      if child.func.id not in valid_functions:
+        raise NameError("Function '{name}' is not supported.".format(name=child.func.id))
+
+
+_foldable_functions = valid_unit_conversion_functions | valid_constant_functions
+
+
+def _unparse(tree: ast.AST) -> str:
+  """ Source code of a tree, its dump on Python versions without ``ast.unparse``.
+  """
+  return ast.unparse(tree) if hasattr(ast, "unparse") else ast.dump(tree)
+
+
+def _is_number(node: ast.AST) -> bool:
+  return isinstance(node, ast.Constant) and type(node.value) in (int, float, complex)
+
+
+def _fold(node: ast.AST, func: callable, *args) -> ast.AST:
+  """ Replace a node by the constant it evaluates to, keep it if the evaluation fails.
+  """
+  try:
+    value = func(*args)
+  except Exception:
+    # Leave the error to be raised when the transform is executed.
+    return node
+  if isinstance(value, np.number):
+    value = value.item()
+  if type(value) not in (int, float, complex):
+    return node
+  return ast.copy_location(ast.Constant(value=value), node)
+
+
+class _ConstantFolder(ast.NodeTransformer):
+  """ Fold literal arithmetic and calls to unit conversions and physical constants with literal arguments.
+  """
+
+  def visit_BinOp(self, node):
+    self.generic_visit(node)
+    if _is_number(node.left) and _is_number(node.right) and type(node.op) in _binary_operators:
+      base, exponent = node.left.value, node.right.value
+      if isinstance(node.op, ast.Pow) and type(base) == int and type(exponent) == int \
+          and exponent * max(abs(base), 2).bit_length() > 4096:
+        # Do not spend the compilation on a huge integer.
+        return node
+      # Folding is bounded by the active budget too, an expression over it is left to fail when executed.
+      return _fold(node, _budgeted(_binary_operators[type(node.op)], node.op), base, exponent)
+    return node
+
+  def visit_UnaryOp(self, node):
+    self.generic_visit(node)
+    if _is_number(node.operand) and type(node.op) in _unary_operators:
+      return _fold(node, _unary_operators[type(node.op)], node.operand.value)
+    return node
+
+  def visit_Call(self, node):
+    self.generic_visit(node)
+    if isinstance(node.func, ast.Name) and node.func.id in _foldable_functions and not node.keywords \
+        and all(isinstance(arg, ast.Constant) for arg in node.args):
+      return _fold(node, _resolve_function(node.func.id), *[arg.value for arg in node.args])
+    return node
+
+
+class _Replacer(ast.NodeTransformer):
+  """ Replace given nodes, identified by their id, by a name.
+  """
+
+  def __init__(self, nodes: list, name: str):
+    self._ids = set(id(node) for node in nodes)
+    self._name = name
+
+  def visit(self, node):
+    if id(node) in self._ids:
+      return ast.copy_location(ast.Name(id=self._name, ctx=ast.Load()), node)
+    return super().visit(node)
+
+
+def _assigned_names(statement: ast.stmt) -> set:
+  """
+  Names rebound by a statement, None if it may modify arrays in place.
+
+  Arrays may be aliased, so an in-place update or a store into a subscript
+  or an attribute is considered as modifying every variable.
+  """
+  if not isinstance(statement, ast.Assign):
+    return None
+  names = set()
+  for target in statement.targets:
+    for node in ast.walk(target):
+      if isinstance(node, (ast.Subscript, ast.Attribute)):
+        return None
+      if isinstance(node, ast.Name):
+        names.add(node.id)
+  return names
+
+
+def _read_names(statement: ast.stmt) -> set:
+  """ Names whose values are used by a statement.
+  """
+  rebound = set()
+  if isinstance(statement, ast.Assign):
+    for target in statement.targets:
+      if isinstance(target, (ast.Tuple, ast.List)):
+        rebound.update(id(elt) for elt in target.elts if isinstance(elt, ast.Name))
+      elif isinstance(target, ast.Name):
+        rebound.add(id(target))
+  return set(node.id for node in ast.walk(statement) if isinstance(node, ast.Name) and id(node) not in rebound)
+
+
+def _eliminate_dead_assignments(body: list) -> list:
+  """ Drop assignments to a name rebound by a later statement before the name is used.
+  """
+  live = []
+  for i, statement in enumerate(body):
+    if isinstance(statement, ast.Assign) and len(statement.targets) == 1 \
+        and isinstance(statement.targets[0], ast.Name):
+      name = statement.targets[0].id
+      dead = False
+      for later in body[i + 1:]:
+        if name in _read_names(later):
+          break
+        if name in (_assigned_names(later) or ()):
+          dead = True
+          break
+      if dead:
+        continue
+    live.append(statement)
+  return live
+
+
+def _node_size(node: ast.AST) -> int:
+  return sum(1 for _ in ast.walk(node))
+
+
+def _find_common_subexpression(body: list) -> tuple:
+  """
+  Find the largest subexpression computed more than once with the same inputs.
+
+  Occurrences are shared from one statement to the next as long as none of the
+  names they use is rebound in between. A shared value bound as a whole to more
+  than one name would alias their arrays, so only one such occurrence is shared.
+
+  Returns
+  -------
+  (index, nodes): tuple
+      Index of the first statement computing the subexpression and its occurrences,
+      None if there is no common subexpression.
+  """
+  occurrences = {}
+  for i, statement in enumerate(body):
+    bound = [statement.value]
+    if isinstance(statement.value, (ast.Tuple, ast.List)):
+      bound.extend(statement.value.elts)
+    for node in ast.walk(statement.value):
+      if isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Call, ast.Compare, ast.BoolOp)):
+        occurrences.setdefault(ast.dump(node), []).append((i, node, any(node is b for b in bound)))
+  best = None
+  for occurrence in occurrences.values():
+    names = set(n.id for n in ast.walk(occurrence[0][1]) if isinstance(n, ast.Name))
+    size = _node_size(occurrence[0][1])
+    segment = []
+    for i, node, is_bound in occurrence + [(None, None, False)]:
+      if segment and (i is None or any(
+          (_assigned_names(body[k]) is None) or (_assigned_names(body[k]) & names)
+          for k in range(segment[0][0], i))):
+        shared = [n for k, n in enumerate(segment) if not n[2] or not any(m[2] for m in segment[:k])]
+        if len(shared) >= 2 and (best is None or size > best[0]):
+          best = (size, shared[0][0], [n[1] for n in shared])
+        segment = []
+      segment.append((i, node, is_bound))
+  return None if best is None else best[1:]
+
+
+def _eliminate_common_subexpressions(body: list, reserved: set) -> tuple:
+  """
+  Compute the common subexpressions once into temporary variables.
+
+  Returns
+  -------
+  (body, temporaries): tuple
+      The new statements and the names of the temporary variables.
+  """
+  temporaries = []
+  while True:
+    found = _find_common_subexpression(body)
+    if found is None:
+      return body, temporaries
+    index, nodes = found
+    name = "_cse{}".format(len(temporaries))
+    while name in reserved:
+      name = "_" + name
+    value = copy.deepcopy(nodes[0])
+    body = [_Replacer(nodes, name).visit(statement) for statement in body]
+    hoisted = ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=value)
+    body.insert(index, ast.copy_location(hoisted, body[index]))
+    temporaries.append(name)
+
+
+def optimize(tree: ast.Module) -> tuple:
+  """
+  Optimize a validated transform.
+
+  Literal arithmetic and calls to the unit conversion and physical constant
+  functions with literal arguments are folded into constants, assignments
+  overwritten before being used are dropped, and subexpressions computed
+  several times on the same inputs are computed once into temporary variables.
+
+  Parameters
+  ----------
+  tree: ast.Module
+      The parsed transform, left untouched.
+
+  Returns
+  -------
+  (tree, temporaries): tuple
+      The optimized transform, and the names of the temporary variables it introduced.
+  """
+  tree = _ConstantFolder().visit(copy.deepcopy(tree))
+  reserved = set(node.id for node in ast.walk(tree) if isinstance(node, ast.Name))
+  body = _eliminate_dead_assignments(tree.body)
+  body, temporaries = _eliminate_common_subexpressions(body, reserved)
+  tree = ast.fix_missing_locations(ast.Module(body=body, type_ignores=[]))
+  return tree, temporaries
+
+
+class CompiledTransform:
+  """
+  A transform parsed, validated, optimized and compiled once, to be executed on many datasets.
+
+  Parameters
+  ----------
+  source: Union[str, ast.Module]
+      The transform, one or more Python assignment statements.
+  """
+
+
+  def __init__(self, source: Union[str, ast.Module]):
+    if isinstance(source, str):
+      self._source = source
+      self._tree = ast.parse(source, mode='exec')
+    else:
+      self._source = _unparse(source)
+      self._tree = source
+    _validate(self._tree)
+    self._optimized, self._temporaries = optimize(self._tree)
+    self._statements = [_compile_statement(statement) for statement in self._optimized.body]
+
+
+  @property
+  def source(self) -> str:
+    return self._source
+
+
+  @property
+  def optimized_source(self) -> str:
+    """ The transform actually executed, after optimization.
+    """
+    return _unparse(self._optimized)
+
+
+  def __call__(self, locals: dict, budget: Budget=None) -> dict:
+    """ Execute the transform on the variables in ``locals``, which are updated in place,
+    within ``budget``, or the budget of the enclosing ``use_budget`` if None.
+    """
+    _safety_check(locals)
+    try:
+      with use_budget(budget):
+        active = active_budget()
+        for statement in self._statements:
+          if active is not None:
+            check_deadline(active)
+          statement(locals)
+    finally:
+      # The temporaries of the optimizer never leak into the variables, even on errors.
+      for name in self._temporaries:
+        locals.pop(name, None)
+    return locals
+
+
+  def __repr__(self):
+    return "<CompiledTransform {!r}>".format(self._source)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_transform(source: str) -> CompiledTransform:
+  return CompiledTransform(source)
+
+
+def compile_transform(source: Union[str, CompiledTransform]) -> CompiledTransform:
+  """
+  Parse and validate a transform once and return a reusable callable.
+
+  Compiled transforms are memoized by their source string, so the same
+  transform applied to many files is only compiled once.
+
+  Parameters
+  ----------
+  source: Union[str, CompiledTransform]
+      The transform, returned as is if already compiled.
+
+  Returns
+  -------
+  transform: CompiledTransform
+  """
+  if isinstance(source, CompiledTransform):
+    return source
+  return _compile_transform(source)
@@ -0,0 +1,186 @@
+import functools
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from lplot.rolling import sample_axis
+
+
+__all__ = ["spectrum", "psd", "window", "windowed"]
+
+
+_windows = {
+    "boxcar": np.ones,
+    "hann": np.hanning,
+    "hamming": np.hamming,
+    "blackman": np.blackman,
+    "bartlett": np.bartlett,
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _fft_length(n: int) -> int:
+  """ Smallest 5-smooth number, a product of powers of 2, 3 and 5, not smaller than n.
+
+  The FFT of such lengths is much faster than that of lengths with large prime factors.
+  """
+  best = 1 << max(n - 1, 0).bit_length()
+  p5 = 1
+  while p5 < best:
+    p35 = p5
+    while p35 < best:
+      p2 = 1 << (-(-n // p35) - 1).bit_length()
+      best = min(best, p2 * p35)
+      p35 *= 3
+    p5 *= 5
+  return best
+
+
+def window(n: int, kind: str="hann") -> np.ndarray:
+  """
+  Periodic window function, as used in spectral analysis.
+
+  Parameters
+  ----------
+  n: int
+      Number of points of the window.
+  kind: str, default to "hann"
+      One of "boxcar", "hann", "hamming", "blackman" and "bartlett".
+  """
+  if kind not in _windows:
+    raise ValueError("Unknown window '{}', available windows are {}.".format(kind, ", ".join(_windows)))
+  if int(n) != n or n < 1:
+    raise ValueError("Window length is expected to be a positive integer.")
+  return _windows[kind](int(n) + 1)[:-1]
+
+
+# Alias for the functions with a ``window`` argument.
+_window = window
+
+
+def _samples(y: np.ndarray, axis: int) -> tuple:
+  """ Data of ``y`` with the transformed axis moved last, and that axis.
+  """
+  axis = sample_axis(axis)
+  if np.ma.getmask(y) is not np.ma.nomask and np.ma.getmask(y).any():
+    raise TypeError("Spectra of datasets of different lengths cannot be computed at once.")
+  y = np.asarray(np.ma.getdata(y))
+  if y.ndim == 0:
+    raise ValueError("Input is expected to be an array.")
+  return np.moveaxis(y, axis, -1), axis
+
+
+def _frequencies(nfft: int, dt: float, shape: tuple, axis: int) -> np.ndarray:
+  """
+  Frequencies of a one-sided spectrum of the given shape.
+
+  They are repeated over the axes before the transformed one, so they have the shape
+  of ``x`` for stacked datasets, and are 1 dimentional for the columns of a data file.
+  """
+  axis = axis % len(shape)
+  return np.broadcast_to(np.fft.rfftfreq(nfft, dt), shape[:axis] + (shape[axis], )).copy()
+
+
+def windowed(y: np.ndarray, kind: str="hann", axis: int=None) -> np.ndarray:
+  """
+  Multiply the data by a window function along an axis.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Input data, a dataset or stacked datasets.
+  kind: str, default to "hann"
+      Window function, see ``window``.
+  axis: int, default to None
+      Axis of the samples, the default one if None, see ``lplot.rolling.samples_along``.
+  """
+  samples, axis = _samples(y, axis)
+  return np.moveaxis(samples * _window(samples.shape[-1], kind), -1, axis)
+
+
+def spectrum(y: np.ndarray, dt: float=1., window: str="hann", axis: int=None) -> tuple:
+  """
+  One-sided amplitude spectrum with a real FFT.
+
+  The samples are zero padded to a 5-smooth length, and all the datasets are
+  transformed in a single batched FFT. The amplitude of a sine of amplitude A is A.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Input data, a dataset or stacked datasets.
+  dt: float, default to 1.
+      Time step between samples, the frequencies are in the inverse of its unit.
+  window: str, default to "hann"
+      Window function applied to the samples, see ``lplot.spectral.window``.
+  axis: int, default to None
+      Axis of the samples, the default one if None, see ``lplot.rolling.samples_along``.
+
+  Returns
+  -------
+  (freq, amplitude): tuple
+  """
+  samples, axis = _samples(y, axis)
+  n = samples.shape[-1]
+  weights = _window(n, window)
+  nfft = _fft_length(n)
+  amplitude = np.abs(np.fft.rfft(samples * weights, n=nfft, axis=-1))
+  amplitude *= 2. / weights.sum()
+  amplitude[..., 0] /= 2.
+  if nfft % 2 == 0:
+    amplitude[..., -1] /= 2.
+  amplitude = np.moveaxis(amplitude, -1, axis)
+  return _frequencies(nfft, dt, amplitude.shape, axis), amplitude
+
+
+def psd(
+    y: np.ndarray,
+    dt: float=1.,
+    nperseg: int=256,
+    overlap: float=0.5,
+    window: str="hann",
+    axis: int=None,
+    ) -> tuple:
+  """
+  One-sided power spectral density with Welch's method.
+
+  The samples are cut into overlapping segments, taken as strided views of the
+  data, each segment has its mean removed and is windowed, and all the segments
+  of all the datasets go through a single batched FFT before being averaged.
+
+  Parameters
+  ----------
+  y: np.ndarray
+      Input data, a dataset or stacked datasets.
+  dt: float, default to 1.
+      Time step between samples, the frequencies are in the inverse of its unit.
+  nperseg: int, default to 256
+      Number of samples of a segment, at most the number of samples.
+  overlap: float, default to 0.5
+      Fraction of a segment overlapping with the next one, in [0, 1).
+  window: str, default to "hann"
+      Window function applied to the segments, see ``lplot.spectral.window``.
+  axis: int, default to None
+      Axis of the samples, the default one if None, see ``lplot.rolling.samples_along``.
+
+  Returns
+  -------
+  (freq, density): tuple
+  """
+  if not 0 <= overlap < 1:
+    raise ValueError("Overlap is expected to be in [0, 1).")
+  if int(nperseg) != nperseg or nperseg < 1:
+    raise ValueError("Segment length is expected to be a positive integer.")
+  samples, axis = _samples(y, axis)
+  nperseg = min(int(nperseg), samples.shape[-1])
+  step = max(1, int(round(nperseg * (1 - overlap))))
+  segments = sliding_window_view(samples, nperseg, axis=-1)[..., ::step, :]
+  segments = segments - segments.mean(axis=-1, keepdims=True)
+  weights = _window(nperseg, window)
+  nfft = _fft_length(nperseg)
+  power = np.abs(np.fft.rfft(segments * weights, n=nfft, axis=-1)) ** 2
+  density = power.mean(axis=-2) * (dt / (weights * weights).sum())
+  density[..., 1:] *= 2.
+  if nfft % 2 == 0:
+    density[..., -1] /= 2.
+  density = np.moveaxis(density, -1, axis)
+  return _frequencies(nfft, dt, density.shape, axis), density
@@ -1,33 +1,391 @@
+import re
+from fractions import Fraction
+from functools import lru_cache
+import numpy as np
+
+
+# Base dimensions of the exponent vectors of the units.
+base_dimensions = ("length", "mass", "time", "current", "temperature")
+
+
+def _dimension(length=0, mass=0, time=0, current=0, temperature=0):
+  return (Fraction(length), Fraction(mass), Fraction(time), Fraction(current), Fraction(temperature))
+
+
+_joule = _dimension(length=2, mass=1, time=-2)
+_pascal = _dimension(length=-1, mass=1, time=-2)
+
+
+# Scale in SI units and dimensions of the known units. ``A`` is the Angstrom, as in the tables below.
+_units = {
+    "m": (1., _dimension(length=1)),
+    "Angstrom": (1e-10, _dimension(length=1)),
+    "A": (1e-10, _dimension(length=1)),
+    "Bohr": (5.29177210903e-11, _dimension(length=1)),
+    "inch": (0.0254, _dimension(length=1)),
+    "mile": (1609.344, _dimension(length=1)),
+    "ly": (9.4607304725808e15, _dimension(length=1)),
+    "g": (1e-3, _dimension(mass=1)),
+    "amu": (1.66053906660e-27, _dimension(mass=1)),
+    "s": (1., _dimension(time=1)),
+    "sec": (1., _dimension(time=1)),
+    "min": (60., _dimension(time=1)),
+    "hour": (3600., _dimension(time=1)),
+    "day": (86400., _dimension(time=1)),
+    "Hz": (1., _dimension(time=-1)),
+    "ampere": (1., _dimension(current=1)),
+    "C": (1., _dimension(time=1, current=1)),
+    "K": (1., _dimension(temperature=1)),
+    "N": (1., _dimension(length=1, mass=1, time=-2)),
+    "dyne": (1e-5, _dimension(length=1, mass=1, time=-2)),
+    "J": (1., _joule),
+    "erg": (1e-7, _joule),
+    "cal": (4.184, _joule),
+    "eV": (1.602176634e-19, _joule),
+    "Ha": (4.3597447222071e-18, _joule),
+    "Ry": (4.3597447222071e-18 / 2, _joule),
+    "W": (1., _dimension(length=2, mass=1, time=-3)),
+    "Pa": (1., _pascal),
+    "pascal": (1., _pascal),
+    "bar": (1e5, _pascal),
+    "atm": (101325., _pascal),
+    }
+
+
+# SI prefixes, and the units which take them.
+_prefixes = {
+    "P": 1e15, "T": 1e12, "G": 1e9, "M": 1e6, "k": 1e3,
+    "c": 1e-2, "m": 1e-3, "u": 1e-6, "n": 1e-9, "p": 1e-12, "f": 1e-15,
+    }
+_prefixed_units = frozenset(["m", "g", "s", "Hz", "C", "K", "N", "J", "eV", "Ry", "Ha", "W", "Pa", "bar"])
+
+
+_unit_tokens = re.compile(r"\s*(?:(?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)|(?P<name>[A-Za-z_]+)(?P<power>-?\d+)?|(?P<op>\*\*|[-+*/^()]))")
+
+
+def _tokenize(unit):
+  tokens = []
+  position = 0
+  unit = unit.strip()
+  while position < len(unit):
+    match = _unit_tokens.match(unit, position)
+    if match is None:
+      raise ValueError("Unit {unit} cannot be parsed at '{rest}'".format(unit=unit, rest=unit[position:]))
+    tokens.append((match.lastgroup if match.group("name") is None else "name", match))
+    position = match.end()
+  return tokens
+
+
+def _base_unit(name):
+  """Scale and dimensions of a unit name, possibly with an SI prefix.
+  """
+  if name in _units:
+    return _units[name]
+  if name[:1] in _prefixes and name[1:] in _prefixed_units:
+    scale, dimension = _units[name[1:]]
+    return _prefixes[name[:1]] * scale, dimension
+  raise ValueError("Unit {name} is unknown".format(name=name))
+
+
+class _UnitParser:
+  """Recursive descent parser of compound units, such as ``eV*sec^2/A^2`` or ``cm-1``.
+
+  Products and quotients associate left to right, ``^`` or ``**`` raises to an integer,
+  decimal or parenthesized fractional power, and a power directly following a name
+  applies to it, as in ``cm-1``.
+  """
+
+
+  def __init__(self, unit):
+    self.unit = unit
+    self.tokens = _tokenize(unit)
+    self.position = 0
+
+
+  def peek(self):
+    if self.position < len(self.tokens):
+      kind, match = self.tokens[self.position]
+      return match.group(0).strip()
+    return None
+
+
+  def take(self):
+    token = self.tokens[self.position]
+    self.position += 1
+    return token
+
+
+  def error(self):
+    return ValueError("Unit {unit} cannot be parsed".format(unit=self.unit))
+
+
+  def parse(self):
+    scale, dimension = self.expression()
+    if self.position != len(self.tokens):
+      raise self.error()
+    return scale, dimension
+
+
+  def expression(self):
+    scale, dimension = self.power()
+    while self.peek() in ("*", "/"):
+      op = self.take()[1].group("op")
+      other_scale, other_dimension = self.power()
+      sign = 1 if op == "*" else -1
+      scale *= other_scale ** sign
+      dimension = dimension + sign * other_dimension
+    return scale, dimension
+
+
+  def power(self):
+    scale, dimension = self.atom()
+    if self.peek() in ("^", "**"):
+      self.take()
+      exponent = self.exponent()
+      scale, dimension = scale ** float(exponent), dimension * exponent
+    return scale, dimension
+
+
+  def atom(self):
+    if self.position >= len(self.tokens):
+      raise self.error()
+    kind, match = self.take()
+    if kind == "number":
+      return float(match.group("number")), np.array(_dimension(), dtype=object)
+    if kind == "name":
+      scale, dimension = _base_unit(match.group("name"))
+      dimension = np.array(dimension, dtype=object)
+      if match.group("power") is not None:
+        exponent = Fraction(match.group("power"))
+        scale, dimension = scale ** float(exponent), dimension * exponent
+      return scale, dimension
+    if match.group("op") == "(":
+      result = self.expression()
+      if self.peek() != ")":
+        raise self.error()
+      self.take()
+      return result
+    raise self.error()
+
+
+  def exponent(self):
+    parenthesized = self.peek() == "("
+    if parenthesized:
+      self.take()
+    sign = 1
+    if self.peek() in ("-", "+"):
+      sign = -1 if self.take()[1].group("op") == "-" else 1
+    if self.position >= len(self.tokens) or self.tokens[self.position][0] != "number":
+      raise self.error()
+    exponent = sign * Fraction(self.take()[1].group("number"))
+    if parenthesized:
+      if self.peek() == "/":
+        self.take()
+        if self.position >= len(self.tokens) or self.tokens[self.position][0] != "number":
+          raise self.error()
+        exponent /= Fraction(self.take()[1].group("number"))
+      if self.peek() != ")":
+        raise self.error()
+      self.take()
+    return exponent
+
+
+@lru_cache(maxsize=1024)
+def parse_unit(unit):
+  """Decompose a compound unit into its scale in SI units and its dimensions.
+
+  Parameters
+  ----------
+  unit   :   str
+      The unit, products, quotients and powers of known units, e.g. ``Ha/Bohr^3``.
+
+  Returns
+  -------
+  (scale, dimension) : tuple
+      The value of the unit in SI units, and the exponents of the ``base_dimensions``.
+
+  Raises
+  ------
+  ValueError
+      If the unit cannot be parsed or one of its units is unknown.
+  """
+  scale, dimension = _UnitParser(unit).parse()
+  return scale, tuple(Fraction(d) for d in dimension)
+
+
+@lru_cache(maxsize=4096)
+def convert(v1, v2):
+  """Conversion coefficient between two dimensionally consistent compound units.
+
+  Parameters
+  ----------
+  v1   :   str
+      Unit converted from, e.g. ``Ha/Bohr^3``.
+  v2   :   str
+      Unit converted to, e.g. ``GPa``.
+
+  Raises
+  ------
+  ValueError
+      If the units cannot be parsed or their dimensions differ.
+  """
+  if v1 == v2:
+    return 1.0
+  scale1, dimension1 = parse_unit(v1)
+  scale2, dimension2 = parse_unit(v2)
+  if dimension1 != dimension2:
+    raise ValueError("Units {v1} and {v2} have different dimensions".format(v1=v1, v2=v2))
+  return scale1 / scale2
+
+
 class UnitConversion:
   """Find unit conversion coefficients
 
   This class construct a graph of different units and find a path within
-  the graph the calculate unit conversion coefficients.
+  the graph the calculate unit conversion coefficients. The coefficients between
+  all the pairs of connected units are computed once, with a breadth first search
+  from every unit, so that conversions are table lookups. Other conversions between
+  units of the same dimensions as the units of the table, such as compound units,
+  are computed by dimensional analysis with ``convert``.
 
   Parameters
   ----------
   data   :   str
       Table of unit conversion data. (See below for format eamples.)
+  rtol   :   float, optional, default to 1e-6
+      Relative tolerance of the agreement of the different paths between two units.
+
+  Raises
+  ------
+  ValueError
+      If different paths between two units give different coefficients.
   """
 
 
-  def __init__(self, data):
+  def __init__(self, data, rtol=1e-6):
     self.pair, self.neighbor = self.data_parse(data)
+    self.units = list(self.neighbor)
+    self.index = {unit: i for i, unit in enumerate(self.units)}
+    self.table = self.closure(self.pair, self.neighbor, self.units, rtol=rtol)
+    # Sorted unit names, to look up arrays of units with a binary search.
+    self._sorted_units = np.array(sorted(self.units))
+    self._sorted_index = np.array([self.index[unit] for unit in self._sorted_units], dtype=np.intp)
+    # Units of the table by dimensions, to bridge the other units to the table.
+    self.dimensions = {}
+    for unit in self.units:
+      try:
+        self.dimensions.setdefault(parse_unit(unit)[1], []).append(unit)
+      except ValueError:
+        pass
 
 
   def __call__(self, v1, v2):
     if v1 == v2:
       return 1.0
-    elif (v1, v2) in self.pair:
-      return self.pair[(v1, v2)]
-    else:
-      path = self.find_path(self.neighbor, v1, v2)
-      if path is None:
-        raise ValueError("Failed to find the path between {v1} and {v2}".format(v1=v1, v2=v2))
-      conversion = 1.0
-      for n1, n2 in zip(path[:-1], path[1:]):
-        conversion *= self.pair[(n1, n2)]
-      return conversion
+    conversion = np.nan
+    if (v1 in self.index) and (v2 in self.index):
+      conversion = self.table[self.index[v1], self.index[v2]]
+    if np.isnan(conversion):
+      return self.dimensional_conversion(v1, v2)
+    return float(conversion)
+
+
+  def _bridges(self, unit):
+    """Units of the table with the dimensions of ``unit``, and the coefficients from ``unit`` to them.
+    """
+    if unit in self.index:
+      return [(unit, 1.0)]
+    try:
+      dimension = parse_unit(unit)[1]
+    except ValueError as error:
+      raise ValueError("Failed to convert {unit}: {error}".format(unit=unit, error=error)) from None
+    if dimension not in self.dimensions:
+      raise ValueError("Unit {unit} has none of the dimensions of the units of the table".format(unit=unit))
+    return [(bridge, convert(unit, bridge)) for bridge in self.dimensions[dimension]]
+
+
+  def dimensional_conversion(self, v1, v2):
+    """Conversion coefficient by dimensional analysis, for units of the dimensions of the table.
+
+    Each unit missing from the table is converted to a unit of the table with the same
+    dimensions, and the table converts between them, e.g. ``Ha`` to ``eV`` to ``THz``.
+    """
+    bridges1, bridges2 = self._bridges(v1), dict(self._bridges(v2))
+    # Units of the same dimensions are converted directly, without the rounding of the table.
+    for bridge1, scale1 in bridges1:
+      if bridge1 in bridges2:
+        return scale1 / bridges2[bridge1]
+    for bridge1, scale1 in bridges1:
+      for bridge2, scale2 in bridges2.items():
+        conversion = self.table[self.index[bridge1], self.index[bridge2]]
+        if not np.isnan(conversion):
+          return scale1 * float(conversion) / scale2
+    raise ValueError("Failed to find the path between {v1} and {v2}".format(v1=v1, v2=v2))
+
+
+  def lookup(self, v1, v2):
+    """Conversion coefficients of arrays of pairs of units.
+
+    Parameters
+    ----------
+    v1   :   array_like of str
+        Units converted from.
+    v2   :   array_like of str
+        Units converted to, broadcast against ``v1``.
+
+    Returns
+    -------
+    conversion : np.ndarray
+        Coefficients of the conversions, with the broadcast shape of ``v1`` and ``v2``.
+    """
+    v1, v2 = np.broadcast_arrays(np.asarray(v1, dtype=str), np.asarray(v2, dtype=str))
+    conversion = self.table[self._indices(v1), self._indices(v2)]
+    missing = np.isnan(conversion) & (v1 != v2)
+    if np.any(missing):
+      pairs, inverse = np.unique(np.stack([v1[missing], v2[missing]], axis=-1), axis=0, return_inverse=True)
+      conversion[missing] = np.array([self.dimensional_conversion(*pair) for pair in pairs])[inverse.ravel()]
+    return np.where(v1 == v2, 1.0, conversion)
+
+
+  def _indices(self, units):
+    """Indices of an array of units in the table, -1 for unknown units.
+    """
+    if len(self.units) == 0:
+      return np.full(np.shape(units), -1, dtype=np.intp)
+    position = np.minimum(np.searchsorted(self._sorted_units, units), len(self.units) - 1)
+    return np.where(self._sorted_units[position] == units, self._sorted_index[position], -1)
+
+
+  @staticmethod
+  def closure(pair, neighbor, units, rtol=1e-6):
+    """Coefficients of the conversions between all the pairs of units.
+
+    Each row is filled by a breadth first search from its unit, multiplying the
+    coefficients along the edges. An edge reaching an already visited unit closes
+    a cycle, whose coefficient has to agree with the one already found.
+
+    Returns
+    -------
+    table : np.ndarray
+        ``table[i, j]`` converts ``units[i]`` to ``units[j]``, NaN if they are not connected.
+        The last row and column, reached by index -1, are all NaN.
+    """
+    index = {unit: i for i, unit in enumerate(units)}
+    table = np.full((len(units) + 1, len(units) + 1), np.nan)
+    for start in units:
+      row = table[index[start]]
+      row[index[start]] = 1.0
+      queue = [start]
+      for node in queue:
+        for other in neighbor[node]:
+          conversion = row[index[node]] * pair[(node, other)]
+          if np.isnan(row[index[other]]):
+            row[index[other]] = conversion
+            queue.append(other)
+          elif not np.isclose(row[index[other]], conversion, rtol=rtol, atol=0):
+            raise ValueError("Inconsistent conversions from {v1} to {v2}: {c1} and {c2}".format(
+                v1=start, v2=other, c1=row[index[other]], c2=conversion))
+    return table
 
 
   @staticmethod
@@ -43,21 +401,6 @@ class UnitConversion:
     return pair, neighbor
 
 
-  @classmethod
-  def find_path(cls, graph, start, end, path=[]):
-    path = path + [start]
-    if start == end:
-      return path
-    if start not in graph:
-      return None
-    for node in graph[start]:
-      if node not in path:
-        newpath = cls.find_path(graph, node, end, path)
-        if newpath:
-          return newpath
-    return None
-
-
   def __contains__(self, item):
     return item in self.neighbor
 
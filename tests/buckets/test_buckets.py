@@ -0,0 +1,60 @@
+import pytest
+import numpy as np
+
+from lplot.buckets import aggregate, bucket_starts
+from lplot.main import Plot
+
+
+def test_bucket_starts():
+  x = np.array([0., 0.5, 1.2, 3.1, 3.5, 3.9, 4.])
+  starts, bucket_x = bucket_starts(x, width=1.)
+  assert np.array_equal(starts, [0, 2, 3, 6])
+  assert np.array_equal(bucket_x, [0, 1, 3, 4])
+  starts, bucket_x = bucket_starts(x, samples=3)
+  assert np.array_equal(starts, [0, 3, 6])
+  assert np.array_equal(bucket_x, [0, 3.1, 4])
+  with pytest.raises(ValueError):
+    bucket_starts(x)
+
+
+def test_aggregate():
+  x = np.arange(10.)
+  y = np.column_stack([x, x ** 2])
+  statistics = ("mean", "min", "max", "sum", "count", "first", "last")
+  bucket_x, values = aggregate(x[::-1], y[::-1], statistics, width=4)
+  assert np.array_equal(bucket_x, [0, 4, 8])
+  for i, (start, stop) in enumerate([(0, 4), (4, 8), (8, 10)]):
+    bucket = y[start:stop]
+    assert np.allclose(values["mean"][i], bucket.mean(axis=0))
+    assert np.array_equal(values["min"][i], bucket.min(axis=0))
+    assert np.array_equal(values["max"][i], bucket.max(axis=0))
+    assert np.array_equal(values["sum"][i], bucket.sum(axis=0))
+    assert np.array_equal(values["count"][i], [stop - start] * 2)
+    assert np.array_equal(values["first"][i], bucket[0])
+    assert np.array_equal(values["last"][i], bucket[-1])
+  with pytest.raises(ValueError):
+    aggregate(x, y, ("median", ), width=4)
+
+
+def test_plot_aggregate():
+  x = np.linspace(0, 59.5, 120)
+  plot = Plot()
+  plot.add_data(np.column_stack([x, np.sin(x), np.cos(x)]), None)
+  plot.add_data(np.column_stack([np.arange(7.), np.arange(7.)]), None)
+  plot.aggregate("last", samples=3, datasets=[2])
+  assert np.array_equal(plot._Y[2], [2, 5, 6])
+  plot.aggregate("mean", width=10, band=True, datasets=[0, 1])
+  assert len(plot._X[0]) == 6
+  assert plot._X[0] is plot._X[1]
+  assert np.allclose(plot._Y[1][0], np.cos(x[:20]).mean())
+  plot.make_plot(show=False)
+  assert len(plot._backend._plot_handle.collections) == 2
+  # Bands are dropped once their datasets change.
+  plot.aggregate("mean", width=10, band=True, datasets=[0, 1])
+  plot.set_transform("y = y * 2", batch=True)
+  assert plot._bands == {}
+  plot.aggregate("max", width=20, band=True, datasets=[0, 1, 2])
+  plot.resample("union", datasets=[0, 2])
+  assert sorted(plot._bands) == [1]
+  plot.make_plot(show=False)
+  assert len(plot._backend._plot_handle.collections) == 1
@@ -0,0 +1,119 @@
+import pytest
+import numpy as np
+
+from lplot.buffers import GrowableArray, RingBuffer, array_from_iterable
+from lplot.main import Backend, Plot
+
+
+def test_growable_array():
+  buffer = GrowableArray(ncols=2, capacity=2)
+  for i in range(10):
+    buffer.append([i, 2 * i])
+  buffer.extend(np.ones((5, 2)))
+  assert buffer.capacity >= 15
+  data = buffer.finalize()
+  assert data.shape == (15, 2)
+  assert np.array_equal(data[:10, 1], 2 * np.arange(10))
+  # Arrays already returned are not affected by the rows appended afterwards.
+  view = buffer.finalize()[:3]
+  buffer.extend(np.full((100, 2), 7.))
+  assert np.array_equal(data[:3], [[0, 0], [1, 2], [2, 4]])
+  assert np.array_equal(view, data[:3])
+  assert np.array_equal(buffer.finalize()[-1], [7, 7])
+  assert buffer.finalize().shape == (115, 2)
+
+
+def test_array_from_iterable_rows_and_blocks():
+  def rows():
+    yield 0, 1
+    yield np.array([[1, 2], [2, 3]])
+    yield [3, 4]
+  data = array_from_iterable(rows())
+  assert np.array_equal(data, [[0, 1], [1, 2], [2, 3], [3, 4]])
+  with pytest.raises(ValueError):
+    array_from_iterable(iter([[0, 1], [0, 1, 2]]))
+  # Empty items hold no rows.
+  data = array_from_iterable(iter([[], [0, 1], np.empty(0), [[2, 3]]]))
+  assert np.array_equal(data, [[0, 1], [2, 3]])
+  with pytest.raises(ValueError):
+    array_from_iterable(iter([[]]))
+
+
+def test_add_data_generator():
+  plot = Plot()
+  plot.add_data((np.array([i, i ** 2, -i]) for i in range(100)), None)
+  assert plot.n_datasets == 2
+  assert np.array_equal(plot._Y[0], np.arange(100.) ** 2)
+
+
+def test_ring_buffer():
+  ring = RingBuffer(capacity=4)
+  ring.append(0)
+  ring.extend([1, 2])
+  assert np.array_equal(ring.values, [0, 1, 2])
+  ring.extend([3, 4, 5])
+  assert np.array_equal(ring.values, [2, 3, 4, 5])
+  ring.append(6)
+  assert np.array_equal(ring.values, [3, 4, 5, 6])
+  ring.extend(np.arange(10))
+  assert np.array_equal(ring.values, [6, 7, 8, 9])
+
+
+def test_plot_stream():
+  plot = Plot()
+  stream = plot.stream("live", capacity=3)
+  stream.extend([0, 1], [0, 10])
+  plot.make_plot(show=False)
+  line, = plot._artists[0]
+  for i in range(2, 6):
+    stream.append(i, 10 * i)
+  stream.refresh()
+  assert np.array_equal(plot._X[0], [3, 4, 5])
+  assert np.array_equal(line.get_ydata(), [30, 40, 50])
+
+
+class _RecordingBackend(Backend):
+  """ A backend drawing nothing, without in place updates.
+  """
+
+  def __init__(self, display=False, dim=None):
+    self.display = display
+    self.drawn = []
+
+  def show(self):
+    pass
+
+  def savefig(self, *args, **kwargs):
+    pass
+
+  def plot(self, x, y, **kwargs):
+    self.drawn.append(np.array(y))
+    return []
+
+  def get_default_fontsize(self):
+    return 10
+
+  def configure_plot(self, configs):
+    pass
+
+
+def test_plot_stream_custom_backend():
+  plot = Plot()
+  stream = plot.stream("live", capacity=2)
+  stream.extend([0, 1], [0, 10])
+  backend = _RecordingBackend()
+  plot.make_plot(backend=backend, show=False)
+  stream.append(2, 20)
+  # The whole plot is drawn again by backends which cannot update their artists.
+  stream.refresh()
+  assert len(backend.drawn) == 1
+  for i in range(3, 6):
+    stream.append(i, 10 * i)
+    stream.refresh()
+    # Each frame is drawn on a new backend, the artists do not pile up.
+    assert plot._backend is not backend
+    backend = plot._backend
+    assert len(backend.drawn) == 1
+    assert np.array_equal(backend.drawn[-1], [10 * i - 10, 10 * i])
+  plot.make_plot(backend=_RecordingBackend, show=False)
+  assert isinstance(plot._backend, _RecordingBackend)
@@ -0,0 +1,81 @@
+import pytest
+import numpy as np
+
+from lplot.derived import DerivedDatasets
+from lplot.main import Plot
+
+
+def test_derived_datasets():
+  X = [np.arange(4.), np.arange(4.)]
+  Y = [np.arange(4.), np.ones(4)]
+  versions = [0, 0]
+  calls = []
+  def dataset(i):
+    calls.append(i)
+    return X[i], Y[i], versions[i]
+  derived = DerivedDatasets()
+  derived.define("diff", "d0 - d1")
+  derived.define("double", "2 * diff")
+  derived.define("lonely", "d1 * 3")
+  assert derived.names == ["diff", "double", "lonely"]
+  x, y = derived.evaluate("double", dataset)
+  assert x is X[0]
+  assert np.array_equal(y, [-2, 0, 2, 4])
+  # Unchanged inputs are not recomputed.
+  memo = derived._memo["double"][1]
+  assert derived.evaluate("double", dataset) is memo
+  Y[0] = np.arange(4.) * 2
+  assert derived.evaluate("double", dataset) is memo
+  versions[0] = 1
+  assert np.array_equal(derived.evaluate("double", dataset)[1], [-2, 2, 6, 10])
+  lonely = derived.evaluate("lonely", dataset)
+  versions[0] = 2
+  assert derived.evaluate("lonely", dataset) is lonely
+  # Redefinitions invalidate the datasets depending on them.
+  derived.define("diff", "d1 - d0")
+  assert np.array_equal(derived.evaluate("double", dataset)[1], [2, -2, -6, -10])
+
+
+def test_derived_datasets_errors():
+  derived = DerivedDatasets()
+  derived.define("a", "d0 + 1")
+  derived.define("b", "a * 2")
+  with pytest.raises(ValueError):
+    derived.define("a", "b + 1")
+  # The cyclic definition is not kept.
+  assert derived._expressions["a"] == "d0 + 1"
+  with pytest.raises(ValueError):
+    derived.define("c", "c + d0")
+  for name in ("d3", "sin", "not a name"):
+    with pytest.raises(ValueError):
+      derived.define(name, "d0")
+  with pytest.raises(KeyError):
+    derived.evaluate("c", None)
+
+
+def test_plot_derived():
+  plot = Plot()
+  plot.add_data(np.column_stack([np.arange(5.), np.arange(5.), np.ones(5)]), None)
+  plot.derive("total", "d0 + d1")
+  plot.derive("scaled", "total / 2")
+  x, total = plot.derived("total")
+  assert np.array_equal(total, np.arange(5.) + 1)
+  assert plot.derived("total")[1] is total
+  plot.set_transform("y = y * 2", batch=True)
+  assert np.array_equal(plot.derived("scaled")[1], np.arange(5.) + 1)
+  plot.derive("missing", "d7 + 1")
+  with pytest.raises(ValueError):
+    plot.derived("missing")
+  plot._derived = DerivedDatasets()
+  plot.derive("total", "d0 + d1")
+  plot.set_figure_properties({"legend": "auto"})
+  plot.make_plot(show=False)
+  assert len(plot._artists) == 3
+  lines = plot._backend._plot_handle.get_lines()
+  assert lines[-1].get_label() == "total"
+  assert np.array_equal(lines[-1].get_ydata(), plot.derived("total")[1])
+  plot.derive("latest", "d0 + 1")
+  assert np.array_equal(plot.derived("latest")[1], np.arange(5.) * 2 + 1)
+  stream = plot.stream(0, capacity=3)
+  stream.append(5., 4.)
+  assert np.array_equal(plot.derived("latest")[1], [7, 9, 5])
@@ -0,0 +1,46 @@
+import pytest
+import numpy as np
+
+from lplot.fitting import lstsq_fit, fit_datasets
+from lplot.main import Plot
+
+
+def test_lstsq_fit():
+  x = np.linspace(-1, 2, 50)
+  Y = np.column_stack([3 * x ** 2 - x + 2, x ** 3])
+  coefficients, fitted = lstsq_fit(x, Y, degree=3)
+  assert np.allclose(coefficients, [np.polyfit(x, Y[:, 0], 3), np.polyfit(x, Y[:, 1], 3)])
+  assert np.allclose(fitted, Y)
+  coefficients, fitted = lstsq_fit(x, 2 * np.exp(-0.5 * x)[:, None], kind="exp")
+  assert np.allclose(coefficients, [[-0.5, 2]])
+  with pytest.raises(ValueError):
+    lstsq_fit(x, -x[:, None], kind="exp")
+  with pytest.raises(ValueError):
+    lstsq_fit(x, Y, kind="spline")
+
+
+def test_fit_datasets_groups():
+  x = np.arange(10.)
+  X = [x, x, np.arange(10.), np.arange(5.)]
+  Y = [2 * x + 1, -x, np.column_stack([x, 3 * x]), np.arange(5.) + 4]
+  fits = fit_datasets(X, Y, kind="linear")
+  assert np.allclose(fits.coefficients[0], [2, 1])
+  assert np.allclose(fits.coefficients[2], [[1, 0], [3, 0]])
+  assert np.allclose(fits.coefficients[3], [1, 4])
+  assert fits.curves[2].shape == (10, 2)
+  assert fits.table().shape == (5, 2)
+
+
+def test_plot_fit(tmp_path):
+  x = np.linspace(0, 1, 20)
+  plot = Plot()
+  plot.add_data(np.column_stack([x] + [i * x + 1 for i in range(1000)]), None)
+  fits = plot.fit("poly", degree=2)
+  assert np.allclose(fits.table()[:, 1], np.arange(1000))
+  fits.save(tmp_path / "fits.dat")
+  assert np.allclose(np.loadtxt(tmp_path / "fits.dat"), fits.table())
+  plot = Plot()
+  plot.add_data(np.column_stack([x, np.exp(x)]), None)
+  plot.fit("exp")
+  plot.make_plot(show=False)
+  assert len(plot._backend._plot_handle.get_lines()) == 2
@@ -0,0 +1,78 @@
+import pytest
+import numpy as np
+
+from lplot.grids import group_by_x, parse_grid, resample, join
+from lplot.main import Plot
+
+
+def test_parse_grid():
+  X = [np.array([0., 1., 2., 3.]), np.array([1.5, 2.5, 3.5])]
+  assert np.array_equal(parse_grid("union", X), [0, 1, 1.5, 2, 2.5, 3, 3.5])
+  assert np.array_equal(parse_grid("intersection", X), [1.5, 2, 2.5, 3])
+  assert np.array_equal(parse_grid("0:1:3", X), [0, 0.5, 1])
+  with pytest.raises(ValueError):
+    parse_grid("everything", X)
+
+
+def test_resample():
+  x = np.array([0., 1., 2., 4.])
+  X = [x, x, np.array([3., 1., 2.])]
+  Y = [2 * x, np.column_stack([x, -x]), np.array([30., 10., 20.])]
+  assert group_by_x(X) == [[0, 1], [2]]
+  grid = np.array([-1., 0.5, 3., 4.])
+  resampled = resample(X, Y, grid)
+  assert np.allclose(resampled[0], [np.nan, 1, 6, 8], equal_nan=True)
+  assert resampled[1].shape == (4, 2)
+  assert np.allclose(resampled[1][:, 1], [np.nan, -0.5, -3, -4], equal_nan=True)
+  assert np.allclose(resampled[2], [np.nan, np.nan, 30, np.nan], equal_nan=True)
+  assert np.array_equal(resample([x], [2 * x], x)[0], 2 * x)
+
+
+def test_plot_resample():
+  plot = Plot()
+  plot.add_data(np.column_stack([np.arange(5.), np.arange(5.)]), None)
+  plot.add_data(np.column_stack([np.arange(0.5, 5), np.arange(0.5, 5) * 2]), None)
+  grid = plot.resample("intersection")
+  assert plot._X[0] is plot._X[1] is grid
+  plot.set_transform("y = y - y[0]", batch=True)
+  assert np.allclose(plot._Y[1], grid)
+  plot = Plot()
+  plot.add_data(np.column_stack([np.arange(5.), np.arange(5.)]), None)
+  plot.add_data(np.column_stack([np.arange(3.), np.arange(3.)]), None)
+  plot.resample("0:4:9", datasets=[1])
+  assert len(plot._X[0]) == 5
+  assert np.isnan(plot._Y[1][-1])
+
+
+def test_join():
+  X = [np.array([0., 1., 2., 3.]), np.array([0., 1., 2., 3.]), np.array([3., 1., 5.])]
+  Y = [np.arange(4.), np.arange(4.) * 10, np.array([30., 10., 50.])]
+  x, y, columns = join(X, Y, how="outer")
+  assert np.array_equal(x, [0, 1, 2, 3, 5])
+  assert np.allclose(y[:, 2], [np.nan, 10, np.nan, 30, 50], equal_nan=True)
+  assert columns == [[0], [1], [2]]
+  x, y, columns = join(X, Y, how="inner")
+  assert np.array_equal(x, [1, 3])
+  assert np.array_equal(y, [[1, 10, 10], [3, 30, 30]])
+  x, y, columns = join(X[::-1], Y[::-1], how="asof", tolerance=0.6)
+  assert np.array_equal(x, [1, 3, 5])
+  assert np.allclose(y[:, 1:], [[10, 1], [30, 3], [np.nan, np.nan]], equal_nan=True)
+  x, y, columns = join([np.array([0., 1., 2.]), np.array([0.4, 0.6, 2.2])], [np.zeros(3), np.arange(3.)], how="asof")
+  assert np.array_equal(y[:, 1], [0, 1, 2])
+  with pytest.raises(ValueError):
+    join(X, Y, how="left")
+
+
+def test_plot_join():
+  plot = Plot()
+  plot.add_data(np.column_stack([np.arange(4.), np.arange(4.), -np.arange(4.)]), None)
+  plot.add_data(np.column_stack([np.arange(1., 6.), np.arange(1., 6.) * 10]), None)
+  plot.add_data(np.arange(3.), None)
+  x, y = plot.join("inner", datasets=[0, 1, 2])
+  assert np.array_equal(x, [1, 2, 3])
+  assert plot.n_datasets == 4
+  assert np.array_equal(plot._Y[2], [10, 20, 30])
+  assert plot._X[0] is plot._X[2]
+  plot.join("outer", file_mode=True)
+  assert plot.n_datasets == 1
+  assert plot._Y[0].shape == (4, 4)
@@ -0,0 +1,93 @@
+import sys
+import pytest
+import numpy as np
+import yaml
+
+import lplot.main
+from lplot.library import TransformLibrary
+from lplot.main import Plot
+
+
+definitions = {
+    "to_thz": "x = x * energy('eV', 'THz')",
+    "normalize": "y = y / max(y)",
+    "scale(factor, offset=0)": "y = y * factor + offset",
+    "standard": "@to_thz\n@normalize\n@scale(100)",
+    }
+
+
+def test_library():
+  library = TransformLibrary(definitions)
+  assert library.names == list(definitions.keys())[:2] + ["scale", "standard"]
+  # Named transforms are compiled once at load.
+  assert library["standard"] is library.compile("@standard") is library.compile("standard")
+  assert library["standard"].optimized_source.splitlines()[:2] == ["x = x * 241.79893", "y = y / max(y)"]
+  data = {"x": np.ones(3), "y": np.arange(3.)}
+  library.compile("@scale(2, offset=max(y)); y = y + 1")(data)
+  assert np.array_equal(data["y"], [3, 5, 7])
+  transform = library.compile("@standard")
+  assert library.compile("@standard") is transform
+  data = {"x": np.ones(3), "y": np.arange(3.)}
+  transform(data)
+  assert np.allclose(data["x"], 241.79893)
+  assert np.allclose(data["y"], [0, 50, 100])
+
+
+@pytest.mark.parametrize("definitions, error", [
+    ({"a": "@b"}, NameError),
+    ({"a": "@b", "b": "@a"}, ValueError),
+    ({"a": "y = @b + 1", "b": "y = 1"}, ValueError),
+    ({"f(x)": "x = 1"}, ValueError),
+    ({"f(*x)": "y = 1"}, ValueError),
+    ({"a": "y = forbidden(y)"}, NameError),
+    ])
+def test_library_errors(definitions, error):
+  with pytest.raises(error):
+    TransformLibrary(definitions)
+
+
+def test_library_hygiene():
+  # The parameters of a macro are not substituted in the transforms it refers to.
+  library = TransformLibrary({"norm": "m = max(y); y = y / m", "rescale(m)": "@norm; y = y * m", "twice(k)": "@rescale(2 * k)"})
+  data = {"y": np.arange(5.)}
+  library.compile("@rescale(10)")(data)
+  assert np.allclose(data["y"], np.arange(5.) * 2.5)
+  data = {"y": np.arange(5.)}
+  library.compile("@twice(3)")(data)
+  assert np.allclose(data["y"], np.arange(5.) * 1.5)
+  # Macros are validated at load with placeholder arguments.
+  with pytest.raises(NameError):
+    TransformLibrary({"apply(f)": "y = f(y)"})
+
+
+def test_library_arguments():
+  library = TransformLibrary(definitions)
+  for source in ("@scale()", "@scale(1, 2, 3)", "@scale(1, factor=2)", "@missing"):
+    with pytest.raises((TypeError, NameError)):
+      library.compile(source)
+
+
+def test_plot_library(tmp_path, monkeypatch):
+  library = TransformLibrary(definitions)
+  data = np.column_stack([np.arange(4.), np.arange(4.), 2 * np.arange(4.)])
+  plots = [Plot(library=library), Plot(library=library)]
+  for plot in plots:
+    plot.add_datasets([(data, None, "@normalize")])
+    plot.set_transform("@scale(2)", batch=True)
+  assert np.allclose(plots[1]._Y[1], 2 * np.arange(4.) / 3)
+  # From the command line, with the library of the configuration file.
+  np.savetxt(tmp_path / "data.dat", data)
+  config = tmp_path / "config.yml"
+  config.write_text(yaml.safe_dump({
+      "data": [str(tmp_path / "data.dat") + "::@normalize"],
+      "transform": "@scale(10)",
+      "batch": True,
+      "output": str(tmp_path / "figure.png"),
+      "library": definitions,
+      }))
+  plotted = []
+  monkeypatch.setattr(Plot, "make_plot", lambda self, **kwargs: plotted.append(self))
+  monkeypatch.setattr(sys, "argv", ["lplot", "--config", str(config)])
+  lplot.main.main()
+  plot, = plotted
+  assert np.allclose(plot._Y[0], 10 * np.arange(4.) / 6)
@@ -0,0 +1,47 @@
+import math
+import pytest
+import numpy as np
+
+from lplot.lmath import gcd, factorial, log_factorial, binomial
+from lplot.safe_eval import safe_eval
+
+
+def test_factorial():
+  assert factorial(0) == 1
+  assert factorial(3000) == math.factorial(3000)
+  values = factorial(np.arange(21))
+  assert values.dtype == np.int64
+  assert values.tolist() == [math.factorial(n) for n in range(21)]
+  values = factorial(np.array([[3., 25.], [170., 171.]]))
+  assert values[0, 1] == pytest.approx(math.factorial(25))
+  assert values[1, 0] == pytest.approx(float(math.factorial(170)))
+  assert values[1, 1] == np.inf
+  for x in (-1, 2.5, np.array([1, -2])):
+    with pytest.raises(ValueError):
+      factorial(x)
+
+
+def test_log_factorial():
+  n = np.array([0, 1, 10, 255, 256, 1000, 10**9])
+  expected = [math.lgamma(i + 1) for i in n]
+  assert np.allclose(log_factorial(n), expected, rtol=1e-14)
+  assert log_factorial(5) == pytest.approx(math.log(120))
+
+
+def test_binomial():
+  assert binomial(100, 50) == math.comb(100, 50)
+  assert binomial(3, 5) == 0
+  n, k = np.meshgrid(np.arange(67), np.arange(70))
+  values = binomial(n, k)
+  assert values.dtype == np.int64
+  assert values.tolist() == [[math.comb(i, j) for i in range(67)] for j in range(70)]
+  assert np.allclose(binomial(np.array([100, 1000, 2]), np.array([50, 3, 4])),
+      [float(math.comb(100, 50)), math.comb(1000, 3), 0], rtol=1e-12)
+
+
+def test_math_in_transforms():
+  n = np.arange(1, 7)
+  assert np.array_equal(safe_eval("factorial(n) // gcd(n, 4)", {"n": n}),
+      [math.factorial(i) // math.gcd(i, 4) for i in n])
+  assert np.array_equal(safe_eval("binomial(n, 2)", {"n": n}), [math.comb(i, 2) for i in n])
+  assert np.allclose(safe_eval("exp(log_factorial(n))", {"n": n}), factorial(n))
@@ -0,0 +1,71 @@
+import pytest
+import numpy as np
+
+import lplot.loaders
+from lplot.loaders import load_data, clear_load_cache, register_format, guess_format
+from lplot.main import Plot
+
+
+def test_load_data_cached(tmp_path):
+  filename = tmp_path / "data.dat"
+  np.savetxt(filename, np.arange(12.).reshape(4, 3))
+  clear_load_cache()
+  first = load_data(str(filename))
+  second = load_data(str(filename))
+  assert first is second
+  assert not first.flags.writeable
+  assert load_data(str(filename), usecols=(0, 1)) is not first
+  # Unhashable options are part of the key as tuples, or skip the cache.
+  assert load_data(str(filename), usecols=[0, 1]) is load_data(str(filename), usecols=(0, 1))
+  converters = {1: float}
+  data = load_data(str(filename), converters=converters)
+  assert np.array_equal(data, first)
+  assert load_data(str(filename), converters=converters) is not data
+
+
+def test_add_data_shares_cached_file(tmp_path):
+  filename = tmp_path / "data.dat"
+  np.savetxt(filename, np.arange(12.).reshape(4, 3))
+  clear_load_cache()
+  plot = Plot()
+  plot.add_data(str(filename), "0")
+  plot.add_data(str(filename), "1", transform="y=y*2")
+  assert np.array_equal(plot._Y[0], [1., 4., 7., 10.])
+  assert np.array_equal(plot._Y[1], [4., 10., 16., 22.])
+  assert np.array_equal(load_data(str(filename))[:, 2], [2., 5., 8., 11.])
+
+
+def test_read_bands(tmp_path):
+  filename = tmp_path / "bands.dat.gnu"
+  k = np.linspace(0, 1, 5)
+  with open(filename, "w") as f:
+    for band in range(3):
+      for kk in k:
+        f.write("{} {}\n".format(kk, band + kk))
+      f.write("\n")
+  # Files are plain text tables unless another format is selected.
+  assert load_data(str(filename), cache=False).shape == (15, 2)
+  data = load_data(str(filename), fmt="bands", cache=False)
+  assert data.shape == (5, 4)
+  assert np.allclose(data[:, 0], k)
+  assert np.allclose(data[:, 3], 2 + k)
+
+
+def test_read_doscar(tmp_path):
+  filename = tmp_path / "DOSCAR"
+  with open(filename, "w") as f:
+    f.write("header\n" * 5)
+    f.write("  2.0 -2.0 3 1.0 1.0\n")
+    f.write("-2.0 0.1 0.0\n0.0 0.5 1.0\n2.0 0.2 2.0\n")
+  data = load_data(str(filename), fmt="doscar", cache=False)
+  assert np.allclose(data[:, 0], [-3.0, -1.0, 1.0])
+  assert np.allclose(data[:, 1], [0.1, 0.5, 0.2])
+
+
+def test_guess_format(monkeypatch):
+  for filename in ("bands.dat.gnu", "si.dos", "DOSCAR", "filband_bands.dat"):
+    assert guess_format(filename) == "text"
+  monkeypatch.setattr(lplot.loaders, "formats", dict(lplot.loaders.formats))
+  monkeypatch.setattr(lplot.loaders, "_format_patterns", [])
+  register_format("csv", lambda filename, **options: np.loadtxt(filename, delimiter=",", **options), patterns=["*.csv"])
+  assert guess_format("/tmp/data.csv") == "csv"
@@ -0,0 +1,75 @@
+import pytest
+import numpy as np
+
+from lplot.main import Plot
+
+
+def _plot(lengths):
+  plot = Plot()
+  for i, n in enumerate(lengths):
+    plot.add_data(np.column_stack([np.arange(n), np.full(n, i + 1.)]), None)
+  return plot
+
+
+def test_set_transform_batched():
+  plot = _plot([5, 5, 5])
+  plot.set_transform("y = y * 2; x = x + 1; y[0] = sin(x[0])", batch=True)
+  assert plot.n_datasets == 3
+  assert np.allclose(plot._Y[0], np.sin(np.arange(1, 6)))
+  assert np.array_equal(plot._Y[2], np.full(5, 6.))
+  assert np.array_equal(plot._X[1], np.arange(1, 6))
+
+
+def test_set_transform_ragged():
+  plot = _plot([3, 5, 4])
+  plot.set_transform("y = y * 2 + x", batch=True)
+  assert [len(y) for y in plot._Y] == [3, 5, 4]
+  assert np.array_equal(plot._Y[1], 4. + np.arange(5))
+
+
+def test_set_transform_lists():
+  # Transforms run on lists of datasets unless batched, and can change their number.
+  plot = _plot([5, 5])
+  plot.set_transform("y[0] = y[0][::2]; x[0] = x[0][::2]")
+  assert np.array_equal(plot._Y[0], np.ones(3))
+  assert np.array_equal(plot._Y[1], np.full(5, 2.))
+  with pytest.raises(ValueError):
+    plot.set_transform("y[1] = y[1][::2]", batch=True)
+  plot = _plot([4, 4])
+  plot.set_transform("x = x + [x[0]]; y = y + [y[0] - y[1]]")
+  assert plot.n_datasets == 3
+  assert np.array_equal(plot._Y[2], np.full(4, -1.))
+  plot.set_transform("x = x[:2]; y = y[:2]")
+  assert plot.n_datasets == 2
+  plot.set_transform("y = [y[0] + y[1], y[0] * 0]; x = [x[0], x[1]]")
+  assert np.array_equal(plot._Y[0], np.full(4, 3.))
+  with pytest.raises(ValueError):
+    _plot([4, 4, 4]).set_transform("x = x[:2]; y = y[:2]", batch=True)
+
+
+def test_add_datasets_executor(tmp_path):
+  specs = []
+  for i in range(8):
+    filename = tmp_path / "data{}.dat".format(i)
+    np.savetxt(filename, np.column_stack([np.arange(50.), np.arange(50.) * i, np.full(50, i)]))
+    specs.append((str(filename), "0" if i % 2 else None, "y = y * 2 + 1"))
+  serial = Plot()
+  serial.add_datasets(specs)
+  threaded = Plot()
+  threaded.add_datasets(specs, executor=4)
+  assert threaded._datalabel == serial._datalabel
+  assert threaded.n_datasets == 12
+  for y1, y2 in zip(serial._Y, threaded._Y):
+    assert np.array_equal(y1, y2)
+
+
+def test_add_data_row_filter():
+  data = np.column_stack([np.arange(6.), [1., np.nan, 3., 4., np.inf, 6.], np.arange(6.)])
+  plot = Plot()
+  plot.add_data(data, None, row_filter="isfinite(y)")
+  assert np.array_equal(plot._X[0], [0., 2., 3., 5.])
+  assert np.array_equal(plot._Y[1], [0., 2., 3., 5.])
+  plot.add_data(data, "1", row_filter="(x >= 1) and (x < 4)")
+  assert np.array_equal(plot._Y[2], [1., 2., 3.])
+  with pytest.raises(TypeError):
+    plot.add_data(data, None, row_filter="x * 2")
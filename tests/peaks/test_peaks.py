@@ -0,0 +1,84 @@
+import pytest
+import numpy as np
+
+from lplot import peaks as lpeaks
+from lplot.peaks import find_peaks
+from lplot.main import Plot
+
+
+def _reference_peaks(x, rel_height=0.5):
+  """ Peaks of a 1 dimentional array found walking the values, as scipy.signal does.
+  """
+  result = []
+  i, n = 1, len(x)
+  while i < n - 1:
+    if x[i - 1] < x[i]:
+      ahead = i + 1
+      while ahead < n - 1 and x[ahead] == x[i]:
+        ahead += 1
+      if x[ahead] < x[i]:
+        result.append((i + ahead - 1) // 2)
+        i = ahead
+    i += 1
+  rows = []
+  for peak in result:
+    h = x[peak]
+    i, left_min = peak, h
+    while i >= 0 and x[i] <= h:
+      left_min = min(left_min, x[i])
+      i -= 1
+    i, right_min = peak, h
+    while i < n and x[i] <= h:
+      right_min = min(right_min, x[i])
+      i += 1
+    prominence = h - max(left_min, right_min)
+    level = h - rel_height * prominence
+    i = peak
+    while i > 0 and x[i] > level:
+      i -= 1
+    left = i + (level - x[i]) / (x[i + 1] - x[i]) if x[i] < level else i
+    i = peak
+    while i < n - 1 and x[i] > level:
+      i += 1
+    right = i - (level - x[i]) / (x[i - 1] - x[i]) if x[i] < level else i
+    rows.append((peak, h, prominence, right - left, left, right))
+  return rows
+
+
+def test_find_peaks_reference(monkeypatch):
+  rng = np.random.default_rng(0)
+  y = np.round(rng.normal(size=(40, 97)).cumsum(axis=1), 1)
+  y[3, 10:14] = 100
+  monkeypatch.setattr(lpeaks, "chunk_size", 5000)
+  peaks = find_peaks(y)
+  expected = [(row, ) + peak for row in range(len(y)) for peak in _reference_peaks(y[row])]
+  assert len(peaks) == len(expected)
+  assert np.array_equal(peaks["row"], [peak[0] for peak in expected])
+  assert np.array_equal(peaks["index"], [peak[1] for peak in expected])
+  for i, name in enumerate(["height", "prominence", "width", "left", "right"]):
+    assert np.allclose(peaks[name], [peak[i + 2] for peak in expected])
+  assert 11 in peaks["index"][peaks["row"] == 3]
+
+
+def test_find_peaks_thresholds():
+  x = np.linspace(0, 10, 1001)
+  y = np.exp(-(x - 3) ** 2 / 0.02) + 0.5 * np.exp(-(x - 7) ** 2 / 0.5) + 0.01 * np.sin(50 * x)
+  peaks = find_peaks(y, prominence=0.1)
+  assert np.allclose(x[peaks["index"]], [3, 7], atol=0.1)
+  assert np.array_equal(find_peaks(y, prominence=0.1, width=50)["index"], peaks["index"][1:])
+  assert len(find_peaks(y, height=0.8, prominence=0.1)) == 1
+
+
+def test_plot_find_peaks():
+  x = np.linspace(0, 10, 501)
+  plot = Plot()
+  plot.add_data(np.column_stack([x, np.exp(-(x - 3) ** 2), 2 * np.exp(-(x - 6) ** 2 / 0.5)]), None)
+  plot.add_data(np.column_stack([x[:301], np.exp(-(x[:301] - 4) ** 2)]), None)
+  table = plot.find_peaks(prominence=0.5)
+  assert np.array_equal(table["dataset"], [0, 1, 2])
+  assert np.allclose(table["x"], [3, 6, 4])
+  assert np.allclose(table["y"], [1, 2, 1])
+  assert np.allclose(table["width"], [2 * np.sqrt(np.log(2)), 2 * np.sqrt(np.log(2) / 2), 2 * np.sqrt(np.log(2))], atol=0.03)
+  assert len(plot.find_peaks(prominence=0.5, width=1.5)) == 2
+  plot.make_plot(show=False)
+  assert len(plot._backend._plot_handle.get_lines()) == 5
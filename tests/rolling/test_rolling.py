@@ -0,0 +1,87 @@
+import pytest
+import numpy as np
+
+from lplot import rolling
+from lplot.safe_eval import safe_eval
+from lplot.main import Plot
+
+
+def _trapezoid(y, x):
+  return ((y[..., 1:] + y[..., :-1]) * np.diff(x) / 2).sum(axis=-1)
+
+
+def _naive(func, y, window):
+  result = np.empty(y.shape)
+  for i in range(y.shape[-1]):
+    result[..., i] = func(y[..., max(0, i - window + 1):i + 1], axis=-1)
+  return result
+
+
+@pytest.mark.parametrize("window", [1, 4, 7, 100])
+def test_moving_windows(window):
+  y = np.random.default_rng(0).normal(size=(3, 50)) * 5 + 1e4
+  for func, reference in [
+      (rolling.moving_mean, np.mean), (rolling.moving_std, np.std),
+      (rolling.moving_min, np.min), (rolling.moving_max, np.max),
+      ]:
+    expected = _naive(reference, y, window)
+    assert np.allclose(func(y, window), expected, rtol=0, atol=1e-5)
+    assert np.allclose(func(y.T, window, axis=0), expected.T, rtol=0, atol=1e-5)
+  i = np.arange(20) % 7
+  assert np.array_equal(rolling.moving_max(i, 3), _naive(np.max, i, 3))
+  with pytest.raises(ValueError):
+    rolling.moving_mean(y, 0)
+
+
+@pytest.mark.parametrize("alpha", [0.01, 0.5, 0.99])
+def test_ema(alpha):
+  y = np.random.default_rng(1).normal(size=(2, 3000))
+  expected = np.empty_like(y)
+  expected[:, 0] = y[:, 0]
+  for i in range(1, y.shape[1]):
+    expected[:, i] = alpha * y[:, i] + (1 - alpha) * expected[:, i - 1]
+  assert np.allclose(rolling.ema(y, alpha=alpha), expected)
+  assert np.allclose(rolling.ema(y, span=2 / alpha - 1), expected)
+
+
+def test_cumulative_and_gradient():
+  x = np.linspace(0, 2, 21) ** 2
+  y = np.stack([np.sin(x), np.cos(x)])
+  assert np.array_equal(rolling.cumsum(y), np.cumsum(y, axis=-1))
+  integral = rolling.cumtrapz(y, x)
+  assert integral[0, 0] == 0
+  assert np.allclose(integral[:, -1], _trapezoid(y, x))
+  assert np.allclose(rolling.cumtrapz(y.T, x, axis=0), integral.T)
+  assert np.allclose(rolling.gradient(y, x), np.gradient(y, x, axis=-1))
+  assert np.allclose(rolling.gradient(y, np.stack([x, x])), np.gradient(y, x, axis=-1))
+
+
+def test_rolling_transforms():
+  variables = {"x": np.arange(10.), "y": np.arange(20.).reshape(2, 10)}
+  assert np.array_equal(safe_eval("moving_max(y, 3)", locals=variables), variables["y"])
+  assert np.allclose(safe_eval("gradient(y, x)", locals=variables), 1)
+  plot = Plot()
+  for n in (5, 8):
+    x = np.linspace(0, 1, n) ** 2
+    plot.add_data(np.column_stack([x, x ** 2]), None)
+  plot.set_transform("y = gradient(y, x)", batch=True)
+  for x, y in zip(plot._X, plot._Y):
+    assert np.allclose(y, np.gradient(x ** 2, x))
+
+
+def test_rolling_file_transforms():
+  # Transforms of a file run along its rows, the samples of its columns.
+  data = np.column_stack([np.arange(6.), np.arange(6.), np.arange(6.) ** 2])
+  plot = Plot()
+  plot.add_data(data, None, transform="y = cumsum(y)")
+  plot.add_data(data, "1", transform="y = moving_mean(y, 3)")
+  plot.add_data(data, "0", transform="y = moving_mean(y, 3, axis=-1)")
+  assert np.array_equal(plot._Y[0], np.cumsum(np.arange(6.)))
+  assert np.array_equal(plot._Y[1], np.cumsum(np.arange(6.) ** 2))
+  assert np.allclose(plot._Y[2], _naive(np.mean, np.arange(6.) ** 2, 3))
+  assert np.array_equal(plot._Y[3], np.arange(6.))
+  assert np.array_equal(rolling.cumsum(np.ones((2, 3))), [[1, 2, 3], [1, 2, 3]])
+  # As their row filters.
+  plot = Plot()
+  plot.add_data(data, None, row_filter="cumsum(y) < 6")
+  assert np.array_equal(plot._X[0], [0., 1., 2.])
@@ -0,0 +1,90 @@
+import pytest
+import numpy as np
+
+import lplot.safe_eval
+from lplot.safe_eval import safe_eval, safe_exec, compile_transform
+from lplot.budget import Budget, ResourceLimitError, use_budget, result_size
+from lplot.main import Plot
+
+
+def test_result_size():
+  assert result_size(np.ones((3, 1)), np.ones(4), 2.) == 12
+  assert result_size([0, 1], 10) == 20
+  assert result_size(np.ones(3), np.ones(4)) is None
+
+
+@pytest.mark.parametrize("expression", [
+    "factorial(100000)",
+    "binomial(10**6, 3)",
+    "10**10**8",
+    "x ** 2000",
+    "x[:, None] * x[None, :]",
+    "(x[:, None] > 0) and (x > 0)",
+    "where(x[:, None] > 0, x, 0)",
+    "[0] * 10**9",
+    "dot(x[:, None], x[None, :])",
+    "window(10**8)",
+    "psd(x, nperseg=4000, overlap=0.999)",
+    ])
+def test_budget_exceeded(expression):
+  budget = Budget(max_elements=10**6, max_exponent=1000, max_factorial=1000)
+  with pytest.raises(ResourceLimitError):
+    safe_eval(expression, {"x": np.ones(10**4)}, budget=budget)
+
+
+def test_budget_within():
+  budget = Budget(max_elements=10**6, max_exponent=1000, max_factorial=1000, timeout=10.)
+  x = np.arange(10.)
+  assert np.array_equal(safe_eval("x[:, None] * x[None, :]", {"x": x}, budget=budget), np.outer(x, x))
+  assert safe_eval("factorial(10) + 2 ** 10", budget=budget) == 3628800 + 1024
+  variables = {"y": np.ones(3)}
+  safe_exec("y *= 2", variables, budget=budget)
+  assert np.array_equal(variables["y"], [2, 2, 2])
+
+
+def test_budget_statements():
+  variables = {"y": np.ones((2000, 1)), "z": np.ones(2000)}
+  with pytest.raises(ResourceLimitError):
+    safe_exec("y += z", variables, budget=Budget(max_elements=10**6))
+  with pytest.raises(ResourceLimitError):
+    safe_exec("y = y + 1\ny = y * 2", variables, budget=Budget(timeout=-1.))
+  # Large expressions evaluated block by block are checked too.
+  variables = {"x": np.ones(lplot.safe_eval.fusion_min_size), "p": 2000.}
+  with pytest.raises(ResourceLimitError):
+    safe_exec("y = sin(x) * x ** p + 1", variables, budget=Budget(max_exponent=1000))
+  safe_exec("y = sin(x) * x ** p + 1", variables, budget=Budget(max_exponent=10000))
+  with pytest.raises(ResourceLimitError):
+    safe_exec("y = x * 2 + 1", variables, budget=Budget(max_elements=1000))
+
+
+def test_budget_shape_changing_calls(monkeypatch):
+  budget = Budget(max_elements=10**6)
+  x = np.ones(10**4)
+  assert safe_eval("dot(x, x)", {"x": x}, budget=budget) == 10**4
+  assert safe_eval("window(n=1000, kind='boxcar')", budget=budget).size == 1000
+  assert safe_eval("psd(x, nperseg=256)", {"x": x}, budget=budget)[1].size == 129
+  # The functions are not called once the results are known to be too large.
+  calls = []
+  monkeypatch.setattr(np, "dot", lambda *args: calls.append(args))
+  with pytest.raises(ResourceLimitError):
+    safe_eval("dot(x[:, None], x[None, :])", {"x": x}, budget=budget)
+  assert calls == []
+
+
+def test_budget_context():
+  with use_budget(Budget(max_exponent=5)):
+    # Constants over the budget are not folded, and fail when executed.
+    transform = compile_transform("z = 7 ** 99")
+    assert transform.optimized_source == "z = 7 ** 99"
+    with pytest.raises(ResourceLimitError):
+      transform({})
+  assert transform({})["z"] == 7 ** 99
+  plot = Plot()
+  data = np.column_stack([np.arange(5.), np.arange(5.)])
+  with use_budget(Budget(max_factorial=3, max_exponent=5)):
+    with pytest.raises(ResourceLimitError):
+      plot.set_transform("y = factorial(5)")
+    with pytest.raises(ResourceLimitError):
+      plot.add_datasets([(data, None, "y = y ** 10")] * 2, executor=2)
+    plot.add_datasets([(data, None, "y = y * 2")] * 2, executor=2)
+  assert plot.n_datasets == 2
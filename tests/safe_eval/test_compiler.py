@@ -0,0 +1,211 @@
+import pytest
+import numpy as np
+
+import lplot.safe_eval
+
+from lplot.safe_eval import safe_eval, safe_exec, compile_transform
+from reference_eval import reference_eval, reference_exec
+
+
+def _variables():
+  return {
+      "x": np.linspace(0.1, 2, 11),
+      "y": np.arange(22.).reshape(11, 2),
+      "n": 5,
+      "z": [np.arange(3.), np.arange(3., 6.)],
+      }
+
+
+expressions = [
+    "1",
+    "-2.5",
+    "x + 10",
+    "x * 2 - 1 / x",
+    "x ** 2 // 3 % 2",
+    "sin(x) * exp(-1 * x) + log(x) * abs(cos(x))",
+    "sum(x) + max(x) - min(x) + argmax(x) + argmin(x)",
+    "arctan(tan(x)) + arcsin(x / 2) + arccos(x / 2)",
+    "dot(x, x)",
+    "factorial(n) + gcd(n, 15)",
+    "y * energy('eV', 'THz') * hbar('eV*sec')",
+    "pressure('eV/A^3', 'kbar') + length('Bohr', 'nm') + mass('amu', 'kg')",
+    "x[2]",
+    "x[1:5]",
+    "x[::2]",
+    "x[1:9:3]",
+    "y[:, 1]",
+    "y[2:4, 0]",
+    "y[[1, 3]]",
+    "z[1]",
+    "z[0][1:]",
+    "(x, n)",
+    "[n, 2 * n]",
+    "{'a': n}",
+    "-sum(x)",
+    ]
+
+
+@pytest.mark.parametrize("expression", expressions)
+def test_safe_eval_equivalence(expression):
+  expected = reference_eval(expression, locals=_variables())
+  result = safe_eval(expression, locals=_variables())
+  if isinstance(expected, (tuple, list)):
+    assert type(result) == type(expected)
+    for r, e in zip(result, expected):
+      assert np.array_equal(r, e)
+  else:
+    assert np.array_equal(result, expected)
+
+
+statements = [
+    "x = x + 1",
+    "y = y * 2; x = sin(x)",
+    "y[:, 0] = x ** 2",
+    "y[1:3] = 0",
+    "x += 1; y *= 2",
+    "y[:, 1] -= x",
+    "x = y = (n, 2 * n)",
+    "z[0] = z[1] * 2",
+    "z[1] /= 2",
+    "x = [x * 2]",
+    ]
+
+
+@pytest.mark.parametrize("statement", statements)
+def test_safe_exec_equivalence(statement):
+  expected = _variables()
+  reference_exec(statement, locals=expected)
+  result = _variables()
+  safe_exec(statement, locals=result)
+  assert expected.keys() == result.keys()
+  for key in expected:
+    if isinstance(expected[key], list):
+      for r, e in zip(result[key], expected[key]):
+        assert np.array_equal(r, e)
+    else:
+      assert np.array_equal(result[key], expected[key])
+
+
+def test_safe_eval_errors():
+  with pytest.raises(NameError):
+    safe_eval("w + 1", locals=_variables())
+  with pytest.raises(NameError):
+    safe_eval("np.sin(x)", locals=_variables())
+  with pytest.raises(ValueError):
+    safe_eval("x if n else y", locals=_variables())
+  with pytest.raises(RuntimeError):
+    safe_exec("sin(x)", locals=_variables())
+
+
+def test_safe_eval_extensions():
+  variables = _variables()
+  assert np.array_equal(safe_eval("x[-1]", locals=variables), variables["x"][-1])
+  assert np.array_equal(safe_eval("-x", locals=variables), -variables["x"])
+  assert np.array_equal(safe_eval("x[n]", locals=variables), variables["x"][5])
+  assert np.allclose(safe_eval("sum(y, axis=0)", locals=variables), variables["y"].sum(axis=0))
+  assert safe_eval("2 * pi") == 2 * np.pi
+  safe_exec("x, n = n, x[0]", locals=variables)
+  assert variables["x"] == 5
+
+
+def test_safe_eval_conditionals():
+  variables = _variables()
+  x = variables["x"]
+  assert np.array_equal(safe_eval("x > 0.5", locals=variables), x > 0.5)
+  assert np.array_equal(safe_eval("0.2 < x <= 0.6", locals=variables), (0.2 < x) & (x <= 0.6))
+  assert np.array_equal(safe_eval("(x < 0.2) or (x > 0.6) and not (x == 1)", locals=variables),
+      (x < 0.2) | ((x > 0.6) & (x != 1)))
+  assert np.array_equal(safe_eval("x[x > 0.5]", locals=variables), x[x > 0.5])
+  assert np.array_equal(safe_eval("where(x > 0.5, sqrt(x), 0)", locals=variables), np.where(x > 0.5, np.sqrt(x), 0))
+  assert np.array_equal(safe_eval("clip(x, 0.2, 0.6)", locals=variables), np.clip(x, 0.2, 0.6))
+  assert safe_eval("nansum(where(isfinite(1 / x), x, nan))", locals={"x": x, "nan": np.nan}) == np.nansum(x[x != 0])
+  safe_exec("x[x > 0.5] = 0.5", locals=variables)
+  assert variables["x"].max() == 0.5
+
+
+fused_expressions = [
+    "x * 2 + 1 - x * x * 3",
+    "exp(-1 * x ** 2 / 2) * sin(x) * 100",
+    "abs(x) // 1 + x % 0.3",
+    "-x * n + sum(x) * cos(x)",
+    "i * 3 + i // 2 - i ** 2",
+    "x * 2 + y[:, 0]",
+    "y * 2 + y[0]",
+    "z[0] * 2 + z[1]",
+    "(x > 0.5) and (x * 2 < 3)",
+    "not (x > 1) or (i % 3 == 0)",
+    "~(i & 3) | i ^ 5",
+    ]
+
+
+@pytest.mark.parametrize("expression", fused_expressions)
+def test_fused_evaluation(monkeypatch, expression):
+  variables = {
+      "x": np.linspace(0.1, 2, 1001),
+      "y": np.arange(2002.).reshape(1001, 2),
+      "i": np.arange(1001),
+      "n": 5,
+      "z": [np.arange(3.), np.arange(3., 6.)],
+      }
+  expected = safe_eval(expression, locals=variables)
+  monkeypatch.setattr(lplot.safe_eval, "fusion_min_size", 100)
+  monkeypatch.setattr(lplot.safe_eval, "fusion_block_size", 64)
+  result = safe_eval(expression, locals=variables)
+  assert result.dtype == expected.dtype
+  assert np.array_equal(result, expected)
+
+
+def test_fused_scalar_subtrees():
+  # Above the default ``fusion_min_size``, scalar subtrees keep the Python semantics.
+  x = np.linspace(0., 1., 300001)
+  assert np.allclose(safe_eval("x * 10 ** -3", locals={"x": x}), x * 1e-3)
+  assert np.array_equal(safe_eval("x * 2 ** 70", locals={"x": x}), x * 2 ** 70)
+  assert np.array_equal(safe_eval("x * (n + 1) - n ** 2", locals={"x": x, "n": 3}), x * 4 - 9)
+  variables = {"x": x, "n": 10}
+  compile_transform("y = x * n ** -3")(variables)
+  assert np.allclose(variables["y"], x * 1e-3)
+
+
+def test_optimize_constant_folding():
+  transform = compile_transform("y = y * energy('eV', 'THz') * hbar('eV*sec') + 2 ** 3 - -1")
+  assert "energy" not in transform.optimized_source
+  assert "hbar" not in transform.optimized_source
+  assert "2 ** 3" not in transform.optimized_source
+  assert "10 ** 100000000" in compile_transform("y = 10 ** 10 ** 8").optimized_source
+
+
+optimized_statements = [
+    "y = exp(-1 * x ** 2 / 2) * sin(x ** 2 / 2); x = x * 2; x = 3; t = sin(x ** 2 / 2)",
+    "a = x * 2; b = x * 2; x += 1; c = x * 2 + 1; d = x * 2",
+    "x = y * 2; y = y * 2",
+    "x = y * 2 + 1; z = y * 2; y[0] = 5; w = y * 2",
+    ]
+
+
+@pytest.mark.parametrize("statement", optimized_statements)
+def test_optimize_equivalence(statement):
+  transform = compile_transform(statement)
+  expected = {"x": np.linspace(0.1, 2, 11), "y": np.arange(11.)}
+  reference_exec(statement, locals=expected)
+  result = transform({"x": np.linspace(0.1, 2, 11), "y": np.arange(11.)})
+  assert expected.keys() == result.keys()
+  for key in expected:
+    assert np.array_equal(result[key], expected[key])
+  for key in ["a", "b", "x", "y"]:
+    if key in result and isinstance(result[key], np.ndarray):
+      assert not any(result[key] is result[other] for other in result if other != key)
+
+
+def test_optimize_common_subexpressions():
+  transform = compile_transform("y = exp(x ** 2) + sin(x ** 2); x = x * 2; x = 3")
+  assert transform.optimized_source.count("x ** 2") == 1
+  assert transform.optimized_source.count("x * 2") == 0
+
+
+def test_temporaries_removed_on_errors():
+  transform = compile_transform("y = exp(x ** 2) + sin(x ** 2); z = y[100]")
+  assert "_cse0" in transform.optimized_source
+  variables = {"x": np.arange(3.)}
+  with pytest.raises(IndexError):
+    transform(variables)
+  assert sorted(variables) == ["x", "y"]
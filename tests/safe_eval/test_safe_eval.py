@@ -1,7 +1,7 @@
 import pytest
 import numpy as np
 
-from lplot.safe_eval import safe_eval
+from lplot.safe_eval import safe_eval, safe_exec, compile_transform
 
 
 def test_safety_check_bad():
@@ -25,3 +25,48 @@ def test_safety_check_good():
       }
   result = safe_eval("x + 10", locals=variables)
   assert np.array_equal(result, np.full((10, ), 10, dtype=int))
+
+
+def test_compile_transform():
+  transform = compile_transform("y = y * 2; x += 1")
+  assert compile_transform("y = y * 2; x += 1") is transform
+  assert compile_transform(transform) is transform
+  for n in range(3):
+    variables = {"x": np.arange(4.), "y": np.full(4, n)}
+    transform(variables)
+    assert np.array_equal(variables["x"], np.arange(1., 5.))
+    assert np.array_equal(variables["y"], np.full(4, 2 * n))
+
+
+def test_compile_transform_validation():
+  with pytest.raises(NameError):
+    compile_transform("y = open('file')")
+  with pytest.raises(NameError):
+    compile_transform("y = np.sin(x)")
+  with pytest.raises(ValueError):
+    compile_transform("y = lambda: x")
+  with pytest.raises(RuntimeError):
+    compile_transform("import os")
+
+
+def test_safe_exec_augassign_inplace():
+  x = np.arange(5.)
+  y = np.arange(10.).reshape(5, 2)
+  variables = {"x": x, "y": y, "n": 2}
+  safe_exec("x *= 2; y[:, 1] += x; y[[0, 2], 0] -= 1; n **= 3", locals=variables)
+  assert variables["x"] is x
+  assert variables["y"] is y
+  assert np.array_equal(x, 2 * np.arange(5.))
+  assert np.array_equal(y[:, 1], 2 * np.arange(5.) + np.arange(1., 10., 2))
+  assert np.array_equal(y[:, 0], [-1., 2., 3., 6., 8.])
+  assert variables["n"] == 8
+
+
+def test_safe_exec_augassign_casting():
+  i = np.arange(4)
+  variables = {"i": i}
+  safe_exec("i /= 2", locals=variables)
+  assert np.array_equal(variables["i"], np.arange(4) / 2)
+  assert np.array_equal(i, np.arange(4))
+  with pytest.raises(TypeError):
+    safe_exec("i[1:] += 0.5", locals={"i": i})
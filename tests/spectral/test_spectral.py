@@ -0,0 +1,70 @@
+import pytest
+import numpy as np
+
+from lplot import spectral
+from lplot.safe_eval import safe_exec
+from lplot.main import Plot
+
+
+def test_fft_length():
+  for n in [1, 7, 11, 97, 1001, 4097]:
+    length = spectral._fft_length(n)
+    assert length >= n
+    for factor in (2, 3, 5):
+      while length % factor == 0:
+        length //= factor
+    assert length == 1
+  assert spectral._fft_length(1025) == 1080
+
+
+def test_spectrum():
+  dt = 0.01
+  t = np.arange(1000) * dt
+  y = np.stack([3 * np.sin(2 * np.pi * 10 * t), 2 * np.cos(2 * np.pi * 20 * t)])
+  freq, amplitude = spectral.spectrum(y, dt=dt)
+  assert freq.shape == amplitude.shape
+  assert np.allclose(freq[np.arange(2), amplitude.argmax(axis=1)], [10, 20])
+  assert np.allclose(amplitude.max(axis=1), [3, 2])
+  columns_freq, columns = spectral.spectrum(y.T, dt=dt, axis=0)
+  assert np.array_equal(columns_freq, freq[0])
+  assert np.allclose(columns, amplitude.T)
+  with pytest.raises(ValueError):
+    spectral.spectrum(y, window="unknown")
+
+
+def test_psd():
+  dt = 0.01
+  y = np.random.default_rng(0).normal(size=(2, 100000))
+  freq, density = spectral.psd(y, dt=dt, nperseg=512)
+  assert freq.shape == density.shape == (2, 257)
+  integral = ((density[:, 1:] + density[:, :-1]) * np.diff(freq) / 2).sum(axis=1)
+  assert np.allclose(integral, 1, atol=0.02)
+  assert np.allclose(density[:, 1:-1].mean(axis=1), 2 * dt, rtol=0.02)
+
+
+def test_spectral_transforms():
+  t = np.arange(256) * 0.1
+  variables = {"x": t, "y": np.sin(t)}
+  safe_exec("x, y = psd(windowed(y, 'boxcar'), dt=x[1] - x[0], nperseg=64)", locals=variables)
+  assert variables["x"].shape == variables["y"].shape == (33, )
+  plot = Plot()
+  plot.add_data(np.column_stack([t, np.sin(t), np.cos(t)]), None)
+  plot.set_transform("x, y = spectrum(y, dt=0.1)", batch=True)
+  assert plot.n_datasets == 2
+  assert len(plot._X[1]) == len(plot._Y[1]) == 129
+
+
+def test_spectral_file_transforms():
+  # Transforms of a file compute the spectra of its columns.
+  dt = 0.1
+  t = np.arange(256) * dt
+  y = np.column_stack([np.sin(2 * np.pi * t), np.cos(2 * np.pi * 2 * t)])
+  plot = Plot()
+  plot.add_data(np.column_stack([t, y]), None, transform="x, y = spectrum(y, dt=0.1)")
+  freq, amplitude = spectral.spectrum(y.T, dt=dt)
+  assert plot.n_datasets == 2
+  for i in range(2):
+    assert np.array_equal(plot._X[i], freq[0])
+    assert np.allclose(plot._Y[i], amplitude[i])
+  plot.add_data(np.column_stack([t, y]), "0", transform="x, y = psd(y, dt=0.1, nperseg=64)")
+  assert plot._X[2].shape == plot._Y[2].shape == (33, )
@@ -0,0 +1,99 @@
+from fractions import Fraction
+import pytest
+import numpy as np
+
+from lplot.unit_conversion import UnitConversion, parse_unit, convert, energy, length, pressure
+
+
+def _path(graph, start, end):
+  """ A path between two units of a graph, by depth first search.
+  """
+  paths = [[start]]
+  while paths:
+    path = paths.pop()
+    if path[-1] == end:
+      return path
+    paths.extend(path + [node] for node in graph[path[-1]] if node not in path)
+  return None
+
+
+def test_unit_conversion():
+  assert energy("eV", "THz") == 241.79893
+  assert energy("THz", "THz") == 1.0
+  assert energy("Ry", "meV") == pytest.approx(13605.6980659)
+  assert energy("meV", "cm-1") == pytest.approx(8.06554429)
+  assert length("inch", "Bohr") == pytest.approx(2.54e8 / 0.529177)
+  # The table agrees with the conversions along the paths of the graph.
+  for v1 in length.units:
+    for v2 in length.units:
+      path = _path(length.neighbor, v1, v2)
+      expected = np.prod([length.pair[pair] for pair in zip(path[:-1], path[1:])])
+      assert length(v1, v2) == pytest.approx(expected)
+  with pytest.raises(ValueError):
+    energy("eV", "kg")
+  with pytest.raises(ValueError):
+    length("inch", "furlong")
+
+
+def test_unit_conversion_lookup():
+  conversion = energy.lookup([["eV"], ["meV"]], ["meV", "THz", "eV"])
+  assert conversion.shape == (2, 3)
+  assert np.allclose(conversion, [[1000., 241.79893, 1.], [1., 0.24179893, 1e-3]])
+  assert length.lookup("mile", "cm") == pytest.approx(1.6e5)
+  with pytest.raises(ValueError):
+    energy.lookup(["eV", "eV"], ["meV", "kg"])
+
+
+def test_unit_conversion_cycles():
+  units = UnitConversion(data="""\
+    a  b  2.
+    b  c  3.
+    a  c  6.
+    """)
+  assert units("c", "a") == pytest.approx(1 / 6)
+  with pytest.raises(ValueError, match="Inconsistent"):
+    UnitConversion(data="""\
+      a  b  2.
+      b  c  3.
+      c  a  0.5
+      """)
+
+
+def test_parse_unit():
+  scale, dimension = parse_unit("eV*sec^2/A^2")
+  assert scale == pytest.approx(1.602176634e-19 / 1e-20)
+  assert dimension == (0, 1, 0, 0, 0)
+  assert parse_unit("cm-1") == parse_unit("1/cm") == (pytest.approx(100.), (-1, 0, 0, 0, 0))
+  assert parse_unit("Hz^(1/2)")[1] == (0, 0, Fraction(-1, 2), 0, 0)
+  assert parse_unit("(kg*m/s^2)**2")[1] == parse_unit("N^2")[1]
+  for unit in ("furlong", "eV/", "m^", "(m", "m$"):
+    with pytest.raises(ValueError):
+      parse_unit(unit)
+
+
+def test_convert():
+  assert convert("Ha/Bohr^3", "GPa") == pytest.approx(29421.02648438959, rel=1e-6)
+  assert convert("amu", "eV*sec^2/A^2") == pytest.approx(1.66054e-27 * 6.2415e-2, rel=1e-4)
+  assert convert("kbar", "GPa") == pytest.approx(0.1)
+  with pytest.raises(ValueError):
+    convert("eV", "GPa")
+  # Unit conversion tables fall back to dimensional analysis for units of their dimensions.
+  assert pressure("Ha/Bohr^2/Angstrom", "kbar") == pytest.approx(convert("Ha/Bohr^2/Angstrom", "GPa") * 10)
+  assert energy("Ha", "meV") == pytest.approx(27211.386, rel=1e-6)
+  assert np.allclose(pressure.lookup(["GPa", "Pa"], ["kbar", "MPa"]), [10., 1e-6])
+  with pytest.raises(ValueError):
+    energy("m", "cm")
+
+
+def test_convert_through_table():
+  # Units missing from a table are converted to units of the table of the same dimensions.
+  assert energy("Ha", "THz") == pytest.approx(energy("Ha", "eV") * 241.79893)
+  assert energy("Ha", "cm-1") == pytest.approx(219474.63, rel=1e-6)
+  assert energy("meV", "GHz") == pytest.approx(241.79893)
+  assert energy("GHz", "Ha") == pytest.approx(1 / energy("Ha", "GHz"))
+  assert energy("Ry", "mRy") == 1000.
+  assert np.allclose(energy.lookup(["Ha", "kHz"], ["THz", "mRy"]), [energy("Ha", "THz"), energy("kHz", "mRy")])
+  with pytest.raises(ValueError, match="none of the dimensions"):
+    energy("eV", "kg")
+  with pytest.raises(ValueError, match="furlong is unknown"):
+    energy("furlong", "eV")